@@ -0,0 +1,225 @@
+import csv
+import hmac
+import io
+import json
+import os
+import sys
+import click
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from sqlalchemy import insert
+from extensions import db, profiler
+from user import User
+
+# Create blueprint; CLI commands live under "flask users ..."
+admin_bp = Blueprint('admin', __name__, url_prefix='/admin', cli_group='users')
+
+# Columns exported (never the password hash)
+EXPORT_FIELDS = ('id', 'email', 'customer_id', 'subscription_id', 'subscription_status', 'token_version')
+
+FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+
+@admin_bp.before_request
+def require_admin_token():
+    expected = current_app.config.get('ADMIN_TOKEN')
+    provided = request.headers.get('X-Admin-Token', '')
+    # Without a configured token the admin endpoints don't exist
+    if not expected:
+        return jsonify({"error": "Not found"}), 404
+    if not hmac.compare_digest(provided.encode(), expected.encode()):
+        return jsonify({"error": "Forbidden"}), 403
+
+
+def export_rows(status=None, batch_size=1000):
+    """Yield user rows as tuples in EXPORT_FIELDS order, ``batch_size`` at a time from the cursor."""
+    query = db.session.query(*(getattr(User, field) for field in EXPORT_FIELDS)).order_by(User.id)
+    if status:
+        query = query.filter(User.subscription_status == status)
+    # Server-side cursor where the driver supports it; rows are never all in memory
+    yield from query.execution_options(yield_per=batch_size)
+
+
+def encode_rows(rows, fmt, batch_size=1000):
+    """Yield NDJSON or CSV text in chunks of ``batch_size`` rows."""
+    buffer = io.StringIO()
+    if fmt == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_FIELDS)
+        encode = writer.writerow
+    else:
+        def encode(row):
+            buffer.write(json.dumps(dict(zip(EXPORT_FIELDS, row))))
+            buffer.write('\n')
+
+    count = 0
+    for row in rows:
+        encode(row)
+        count += 1
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def parse_records(lines, fmt):
+    """Yield import records (dicts) from NDJSON or CSV lines."""
+    if fmt == 'csv':
+        yield from csv.DictReader(lines)
+        return
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def import_records(records, batch_size=1000):
+    """Insert new users in batches with executemany; existing emails are skipped.
+
+    Each batch is one SELECT for the emails that already exist and one
+    multi-row INSERT, committed per batch. Imported users have no password
+    hash, so they cannot log in until a password is set for them. Returns
+    counts.
+    """
+    totals = {"inserted": 0, "skipped": 0, "invalid": 0}
+    batch = {}
+    for record in records:
+        email = (record.get('email') or '').strip() if isinstance(record, dict) else ''
+        if not email:
+            totals["invalid"] += 1
+            continue
+        if email in batch:
+            totals["skipped"] += 1
+            continue
+        batch[email] = {
+            'email': email,
+            'customer_id': record.get('customer_id') or '',
+            'subscription_id': record.get('subscription_id') or '',
+            'subscription_status': record.get('subscription_status') or 'inactive',
+        }
+        if len(batch) >= batch_size:
+            _insert_batch(batch, totals)
+            batch = {}
+    if batch:
+        _insert_batch(batch, totals)
+    return totals
+
+
+def _insert_batch(batch, totals):
+    existing = {
+        email for (email,) in
+        db.session.query(User.email).filter(User.email.in_(list(batch)))
+    }
+    rows = [row for email, row in batch.items() if email not in existing]
+    if rows:
+        db.session.execute(insert(User), rows)
+    db.session.commit()
+    totals["inserted"] += len(rows)
+    totals["skipped"] += len(existing)
+
+
+def _format_arg(value):
+    fmt = (value or 'ndjson').lower()
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported format: {value}")
+    return fmt
+
+
+@admin_bp.route('/users/export', methods=['GET'])
+def export_users():
+    """Stream users as NDJSON or CSV (?format=, ?status=)."""
+    try:
+        fmt = _format_arg(request.args.get('format'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    status = request.args.get('status')
+    batch_size = current_app.config.get('ADMIN_EXPORT_BATCH_SIZE', 1000)
+
+    chunks = encode_rows(export_rows(status, batch_size), fmt, batch_size)
+    response = Response(stream_with_context(chunks), mimetype=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename=users.{fmt}'
+    return response
+
+
+@admin_bp.route('/users/import', methods=['POST'])
+def import_users():
+    """Bulk insert users from an NDJSON or CSV request body (?format=)."""
+    try:
+        fmt = _format_arg(request.args.get('format') or ('csv' if request.mimetype == 'text/csv' else None))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # Read the body as a stream rather than loading it whole
+    lines = io.TextIOWrapper(request.stream, encoding='utf-8')
+    try:
+        totals = import_records(parse_records(lines, fmt), current_app.config.get('ADMIN_EXPORT_BATCH_SIZE', 1000))
+    except (ValueError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({"error": f"Invalid {fmt} input: {str(e)}"}), 400
+    return jsonify(totals), 200
+
+
+@admin_bp.route('/profiles', methods=['GET'])
+def list_profiles():
+    """Profiled requests, time and stack samples per route in this worker process."""
+    return jsonify(profiler.summary()), 200
+
+
+@admin_bp.route('/profiles/dump', methods=['GET'])
+def dump_profile():
+    """Download one route's profile (?route=, default all) as collapsed stacks or pstats (?format=)."""
+    route = request.args.get('route')
+    fmt = request.args.get('format') or ('pstats' if profiler.mode == 'cprofile' else 'collapsed')
+    if not profiler.has_profiles(route):
+        return jsonify({"error": "No profiled requests"}), 404
+    if fmt == 'collapsed' and profiler.mode == 'sampler':
+        response = Response(profiler.collapsed(route), mimetype='text/plain')
+    elif fmt == 'pstats' and profiler.mode == 'cprofile':
+        response = Response(profiler.pstats_data(route), mimetype='application/octet-stream')
+    else:
+        return jsonify({"error": f"Format {fmt} is not available in {profiler.mode} mode"}), 400
+    extension = 'prof' if fmt == 'pstats' else 'folded'
+    response.headers['Content-Disposition'] = f'attachment; filename=profile-{os.getpid()}.{extension}'
+    return response
+
+
+@admin_bp.route('/profiles', methods=['DELETE'])
+def reset_profiles():
+    """Discard the profiles collected so far in this worker process."""
+    profiler.reset()
+    return jsonify({"success": True}), 200
+
+
+@admin_bp.cli.command('export')
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default='ndjson')
+@click.option('--status', help='Only users with this subscription status.')
+@click.option('--output', type=click.Path(dir_okay=False, writable=True), help='File to write (default stdout).')
+def export_command(fmt, status, output):
+    """Stream users as NDJSON or CSV."""
+    batch_size = current_app.config.get('ADMIN_EXPORT_BATCH_SIZE', 1000)
+    out = open(output, 'w', newline='') if output else sys.stdout
+    try:
+        for chunk in encode_rows(export_rows(status, batch_size), fmt, batch_size):
+            out.write(chunk)
+    finally:
+        if output:
+            out.close()
+
+
+@admin_bp.cli.command('import')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False, allow_dash=True))
+@click.option('--format', 'fmt', type=click.Choice(list(FORMATS)), default=None,
+              help='Input format (default: from the file extension).')
+@click.option('--batch-size', type=int, default=None)
+def import_command(path, fmt, batch_size):
+    """Bulk insert users from an NDJSON or CSV file."""
+    fmt = fmt or ('csv' if path.endswith('.csv') else 'ndjson')
+    batch_size = batch_size or current_app.config.get('ADMIN_EXPORT_BATCH_SIZE', 1000)
+    lines = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+    try:
+        totals = import_records(parse_records(lines, fmt), batch_size)
+    finally:
+        if lines is not sys.stdin:
+            lines.close()
+    click.echo(f"Inserted {totals['inserted']} users, skipped {totals['skipped']} existing, "
+               f"{totals['invalid']} invalid")
\ No newline at end of file
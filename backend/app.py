@@ -1,12 +1,19 @@
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, Response
 from sqlalchemy import text
-from flask_cors import CORS
 import os
 import json
 from dotenv import load_dotenv
-from extensions import db
-from flask_jwt_extended import JWTManager
+from extensions import (
+    db, jwt, subscription_cache, token_versions, payment_method_cache, password_hasher, stripe_client, metrics, async_db,
+    profiler, recent_writes, read_replicas, rate_limiter
+)
 from celery_config import make_celery
+from database import engine_options, init_engine
+from cors import CORSMiddleware
+from replicas import replica_binds
+from json_provider import ConstantJSON, FastJSONProvider
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Function to load configuration from JSON file
 def load_config(config_file='config.json'):
@@ -17,146 +24,236 @@ def load_config(config_file='config.json'):
         print(f"Error loading config: {e}")
         return {}
 
-# Initialize Flask app
-app = Flask(__name__)
-
-# Load configuration
-config = load_config()
-
-# Configure SQLAlchemy with settings from config file
-app.config['SQLALCHEMY_DATABASE_URI'] = config.get('SQLALCHEMY_DATABASE_URI', 'sqlite:///users.db')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = config.get('SQLALCHEMY_TRACK_MODIFICATIONS', False)
-app.config['TIMEOUT'] = 600
-
-# JWT Configuration
-app.config['JWT_TOKEN_LOCATION'] = ['headers', 'cookies']
-app.config['JWT_HEADER_NAME'] = 'Authorization'
-app.config['JWT_HEADER_TYPE'] = 'Bearer'
-
-app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'dev-key-change-in-production')
-app.config['JWT_COOKIE_SECURE'] = True
-app.config['JWT_COOKIE_CSRF_PROTECT'] = False
-app.config['JWT_COOKIE_SAMESITE'] = 'None'
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 30 * 24 * 60 * 60  # 30 days
-app.config['JWT_COOKIE_DOMAIN'] = 'yourdomain.com'  # Change this to your domain
-app.config['JWT_COOKIE_PATH'] = '/'
-app.config['JWT_ACCESS_COOKIE_NAME'] = 'access_token_cookie'
-app.config['JWT_REFRESH_COOKIE_NAME'] = 'refresh_token_cookie'
-jwt = JWTManager(app)
-
-# Initialize extensions
-db.init_app(app)
-load_dotenv()
-
-# Configure Celery
-# This is an instance that can be used within Flask app context
-celery = make_celery(app)
-
-# CORS Configuration
-CORS_CONFIG = {
-    'origins': config.get('CORS', {}).get('origins', ["https://yourdomain.com"]),  # Change this to your domain
-    'methods': config.get('CORS', {}).get('methods', ["GET", "POST", "OPTIONS"]),
-    'allow_headers': config.get('CORS', {}).get('allow_headers', ["Content-Type", "Authorization", "X-Requested-With"]),
-    'expose_headers': ['Content-Type', 'Authorization'],
-    'max_age': 600
-}
-
-# Initialize CORS with resource pattern matching
-CORS(app, 
-     resources={r"/*": {
-         "origins": CORS_CONFIG['origins'],
-         "methods": CORS_CONFIG['methods'], 
-         "allow_headers": CORS_CONFIG['allow_headers'],
-         "supports_credentials": True,
-         "expose_headers": CORS_CONFIG['expose_headers']
-     }})
-
-# Global after_request handler for CORS
-@app.after_request
-def after_request(response):
-    origin = request.headers.get('Origin')
-    if origin and origin in CORS_CONFIG['origins']:
-        response.headers.set('Access-Control-Allow-Origin', origin)
-        response.headers.set('Access-Control-Allow-Headers', ', '.join(CORS_CONFIG['allow_headers']))
-        response.headers.set('Access-Control-Allow-Methods', ', '.join(CORS_CONFIG['methods']))
-        response.headers.set('Access-Control-Allow-Credentials', 'true')
-        response.headers.set('Access-Control-Max-Age', str(CORS_CONFIG['max_age']))
-    return response
-
-# Route to handle specific preflight OPTIONS requests
-@app.route('/me', methods=['OPTIONS'])
-@app.route('/login', methods=['OPTIONS'])
-@app.route('/register', methods=['OPTIONS'])
-@app.route('/register-and-subscribe', methods=['OPTIONS'])
-@app.route('/logout', methods=['OPTIONS']) 
-@app.route('/subscribe', methods=['OPTIONS'])
-@app.route('/check-subscription', methods=['OPTIONS'])
-@app.route('/cancel-subscription', methods=['OPTIONS'])
-def handle_cors_preflight():
-    response = jsonify({})
-    origin = request.headers.get('Origin')
-    if origin and origin in CORS_CONFIG['origins']:
-        response.headers.set('Access-Control-Allow-Origin', origin)
-        response.headers.set('Access-Control-Allow-Headers', ', '.join(CORS_CONFIG['allow_headers']))
-        response.headers.set('Access-Control-Allow-Methods', ', '.join(CORS_CONFIG['methods']))
-        response.headers.set('Access-Control-Allow-Credentials', 'true')
-        response.headers.set('Access-Control-Max-Age', str(CORS_CONFIG['max_age']))
-    return response, 200
-
-# Global OPTIONS handler for all routes
-@app.route('/<path:path>', methods=['OPTIONS'])
-def handle_all_options(path):
-    response = jsonify({})
-    origin = request.headers.get('Origin')
-    if origin and origin in CORS_CONFIG['origins']:
-        response.headers.set('Access-Control-Allow-Origin', origin)
-        response.headers.set('Access-Control-Allow-Headers', ', '.join(CORS_CONFIG['allow_headers']))
-        response.headers.set('Access-Control-Allow-Methods', ', '.join(CORS_CONFIG['methods']))
-        response.headers.set('Access-Control-Allow-Credentials', 'true')
-        response.headers.set('Access-Control-Max-Age', str(CORS_CONFIG['max_age']))
-    return response, 200
-
-# Test endpoint for cookie verification
-@app.route('/test-cookie')
-def test_cookie():
-    resp = jsonify({"success": True})
-    resp.set_cookie(
-        'test_cookie', 
-        value='test_value',
-        secure=True,
-        httponly=False,
-        samesite='None',
-        path='/',
-        max_age=3600
-    )
-    return resp
-
-# Import blueprints after app creation
-from user import user_bp
-# Import your other blueprint modules here
-# from your_module import your_module_bp
-
-# Register blueprints
-app.register_blueprint(user_bp)
-# Register your other blueprints here
-# app.register_blueprint(your_module_bp)
-
-# Initialize database tables during application startup
-with app.app_context():
-    db.create_all()
-    print("Database tables initialized")
-
-@app.route('/')
-def index():
-    return "API Server"
-
-@app.route('/health')
-def health_check():
-    try:
-        db.session.execute(text('SELECT 1'))
-        return jsonify({"status": "healthy"}), 200
-    except Exception as e:
-        return jsonify({"status": "unhealthy", "error": str(e)}), 500
+def create_app(config=None):
+    """Build the Flask app.
+
+    ``config`` is a dict of settings or the path of a JSON file; by default
+    the file named by APP_CONFIG, else config.json. Nothing here connects to
+    the database, Redis or Stripe, so the app can be built once in a
+    gunicorn master (see wsgi.py) and forked into workers.
+    """
+    # Before reading secrets from the environment
+    load_dotenv()
+    if not isinstance(config, dict):
+        config = load_config(config or os.environ.get('APP_CONFIG', 'config.json'))
+
+    # Initialize Flask app
+    app = Flask(__name__)
+    # orjson-backed JSON (stdlib when orjson isn't installed or USE_ORJSON is off)
+    app.config['USE_ORJSON'] = config.get('USE_ORJSON', True)
+    app.json = FastJSONProvider(app, use_orjson=app.config['USE_ORJSON'])
+
+    # Configure SQLAlchemy with settings from config file
+    app.config['SQLALCHEMY_DATABASE_URI'] = config.get('SQLALCHEMY_DATABASE_URI', 'sqlite:///users.db')
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = config.get('SQLALCHEMY_TRACK_MODIFICATIONS', False)
+    # Engine tuning: SQLite pragmas or server-database pool sizing
+    app.config['DATABASE'] = config.get('DATABASE', {})
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'], app.config['DATABASE'])
+    # Read replicas for the read-only views, as binds "replica_0", "replica_1", ...
+    app.config['READ_REPLICAS'] = config.get('READ_REPLICAS', {})
+    app.config['SQLALCHEMY_BINDS'] = replica_binds(app.config['READ_REPLICAS'].get('uris', []), app.config['DATABASE'])
+    app.config['RECENT_WRITES_CACHE'] = config.get('RECENT_WRITES_CACHE', {})
+    app.config['TIMEOUT'] = 600
+    # Create missing tables when started with `python app.py` (development);
+    # otherwise use `flask create-db` or `flask db upgrade`
+    app.config['AUTO_CREATE_TABLES'] = config.get('AUTO_CREATE_TABLES', True)
+
+    # Subscription status cache (local LRU tier, optional shared Redis tier)
+    app.config['SUBSCRIPTION_CACHE'] = config.get('SUBSCRIPTION_CACHE', {})
+    app.config['TOKEN_VERSION_CACHE'] = config.get('TOKEN_VERSION_CACHE', {})
+    # Default payment method per Stripe customer, to skip redundant Stripe calls
+    app.config['PAYMENT_METHOD_CACHE'] = config.get('PAYMENT_METHOD_CACHE', {})
+
+    # Password hashing algorithm/cost and optional worker pool
+    app.config['PASSWORD_HASHING'] = config.get('PASSWORD_HASHING', {})
+    # Admission control for /login, /register and /register-and-subscribe
+    app.config['RATE_LIMITS'] = config.get('RATE_LIMITS', {})
+
+    # Celery broker/result backend and background subscription mode; every
+    # CELERY_* key is passed to Celery under its lowercase name without the prefix
+    for key, value in config.items():
+        if key.startswith('CELERY_'):
+            app.config[key] = value
+    app.config['CELERY_BROKER_URL'] = config.get('CELERY_BROKER_URL', 'redis://localhost:6379')
+    app.config['CELERY_RESULT_BACKEND'] = config.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379')
+    app.config['CELERY_TASK_ALWAYS_EAGER'] = config.get('CELERY_TASK_ALWAYS_EAGER', False)
+    # Queues, pool, concurrency and prefetch of each kind of worker (see worker.py)
+    app.config['WORKER_PROFILES'] = config.get('WORKER_PROFILES', {})
+    app.config['ASYNC_SUBSCRIPTIONS'] = config.get('ASYNC_SUBSCRIPTIONS', False)
+    # Number of webhook events applied per bulk UPDATE
+    app.config['WEBHOOK_BATCH_SIZE'] = config.get('WEBHOOK_BATCH_SIZE', 500)
+    # Seconds a webhook waits for its drain, so that one drain handles a whole burst (0: drain each)
+    app.config['WEBHOOK_DRAIN_DELAY'] = config.get('WEBHOOK_DRAIN_DELAY', 0)
+    # Admin export/import endpoints are enabled by setting ADMIN_TOKEN
+    app.config['ADMIN_TOKEN'] = os.environ.get('ADMIN_TOKEN')
+    app.config['ADMIN_EXPORT_BATCH_SIZE'] = config.get('ADMIN_EXPORT_BATCH_SIZE', 1000)
+    # Periodic Stripe-to-database subscription reconciliation
+    app.config['RECONCILIATION'] = config.get('RECONCILIATION', {})
+
+    # Stripe HTTP pooling, timeouts and retry budget
+    app.config['STRIPE'] = config.get('STRIPE', {})
+
+    # Prometheus metrics; set multiproc_dir when running several worker processes
+    app.config['METRICS'] = config.get('METRICS', {})
+
+    # Request profiling: sampled fraction and/or requests with a debug header signed with PROFILING_SECRET
+    app.config['PROFILING'] = config.get('PROFILING', {})
+    app.config['PROFILING_SECRET'] = os.environ.get('PROFILING_SECRET')
+
+    # ASGI serving (asgi.py): thread pool for the sync views, optional async database URI
+    app.config['ASGI'] = config.get('ASGI', {})
+
+    # JWT Configuration
+    app.config['JWT_TOKEN_LOCATION'] = ['headers', 'cookies']
+    app.config['JWT_HEADER_NAME'] = 'Authorization'
+    app.config['JWT_HEADER_TYPE'] = 'Bearer'
+
+    app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'dev-key-change-in-production')
+    app.config['JWT_COOKIE_SECURE'] = True
+    app.config['JWT_COOKIE_CSRF_PROTECT'] = False
+    app.config['JWT_COOKIE_SAMESITE'] = 'None'
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = 30 * 24 * 60 * 60  # 30 days
+    app.config['JWT_COOKIE_DOMAIN'] = 'yourdomain.com'  # Change this to your domain
+    app.config['JWT_COOKIE_PATH'] = '/'
+    app.config['JWT_ACCESS_COOKIE_NAME'] = 'access_token_cookie'
+    app.config['JWT_REFRESH_COOKIE_NAME'] = 'refresh_token_cookie'
+    # Embed subscription status and a per-user version in access tokens
+    app.config['JWT_SUBSCRIPTION_CLAIMS'] = config.get('JWT_SUBSCRIPTION_CLAIMS', False)
+    # Revoked-token store and its per-process Bloom filter
+    app.config['TOKEN_REVOCATION'] = config.get('TOKEN_REVOCATION', {})
+    jwt.init_app(app)
+
+    # Initialize extensions; the profiler first so that it covers the other request hooks
+    profiler.init_app(app)
+    metrics.init_app(app)
+    db.init_app(app)
+    with app.app_context():
+        # Builds the engine; connections are opened on first use
+        init_engine(app, db.engine)
+        metrics.instrument_engine(db.engine)
+        read_replicas.init_app(app, db)
+        # Async engine for asgi.py, also created on first use
+        async_db.init_app(app, db.engine)
+    # Alembic is only needed by the `flask db ...` commands
+    if os.environ.get('FLASK_RUN_FROM_CLI'):
+        from flask_migrate import Migrate
+        # render_as_batch lets Alembic alter tables on SQLite
+        Migrate(app, db, directory=os.path.join(BACKEND_DIR, 'migrations'), render_as_batch=True)
+    subscription_cache.init_app(app)
+    token_versions.init_app(app)
+    payment_method_cache.init_app(app)
+    recent_writes.init_app(app)
+    password_hasher.init_app(app)
+    rate_limiter.init_app(app)
+    # The Stripe HTTP session is created on the first call, in each process
+    stripe_client.init_app(app)
+
+    # Configure Celery; the broker connection is opened on the first publish
+    make_celery(app)
+    metrics.instrument_celery()
+
+    # CORS Configuration
+    cors_config = {
+        # Entries may use wildcard subdomains, e.g. "https://*.yourdomain.com"
+        'origins': config.get('CORS', {}).get('origins', ["https://yourdomain.com"]),  # Change this to your domain
+        'methods': config.get('CORS', {}).get('methods', ["GET", "POST", "OPTIONS"]),
+        'allow_headers': config.get('CORS', {}).get('allow_headers', ["Content-Type", "Authorization", "X-Requested-With", "If-None-Match"]),
+        'expose_headers': ['Content-Type', 'Authorization', 'ETag'],
+        'max_age': 600
+    }
+
+    # Single CORS layer; preflights are answered before Flask routing
+    app.wsgi_app = CORSMiddleware(app.wsgi_app, **cors_config)
+    # asgi.py applies the same policy to the views it serves itself
+    app.extensions['cors'] = app.wsgi_app
+
+    # Import blueprints here so that importing this module stays cheap
+    from user import user_bp
+    from webhooks import webhook_bp
+    from revocation import revocation_list
+    from reconcile import subscriptions_cli
+    from admin import admin_bp
+    # Import Celery tasks so workers register them
+    import tasks  # noqa: F401
+    # Import your other blueprint modules here
+    # from your_module import your_module_bp
+
+    # Register blueprints
+    app.register_blueprint(user_bp)
+    app.register_blueprint(webhook_bp)
+    app.register_blueprint(admin_bp)
+    # Register your other blueprints here
+    # app.register_blueprint(your_module_bp)
+
+    revocation_list.init_app(app)
+    app.cli.add_command(subscriptions_cli)
+
+    register_routes(app)
+
+    @app.cli.command('create-db')
+    def create_db():
+        """Create missing tables (development; production uses `flask db upgrade`)."""
+        db.create_all()
+        print("Database tables initialized")
+
+    return app
+
+# Constant response bodies, serialized once
+COOKIE_SET = ConstantJSON({"success": True})
+
+def register_routes(app):
+    # Test endpoint for cookie verification
+    @app.route('/test-cookie')
+    def test_cookie():
+        resp = COOKIE_SET()
+        resp.set_cookie(
+            'test_cookie',
+            value='test_value',
+            secure=True,
+            httponly=False,
+            samesite='None',
+            path='/',
+            max_age=3600
+        )
+        return resp
+
+    @app.route('/')
+    def index():
+        return "API Server"
+
+    @app.route('/health')
+    def health_check():
+        # Not read_only: the primary is checked here, and each replica below
+        try:
+            db.session.execute(text('SELECT 1'))
+        except Exception as e:
+            return jsonify({"status": "unhealthy", "error": str(e)}), 500
+        replica_errors = read_replicas.check()
+        replicas = read_replicas.stats()
+        for name, error in replica_errors.items():
+            replicas[name]['reachable'] = error is None
+            if error is not None:
+                replicas[name]['error'] = error
+        return jsonify({
+            # Reads fall back to the primary, so an unreachable replica only degrades the service
+            "status": "degraded" if any(replica_errors.values()) else "healthy",
+            "subscription_cache": subscription_cache.stats(),
+            "token_version_cache": token_versions.stats(),
+            "payment_method_cache": payment_method_cache.stats(),
+            "stripe": stripe_client.stats(),
+            "read_replicas": replicas,
+            "database": {name: stats.snapshot() for name, stats in app.extensions['pool_stats'].items()}
+        }), 200
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
+    app = create_app()
+    # Initialize database tables for the development server
+    if app.config['AUTO_CREATE_TABLES']:
+        with app.app_context():
+            db.create_all()
+            print("Database tables initialized")
     app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
@@ -0,0 +1,97 @@
+"""ASGI entry point for uvicorn:
+
+    uvicorn --workers 4 --host 0.0.0.0 --port 5000 asgi:app
+
+The views registered in ``user.ASYNC_VIEWS`` (/subscribe,
+/register-and-subscribe, /cancel-subscription) run as coroutines on the
+event loop, so a worker waiting on Stripe keeps taking requests. They go
+through the Flask app's own request handling (before/after request hooks,
+error handlers, JWT checks), just without a thread. Every other request is
+passed to the Flask app on a2wsgi's thread pool.
+
+Needs uvicorn, a2wsgi, httpx and the async driver for the database
+(aiosqlite, asyncpg, ...).
+"""
+import io
+from a2wsgi import WSGIMiddleware
+from a2wsgi.wsgi import build_environ
+from app import create_app
+from extensions import async_db
+from user import ASYNC_VIEWS
+
+
+class AsyncViewsApp:
+    """Serve the async views natively and everything else through WSGI."""
+
+    def __init__(self, flask_app, wsgi_threads=10):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(flask_app, workers=wsgi_threads)
+        self.cors = flask_app.extensions.get('cors')
+        # (method, path) -> coroutine view; preflights stay with the CORS middleware
+        self.routes = {
+            (method, rule.rule): ASYNC_VIEWS[rule.endpoint]
+            for rule in flask_app.url_map.iter_rules()
+            if rule.endpoint in ASYNC_VIEWS and not rule.arguments
+            for method in rule.methods - {'HEAD', 'OPTIONS'}
+        }
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+            return
+        view = self.routes.get((scope.get('method'), scope.get('path')))
+        if view is None:
+            await self.wsgi(scope, receive, send)
+            return
+        await self.handle(view, scope, receive, send)
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_db.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def handle(self, view, scope, receive, send):
+        body = await read_body(receive)
+        app = self.flask_app
+        # Same steps as Flask.full_dispatch_request, awaiting the view
+        with app.request_context(build_environ(scope, io.BytesIO(body))) as ctx:
+            try:
+                rv = app.preprocess_request()
+                if rv is None:
+                    rv = await view()
+            except Exception as e:
+                try:
+                    rv = app.handle_user_exception(e)
+                except Exception as e:
+                    rv = app.handle_exception(e)
+            response = app.finalize_request(rv)
+            if self.cors is not None:
+                response.vary.add('Origin')
+                response.headers.extend(self.cors.headers_for(ctx.request.headers.get('Origin')))
+
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1'))
+                        for name, value in response.headers.items()],
+        })
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+        response.close()
+
+
+async def read_body(receive):
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+flask_app = create_app()
+app = AsyncViewsApp(flask_app, wsgi_threads=flask_app.config['ASGI'].get('wsgi_threads', 10))
\ No newline at end of file
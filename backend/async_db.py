@@ -0,0 +1,81 @@
+import os
+import threading
+from sqlalchemy.engine import make_url
+from database import init_engine
+
+# asyncio driver used in place of each sync one
+ASYNC_DRIVERS = {
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'mysql': 'mysql+aiomysql',
+}
+
+
+def async_url(url):
+    """Return ``url`` with its driver swapped for the asyncio one."""
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No asyncio driver configured for {backend}")
+    return url.set(drivername=ASYNC_DRIVERS[backend])
+
+
+class AsyncDatabase:
+    """AsyncSession factory for the views served by asgi.py.
+
+    Points at the same database as ``db`` and works with the same models.
+    The engine is created on first use in each process, so importing this
+    module and building the app never require the asyncio drivers.
+    """
+
+    def __init__(self, metrics):
+        self.metrics = metrics
+        self.app = None
+        self.url = None
+        self.engine_options = {}
+        self._engine = None
+        self._sessionmaker = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, engine):
+        """``engine`` is the app's sync engine; its URL already has Flask-SQLAlchemy's path fixes."""
+        self.app = app
+        self.url = app.config.get('ASGI', {}).get('database_uri') or async_url(engine.url)
+        self.engine_options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {}))
+        if make_url(self.url).get_backend_name() == 'sqlite':
+            # SQLite takes one writer at a time; more connections only spin
+            # on the lock, so every statement shares one connection's thread
+            self.engine_options.update(pool_size=1, max_overflow=0)
+        self._pid = None
+        app.extensions['async_db'] = self
+
+    def configure(self):
+        """Create the engine; runs on first use in each process."""
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+            engine = create_async_engine(self.url, **self.engine_options)
+            # Same pragmas, pool stats and SQL metrics as the sync engine
+            init_engine(self.app, engine.sync_engine, name='async')
+            self.metrics.instrument_engine(engine.sync_engine)
+            self._engine = engine
+            self._sessionmaker = async_sessionmaker(engine, expire_on_commit=False)
+            self._pid = os.getpid()
+
+    @property
+    def engine(self):
+        self.configure()
+        return self._engine
+
+    def session(self):
+        """A new AsyncSession, for ``async with async_db.session() as session:``."""
+        self.configure()
+        return self._sessionmaker()
+
+    async def dispose(self):
+        if self._engine is not None and self._pid == os.getpid():
+            await self._engine.dispose()
\ No newline at end of file
@@ -0,0 +1,242 @@
+"""Concurrent /subscribe flows one worker sustains, sync WSGI vs ASGI.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_async_subscribe.py --stripe-latency-ms 100 --concurrency 1,8,32,128
+
+Each mode is a single server process on a temporary SQLite database, with
+Stripe pointed at benchmarks/stripe_stub.py (its own process) answering
+after the given latency:
+
+  sync-N   the Flask app (wsgi.py's create_app()) on a WSGI server with a
+           fixed pool of N request threads, like one gunicorn worker with
+           --threads N (N=1 is gunicorn's default sync worker)
+  asgi     asgi:app on uvicorn with one worker
+
+An async httpx client keeps the given number of subscribe flows in flight
+for --duration seconds per level; "cpu/flow" is the server process's CPU
+time per flow (Linux only). A mode sustains a level while its median
+latency stays within --sustain-factor of its median with one flow in
+flight. The Stripe customers exist beforehand, so every flow is customer
+lookup, attach, default payment method and subscription.
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.parse
+import urllib.request
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+ENV = {'STRIPE_SECRET': 'sk_test_bench', 'PRICE_ID': 'price_bench', 'JWT_SECRET_KEY': 'bench-jwt-secret-of-at-least-32-bytes'}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Nothing listening on port {port}")
+
+
+def cpu_seconds(pid):
+    # utime + stime of the process, None where /proc isn't available
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def prepare(users):
+    """Runs in a child: create the tables and users, print their tokens."""
+    sys.path.insert(0, BACKEND_DIR)
+    from app import create_app
+    from extensions import db
+    from user import User, create_user_token
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        accounts = [
+            User(email=f'bench{i}@example.com', customer_id='', subscription_id='', subscription_status='inactive')
+            for i in range(users)
+        ]
+        db.session.add_all(accounts)
+        db.session.commit()
+        print(json.dumps([create_user_token(user) for user in accounts]))
+
+
+def serve_sync(port, threads):
+    """Runs in a child: the Flask app on a fixed pool of request threads."""
+    sys.path.insert(0, BACKEND_DIR)
+    import logging
+    from concurrent.futures import ThreadPoolExecutor
+    from werkzeug.serving import BaseWSGIServer
+    from app import create_app
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    pool = ThreadPoolExecutor(threads)
+
+    class PooledWSGIServer(BaseWSGIServer):
+        def process_request(self, request, client_address):
+            pool.submit(self.handle_in_pool, request, client_address)
+
+        def handle_in_pool(self, request, client_address):
+            try:
+                self.finish_request(request, client_address)
+            except Exception:
+                self.handle_error(request, client_address)
+            finally:
+                self.shutdown_request(request)
+
+    PooledWSGIServer('127.0.0.1', port, create_app()).serve_forever()
+
+
+def start_server(mode, port, env):
+    if mode == 'asgi':
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--app-dir', BACKEND_DIR,
+                   '--port', str(port), '--workers', '1', '--log-level', 'warning', '--no-access-log']
+    else:
+        command = [sys.executable, __file__, '--serve', mode, '--port', str(port)]
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+    wait_for_port(port)
+    return process
+
+
+async def run_level(base_url, tokens, concurrency, duration):
+    import httpx
+
+    latencies, errors = [], 0
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=300) as client:
+        deadline = time.perf_counter() + duration
+
+        async def flow(token):
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                response = await client.post('/subscribe', json={'paymentMethodId': 'pm_card_visa'},
+                                             headers={'Authorization': f'Bearer {token}'})
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - started)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(flow(token) for token in tokens[:concurrency]))
+        elapsed = time.perf_counter() - started
+
+    throughput = len(latencies) / elapsed
+    return {
+        'flows': len(latencies),
+        'errors': errors,
+        'flows_per_second': throughput,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stripe-latency-ms', type=float, default=100)
+    parser.add_argument('--concurrency', default='1,8,16,32,64,128', help='Comma-separated flows in flight.')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds per concurrency level.')
+    parser.add_argument('--sync-threads', default='1,8', help='Comma-separated request thread counts for sync mode.')
+    parser.add_argument('--sustain-factor', type=float, default=1.5)
+    parser.add_argument('--serve', help=argparse.SUPPRESS)
+    parser.add_argument('--port', type=int, help=argparse.SUPPRESS)
+    parser.add_argument('--prepare', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        prepare(args.prepare)
+        return
+    if args.serve:
+        serve_sync(args.port, int(args.serve.split('-', 1)[1]))
+        return
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    modes = [f'sync-{threads}' for threads in args.sync_threads.split(',')] + ['asgi']
+
+    with tempfile.TemporaryDirectory() as workdir:
+        stub_port = free_port()
+        stub = subprocess.Popen([sys.executable, os.path.join(BENCH_DIR, 'stripe_stub.py'),
+                                 '--port', str(stub_port), '--latency-ms', str(args.stripe_latency_ms)],
+                                stdout=subprocess.DEVNULL)
+        try:
+            wait_for_port(stub_port)
+            with open(os.path.join(BACKEND_DIR, 'config.json')) as f:
+                config = json.load(f)
+            config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+            config['ASYNC_SUBSCRIPTIONS'] = False
+            config['STRIPE'] = dict(config.get('STRIPE', {}), api_base=f'http://127.0.0.1:{stub_port}', max_retries=0)
+            config_path = os.path.join(workdir, 'config.json')
+            with open(config_path, 'w') as f:
+                json.dump(config, f)
+            env = dict(os.environ, APP_CONFIG=config_path, **ENV)
+
+            tokens = json.loads(subprocess.run(
+                [sys.executable, __file__, '--prepare', str(max(levels))],
+                cwd=BACKEND_DIR, env=env, capture_output=True, text=True, check=True
+            ).stdout.strip().splitlines()[-1])
+            # Stripe customers exist up front so every flow makes the same calls
+            for i in range(len(tokens)):
+                data = urllib.parse.urlencode({'email': f'bench{i}@example.com'}).encode()
+                urllib.request.urlopen(f'http://127.0.0.1:{stub_port}/v1/customers', data).read()
+
+            print(f"Stripe latency {args.stripe_latency_ms:.0f} ms per call, {args.duration:.0f} s per level")
+            for mode in modes:
+                port = free_port()
+                server = start_server(mode, port, env)
+                sustained, baseline = None, None
+                try:
+                    for concurrency in levels:
+                        cpu_before = cpu_seconds(server.pid)
+                        result = asyncio.run(run_level(f'http://127.0.0.1:{port}', tokens, concurrency, args.duration))
+                        cpu_after = cpu_seconds(server.pid)
+                        cpu = '-'
+                        if cpu_before is not None and cpu_after is not None and result['flows']:
+                            cpu = f"{(cpu_after - cpu_before) / result['flows'] * 1000:.1f} ms"
+                        print(f"{mode:>8}  concurrency {concurrency:>4}: {result['flows_per_second']:7.1f} flows/s  "
+                              f"p50 {result['p50_ms']:8.0f} ms  p95 {result['p95_ms']:8.0f} ms  "
+                              f"cpu/flow {cpu:>8}  errors {result['errors']}")
+                        baseline = baseline or result['p50_ms']
+                        if not result['errors'] and result['p50_ms'] <= baseline * args.sustain_factor:
+                            sustained = (concurrency, result['flows_per_second'])
+                finally:
+                    server.terminate()
+                    server.wait()
+                if sustained:
+                    print(f"{mode:>8}  sustained at concurrency {sustained[0]} ({sustained[1]:.1f} flows/s)")
+                print()
+        finally:
+            stub.terminate()
+            stub.wait()
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,249 @@
+"""Celery task throughput and latency per queue configuration, on the in-memory broker.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_celery_queues.py --stripe 400 --webhooks 2000
+
+Workers run in this process on kombu's memory transport, so no Redis is
+needed; task bodies are stand-ins that sleep like the real ones wait (a
+Stripe call, a webhook drain's database round trips). The mixed workload
+publishes Stripe and webhook tasks interleaved and reports, per kind, the
+throughput and the latency from publish to completion under:
+
+  shared        one default queue, one worker of both pools' total
+                concurrency, prefetch 4, early acks, results stored
+                (make_celery before queues were split)
+  shared-tuned  the same single queue with prefetch 1, late acks and no
+                results
+  separate      the stripe and webhooks queues, each with its own worker,
+                pool size and prefetch, as the WORKER_PROFILES in config.json
+
+A second table runs webhook tasks alone to show the cost of prefetch, late
+acks and result storage, and a third counts the drains a burst of webhooks
+triggers with and without delay_coalesced.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import statistics
+import sys
+import threading
+import time
+import warnings
+from contextlib import ExitStack
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+ROUTES = {'bench.stripe_call': {'queue': 'stripe'}, 'bench.webhook': {'queue': 'webhooks'}}
+
+
+class Completions:
+    """Publish-to-finish latencies of the tasks run so far, by kind."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = {}
+        self.finished = {}
+
+    def record(self, kind, published):
+        now = time.perf_counter()
+        with self.lock:
+            self.latencies.setdefault(kind, []).append(now - published)
+            self.finished[kind] = now
+
+    def wait(self, expected, timeout=300):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            with self.lock:
+                if all(len(self.latencies.get(kind, ())) >= count for kind, count in expected.items()):
+                    return True
+            time.sleep(0.005)
+        return False
+
+
+def responsive_consumers(interval=0.002):
+    """Make in-process workers apply acks and prefetch changes promptly.
+
+    Celery consumes from transports without an event loop, like the memory
+    one, in a blocking loop that performs deferred acks and raises the
+    prefetch window only between ``drain_events`` calls of up to 2 seconds,
+    so a full prefetch window would stall for that long; a worker on Redis
+    does it as tasks finish.
+    """
+    from kombu import Connection
+
+    drain_events = Connection.drain_events
+
+    def drain_events_briefly(self, timeout=None, **kwargs):
+        return drain_events(self, timeout=min(timeout or interval, interval), **kwargs)
+    Connection.drain_events = drain_events_briefly
+
+
+def make_app(name, completions, stripe_latency, webhook_latency, routed, results, acks_late, prefetch=4):
+    from celery import Celery
+    from kombu import Exchange, Queue
+
+    app = Celery(name, broker='memory://', set_as_current=False)
+    app.conf.update(
+        result_backend='cache+memory://',
+        task_ignore_result=not results,
+        task_acks_late=acks_late,
+        worker_prefetch_multiplier=prefetch,
+        worker_hijack_root_logger=False,
+        # The memory transport polls its queues, once a second by default
+        broker_transport_options={'polling_interval': 0.001},
+    )
+    if routed:
+        app.conf.update(task_queues=[Queue(name, Exchange(name), routing_key=name) for name in ('stripe', 'webhooks')],
+                        task_routes=ROUTES)
+
+    @app.task(name='bench.stripe_call')
+    def stripe_call(published):
+        time.sleep(stripe_latency)
+        completions.record('stripe', published)
+
+    @app.task(name='bench.webhook')
+    def webhook(published):
+        time.sleep(webhook_latency)
+        completions.record('webhooks', published)
+
+    @app.task(name='bench.drain')
+    def drain():
+        completions.record('drain', time.perf_counter())
+
+    return app
+
+
+def start(stack, app, pool_size, queues=None):
+    from celery.contrib.testing.worker import start_worker
+
+    kwargs = {'queues': queues} if queues else {}
+    stack.enter_context(start_worker(app, pool='threads', concurrency=pool_size,
+                                     perform_ping_check=False, shutdown_timeout=30, **kwargs))
+
+
+def run_mixed(setup, args):
+    completions = Completions()
+    common = dict(completions=completions, stripe_latency=args.stripe_latency, webhook_latency=args.webhook_latency)
+    with ExitStack() as stack:
+        if setup == 'separate':
+            publisher = make_app('publisher', routed=True, results=False, acks_late=True, **common)
+            start(stack, make_app('stripe', routed=True, results=False, acks_late=True, prefetch=1, **common),
+                  args.stripe_pool, ['stripe'])
+            start(stack, make_app('webhooks', routed=True, results=False, acks_late=True, prefetch=4, **common),
+                  args.webhook_pool, ['webhooks'])
+        else:
+            tuned = setup == 'shared-tuned'
+            publisher = make_app('shared', routed=False, results=not tuned, acks_late=tuned,
+                                 prefetch=1 if tuned else 4, **common)
+            start(stack, publisher, args.stripe_pool + args.webhook_pool)
+
+        stripe_call, webhook = publisher.tasks['bench.stripe_call'], publisher.tasks['bench.webhook']
+        ratio = max(1, args.webhooks // max(1, args.stripe))
+        started = time.perf_counter()
+        published_stripe = 0
+        for index in range(args.webhooks):
+            if index % ratio == 0 and published_stripe < args.stripe:
+                stripe_call.delay(time.perf_counter())
+                published_stripe += 1
+            webhook.delay(time.perf_counter())
+        for _ in range(args.stripe - published_stripe):
+            stripe_call.delay(time.perf_counter())
+        if not completions.wait({'stripe': args.stripe, 'webhooks': args.webhooks}):
+            raise RuntimeError(f"{setup}: tasks did not finish")
+
+    for kind in ('stripe', 'webhooks'):
+        latencies = sorted(completions.latencies[kind])
+        count = len(latencies)
+        rate = count / (completions.finished[kind] - started)
+        p95 = latencies[min(count - 1, int(count * 0.95))]
+        print(f"{setup:>13} {kind:>9} {count:>6} {rate:>8.0f} "
+              f"{statistics.median(latencies) * 1e3:>9.1f} {p95 * 1e3:>9.1f}")
+
+
+def run_webhooks_only(prefetch, acks_late, results, args):
+    completions = Completions()
+    app = make_app('webhooks', completions, args.stripe_latency, args.webhook_latency,
+                   routed=True, results=results, acks_late=acks_late, prefetch=prefetch)
+    with ExitStack() as stack:
+        start(stack, app, args.webhook_pool, ['webhooks'])
+        webhook = app.tasks['bench.webhook']
+        started = time.perf_counter()
+        for _ in range(args.webhooks):
+            webhook.delay(time.perf_counter())
+        if not completions.wait({'webhooks': args.webhooks}):
+            raise RuntimeError("webhook tasks did not finish")
+    rate = args.webhooks / (completions.finished['webhooks'] - started)
+    print(f"{prefetch:>9} {str(acks_late):>10} {str(results):>8} {rate:>8.0f}")
+
+
+def run_coalesced(window, args):
+    from celery_config import delay_coalesced
+
+    completions = Completions()
+    app = make_app('drains', completions, args.stripe_latency, args.webhook_latency,
+                   routed=False, results=False, acks_late=True)
+    drain = app.tasks['bench.drain']
+    with ExitStack() as stack:
+        start(stack, app, 1)
+        queued = 0
+        started = time.perf_counter()
+        # Webhooks arriving at a steady rate, each asking for a drain
+        for index in range(args.webhooks):
+            queued += delay_coalesced(drain, window)
+            time.sleep(max(0.0, started + (index + 1) / args.webhook_rate - time.perf_counter()))
+        if not completions.wait({'drain': queued}):
+            raise RuntimeError("drains did not finish")
+    print(f"{window:>9} {args.webhooks:>9} {queued:>7}")
+
+
+def _run_child(func, args):
+    warnings.filterwarnings('ignore')
+    logging.disable(logging.WARNING)
+    responsive_consumers()
+    func(*args)
+
+
+def isolated(func, *args):
+    """Run ``func(*args)`` in a fresh process: the memory broker's state and
+    a stopped worker's consumer would otherwise carry over to the next run."""
+    process = multiprocessing.get_context('spawn').Process(target=_run_child, args=(func, args))
+    process.start()
+    process.join()
+    if process.exitcode:
+        raise SystemExit(process.exitcode)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--stripe', type=int, default=400, help='Stripe tasks in the mixed workload.')
+    parser.add_argument('--webhooks', type=int, default=2000, help='Webhook tasks per run.')
+    parser.add_argument('--stripe-latency', type=float, default=0.2, help='Seconds a Stripe task waits.')
+    parser.add_argument('--webhook-latency', type=float, default=0.001, help='Seconds a webhook task waits.')
+    parser.add_argument('--stripe-pool', type=int, default=8, help='Threads of the stripe worker.')
+    parser.add_argument('--webhook-pool', type=int, default=2, help='Threads of the webhooks worker.')
+    parser.add_argument('--webhook-rate', type=float, default=2000, help='Webhooks per second in the drain run.')
+    args = parser.parse_args()
+
+    print(f"mixed workload: {args.stripe} Stripe tasks of {args.stripe_latency * 1e3:g} ms, "
+          f"{args.webhooks} webhook tasks of {args.webhook_latency * 1e3:g} ms")
+    print(f"{'setup':>13} {'kind':>9} {'tasks':>6} {'tasks/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    for setup in ('shared', 'shared-tuned', 'separate'):
+        isolated(run_mixed, setup, args)
+
+    print(f"\nwebhook tasks alone, {args.webhook_pool} threads")
+    print(f"{'prefetch':>9} {'acks_late':>10} {'results':>8} {'tasks/s':>8}")
+    for prefetch, acks_late, results in ((1, True, False), (4, True, False), (16, True, False),
+                                         (4, False, False), (4, True, True)):
+        isolated(run_webhooks_only, prefetch, acks_late, results, args)
+
+    print(f"\ndrains queued for webhooks arriving at {args.webhook_rate:g}/s")
+    print(f"{'window':>9} {'webhooks':>9} {'drains':>7}")
+    for window in (0, 0.05, 0.5):
+        isolated(run_coalesced, window, args)
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
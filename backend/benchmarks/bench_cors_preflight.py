@@ -0,0 +1,116 @@
+"""Preflight and CORS response throughput: previous stack vs CORSMiddleware.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_cors_preflight.py --requests 20000
+
+The previous stack (flask_cors, a global after_request hook and the two
+OPTIONS routes returning jsonify({})) is rebuilt here on a bare Flask app,
+since it no longer exists in app.py. The new stack is CORSMiddleware on the
+same bare app. Both are driven in-process through the WSGI interface, so
+the numbers measure the CORS layer rather than a network stack.
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask, jsonify, request  # noqa: E402
+from werkzeug.test import Client  # noqa: E402
+from cors import CORSMiddleware  # noqa: E402
+
+CORS_CONFIG = {
+    'origins': ["https://yourdomain.com", "http://localhost:3000"],
+    'methods': ["GET", "POST", "OPTIONS"],
+    'allow_headers': ["Content-Type", "Authorization", "X-Requested-With"],
+    'expose_headers': ['Content-Type', 'Authorization'],
+    'max_age': 600
+}
+
+
+def bare_app():
+    app = Flask(__name__)
+
+    @app.route('/me', methods=['GET'])
+    def me():
+        return jsonify({"email": "user@example.com", "isSubscribed": True})
+
+    return app
+
+
+def legacy_app():
+    from flask_cors import CORS
+
+    app = bare_app()
+    CORS(app, resources={r"/*": {
+        "origins": CORS_CONFIG['origins'],
+        "methods": CORS_CONFIG['methods'],
+        "allow_headers": CORS_CONFIG['allow_headers'],
+        "supports_credentials": True,
+        "expose_headers": CORS_CONFIG['expose_headers']
+    }})
+
+    def apply_headers(response):
+        origin = request.headers.get('Origin')
+        if origin and origin in CORS_CONFIG['origins']:
+            response.headers.set('Access-Control-Allow-Origin', origin)
+            response.headers.set('Access-Control-Allow-Headers', ', '.join(CORS_CONFIG['allow_headers']))
+            response.headers.set('Access-Control-Allow-Methods', ', '.join(CORS_CONFIG['methods']))
+            response.headers.set('Access-Control-Allow-Credentials', 'true')
+            response.headers.set('Access-Control-Max-Age', str(CORS_CONFIG['max_age']))
+        return response
+
+    app.after_request(apply_headers)
+
+    @app.route('/login', methods=['OPTIONS'])
+    def handle_cors_preflight():
+        return apply_headers(jsonify({})), 200
+
+    @app.route('/<path:path>', methods=['OPTIONS'])
+    def handle_all_options(path):
+        return apply_headers(jsonify({})), 200
+
+    return app
+
+
+def middleware_app():
+    app = bare_app()
+    app.wsgi_app = CORSMiddleware(app.wsgi_app, **CORS_CONFIG)
+    return app
+
+
+def throughput(app, method, path, requests):
+    client = Client(app)
+    headers = {
+        'Origin': 'http://localhost:3000',
+        'Access-Control-Request-Method': 'POST',
+        'Access-Control-Request-Headers': 'content-type,authorization',
+    }
+    for _ in range(200):
+        client.open(path, method=method, headers=headers)
+    start = time.perf_counter()
+    for _ in range(requests):
+        client.open(path, method=method, headers=headers)
+    return requests / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=20000)
+    args = parser.parse_args()
+
+    stacks = {'previous stack': legacy_app(), 'CORSMiddleware': middleware_app()}
+    for label, method, path in (('preflight /login', 'OPTIONS', '/login'),
+                                ('preflight /me', 'OPTIONS', '/me'),
+                                ('GET /me', 'GET', '/me')):
+        results = {name: throughput(app, method, path, args.requests) for name, app in stacks.items()}
+        baseline = results['previous stack']
+        print(f"{label:>17}: " + "  ".join(
+            f"{name} {rps:9.0f} req/s" for name, rps in results.items()
+        ) + f"  ({results['CORSMiddleware'] / baseline:.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Cost of building each route's JSON response: stdlib vs orjson vs precomputed.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_json.py --number 20000
+
+For a representative body of each route, times building the response
+object the way the view does it (best of five runs):
+
+  stdlib     Flask's DefaultJSONProvider (what jsonify used before)
+  orjson     FastJSONProvider, as registered by create_app()
+  constant   the ConstantJSON the view now returns, for constant bodies
+
+The /health body is taken from a real response of the app.
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import timeit
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+TOKEN = 'eyJhbGciOiJIUzI1NiIsInR5cCI6IkpXVCJ9.' + 'x' * 260 + '.' + 'y' * 43
+
+
+def route_bodies(health):
+    import user
+
+    # route -> (body, constant response or None)
+    return {
+        '/logout': ({"success": True}, user.LOGGED_OUT),
+        '/check-subscription': ({"isSubscribed": True}, user.SUBSCRIBED),
+        '/me': ({"email": "someone@example.com", "isSubscribed": True}, None),
+        '/login': ({"success": True, "token": TOKEN,
+                    "user": {"email": "someone@example.com", "isSubscribed": True}}, None),
+        '/subscribe': ({"success": True, "subscriptionId": "sub_1PxYzAbCdEfGhIjK", "status": "active"}, None),
+        '/cancel-subscription': ({"success": True, "message": "Subscription canceled successfully."},
+                                 user.SUBSCRIPTION_CANCELED),
+        '/me (404)': ({"error": "User not found"}, user.USER_NOT_FOUND),
+        '/health': (health, None),
+    }
+
+
+def best_of(func, number, repeat=5):
+    return min(timeit.repeat(func, number=number, repeat=repeat))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--number', type=int, default=20000, help='Responses built per route and method.')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    from flask.json.provider import DefaultJSONProvider
+    from app import create_app
+    from extensions import db
+    from json_provider import orjson
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(BACKEND_DIR, 'config.json')) as f:
+            config = json.load(f)
+        config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        app = create_app(config)
+        with app.app_context():
+            db.create_all()
+        health = app.test_client().get('/health').json
+
+        stdlib = DefaultJSONProvider(app)
+        print(f"orjson {orjson.__version__ if orjson else 'not installed'}; microseconds per response")
+        print(f"{'route':>22} {'bytes':>6} {'stdlib':>8} {'orjson':>8} {'constant':>9}")
+        with app.test_request_context():
+            for route, (body, constant) in route_bodies(health).items():
+                timings = [
+                    best_of(lambda: stdlib.response(body), args.number),
+                    best_of(lambda: app.json.response(body), args.number),
+                ]
+                if constant is not None:
+                    timings.append(best_of(constant, args.number))
+                cells = ''.join(f"{seconds / args.number * 1e6:>9.2f}" for seconds in timings)
+                size = len(app.json.response(body).get_data())
+                print(f"{route:>22} {size:>6}{cells}")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
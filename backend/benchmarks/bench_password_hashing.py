@@ -0,0 +1,156 @@
+"""Login latency under concurrent load with the hashing pool on and off.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_password_hashing.py --concurrency 16 --requests 200
+
+Each mode runs in a fresh interpreter against a temporary SQLite database.
+Alongside the login storm a single client polls /health, to show how much
+password hashing delays requests that never touch a password. All logins
+come from one address for a few emails, so the rate limits are turned off
+unless --rate-limits is given; login latencies only cover logins that
+were answered 200, and 503s (pool full) and 429s are counted separately.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_mode(args):
+    """Runs inside the child interpreter; prints one JSON line of results."""
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(args.workdir)
+    import warnings
+    warnings.filterwarnings('ignore')
+    from app import create_app
+    from extensions import db
+
+    app = create_app('config.json')
+    with app.app_context():
+        db.create_all()
+
+    users = [f'bench{i}@example.com' for i in range(args.users)]
+    client = app.test_client()
+    for email in users:
+        client.post('/register', json={'email': email, 'password': 'correct horse'})
+
+    login_latencies = []
+    health_latencies = []
+    rejected = 0
+    throttled = 0
+    done = threading.Event()
+
+    def login(i):
+        nonlocal rejected, throttled
+        c = app.test_client()
+        start = time.perf_counter()
+        response = c.post('/login', json={'email': users[i % len(users)], 'password': 'correct horse'})
+        if response.status_code == 200:
+            login_latencies.append(time.perf_counter() - start)
+        elif response.status_code == 503:
+            rejected += 1
+        elif response.status_code == 429:
+            throttled += 1
+
+    def poll_health():
+        c = app.test_client()
+        while not done.is_set():
+            start = time.perf_counter()
+            c.get('/health')
+            health_latencies.append(time.perf_counter() - start)
+            time.sleep(0.005)
+
+    poller = threading.Thread(target=poll_health)
+    poller.start()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(login, range(args.requests)))
+    elapsed = time.perf_counter() - started
+    done.set()
+    poller.join()
+
+    print(json.dumps({
+        'pool_workers': args.pool_workers,
+        'requests': args.requests,
+        'rejected': rejected,
+        'throttled': throttled,
+        'rps': args.requests / elapsed,
+        'login_p50_ms': percentile(login_latencies, 50) * 1000,
+        'login_p99_ms': percentile(login_latencies, 99) * 1000,
+        'health_p50_ms': percentile(health_latencies, 50) * 1000,
+        'health_p99_ms': percentile(health_latencies, 99) * 1000,
+    }))
+
+
+def launch(args, pool_workers):
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(BACKEND_DIR, 'config.json')) as f:
+            config = json.load(f)
+        config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        config['PASSWORD_HASHING'] = dict(
+            config.get('PASSWORD_HASHING', {}),
+            algorithm=args.algorithm,
+            iterations=args.iterations,
+            pool_workers=pool_workers,
+            max_queue=args.max_queue,
+        )
+        config['RATE_LIMITS'] = dict(config.get('RATE_LIMITS', {}), enabled=args.rate_limits)
+        with open(os.path.join(workdir, 'config.json'), 'w') as f:
+            json.dump(config, f)
+
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', '--workdir', workdir,
+             '--pool-workers', str(pool_workers),
+             '--concurrency', str(args.concurrency),
+             '--requests', str(args.requests),
+             '--users', str(args.users)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--algorithm', default='pbkdf2:sha256')
+    parser.add_argument('--iterations', type=int, default=600000)
+    parser.add_argument('--pool-workers', type=int, default=os.cpu_count())
+    parser.add_argument('--max-queue', type=int, default=64)
+    parser.add_argument('--rate-limits', action='store_true', help='Keep the configured RATE_LIMITS on.')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_mode(args)
+        return
+
+    for pool_workers in (0, args.pool_workers):
+        result = launch(args, pool_workers)
+        label = 'pool off' if not pool_workers else f'pool on ({pool_workers} workers)'
+        print(f"{label:>22}: {result['rps']:7.1f} req/s  "
+              f"login p50 {result['login_p50_ms']:7.1f} ms  p99 {result['login_p99_ms']:7.1f} ms  "
+              f"/health p50 {result['health_p50_ms']:6.1f} ms  p99 {result['health_p99_ms']:6.1f} ms  "
+              f"rejected {result['rejected']}  throttled {result['throttled']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""Per-request cost of the request profiler in each of its states.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_profiling.py --requests 5000
+
+Runs the app in-process with the Flask test client on a temporary SQLite
+database and times GET / (almost no work, so the profiler's own cost shows)
+and POST /login (password hashing and a query) with:
+
+  off        no sample rate and no PROFILING_SECRET: no hooks registered
+  armed      PROFILING_SECRET set but no debug header: every request only
+             checks for the header
+  sampler    every request profiled by the stack sampler
+  cprofile   every request profiled by cProfile
+
+Login requests are fewer (one in fifty) since each hashes a password.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import warnings
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+STATES = {
+    'off': (None, {'sample_rate': 0.0}),
+    'armed': ('bench-secret', {'sample_rate': 0.0}),
+    'sampler': (None, {'mode': 'sampler', 'sample_rate': 1.0}),
+    'cprofile': (None, {'mode': 'cprofile', 'sample_rate': 1.0}),
+}
+
+
+def build_app(workdir, state):
+    from app import create_app
+
+    secret, profiling = STATES[state]
+    os.environ.pop('PROFILING_SECRET', None)
+    if secret:
+        os.environ['PROFILING_SECRET'] = secret
+    with open(os.path.join(BACKEND_DIR, 'config.json')) as f:
+        config = json.load(f)
+    config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    config['PROFILING'] = dict(config.get('PROFILING', {}), **profiling)
+    return create_app(config)
+
+
+def time_requests(send, count):
+    latencies = []
+    for _ in range(count):
+        started = time.perf_counter()
+        send()
+        latencies.append(time.perf_counter() - started)
+    return statistics.median(latencies) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=5000, help='Requests to / per state.')
+    args = parser.parse_args()
+    warnings.filterwarnings('ignore')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        from extensions import db
+        credentials = {'email': 'bench@example.com', 'password': 'bench-password'}
+        for state in STATES:
+            app = build_app(workdir, state)
+            client = app.test_client()
+            with app.app_context():
+                db.create_all()
+            client.post('/register', json=credentials)
+
+            index = time_requests(lambda: client.get('/'), args.requests)
+            login = time_requests(lambda: client.post('/login', json=credentials), max(1, args.requests // 50))
+            print(f"{state:>8}: GET / p50 {index:8.1f} us   POST /login p50 {login:9.1f} us")
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
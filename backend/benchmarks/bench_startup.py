@@ -0,0 +1,141 @@
+"""Cold start cost: module import, create_app() and the first requests.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_startup.py --runs 10
+
+Every run is a fresh interpreter against a temporary SQLite database whose
+schema was created beforehand, as in a deployment. The child reports how
+long `import app`, create_app(), the first two requests to /health and
+the first /me take; the median and worst run are printed per phase. The
+--fork-workers option also forks that many children from a preloaded app,
+as gunicorn --preload does, and reports how long each takes to answer its
+first request.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def child(args):
+    """Runs inside the fresh interpreter; prints one JSON line of timings."""
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(args.workdir)
+    import warnings
+    warnings.filterwarnings('ignore')
+    timings = {}
+
+    start = time.perf_counter()
+    import app as app_module
+    timings['import'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    app = app_module.create_app('config.json')
+    timings['create_app'] = time.perf_counter() - start
+
+    client = app.test_client()
+    for label, path, headers in (('first /health', '/health', {}),
+                                 ('second /health', '/health', {}),
+                                 ('first /me', '/me', {'Authorization': f'Bearer {args.token}'})):
+        start = time.perf_counter()
+        response = client.get(path, headers=headers)
+        timings[label] = time.perf_counter() - start
+        assert response.status_code == 200, (path, response.status_code)
+
+    if args.fork_workers:
+        import gc
+        from extensions import db
+        with app.app_context():
+            db.engine.dispose()
+        gc.freeze()
+        timings['forked first /me'] = forked_first_request(app, args)
+
+    print(json.dumps(timings))
+
+
+def forked_first_request(app, args):
+    """Fork workers from the preloaded app; return the slowest first request."""
+    slowest = 0.0
+    for _ in range(args.fork_workers):
+        read_fd, write_fd = os.pipe()
+        started = time.perf_counter()
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            response = app.test_client().get('/me', headers={'Authorization': f'Bearer {args.token}'})
+            os.write(write_fd, str(response.status_code).encode())
+            os._exit(0)
+        os.close(write_fd)
+        status = os.read(read_fd, 16)
+        slowest = max(slowest, time.perf_counter() - started)
+        os.close(read_fd)
+        os.waitpid(pid, 0)
+        assert status == b'200', status
+    return slowest
+
+
+def prepare(workdir):
+    """Write the config, create the schema and a user; return a token for it."""
+    with open(os.path.join(BACKEND_DIR, 'config.json')) as f:
+        config = json.load(f)
+    config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+    with open(os.path.join(workdir, 'config.json'), 'w') as f:
+        json.dump(config, f)
+
+    script = (
+        "import sys, warnings; warnings.filterwarnings('ignore'); sys.path.insert(0, sys.argv[1])\n"
+        "from app import create_app\n"
+        "from extensions import db\n"
+        "from user import User, create_user_token\n"
+        "app = create_app('config.json')\n"
+        "with app.app_context():\n"
+        "    db.create_all()\n"
+        "    user = User(email='startup@example.com', customer_id='', subscription_id='', subscription_status='inactive')\n"
+        "    user.set_password('correct horse')\n"
+        "    db.session.add(user)\n"
+        "    db.session.commit()\n"
+        "    print(create_user_token(user))\n"
+    )
+    output = subprocess.run([sys.executable, '-c', script, BACKEND_DIR], cwd=workdir,
+                            capture_output=True, text=True, check=True).stdout
+    return output.strip().splitlines()[-1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--fork-workers', type=int, default=4)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    parser.add_argument('--token', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args)
+        return
+
+    runs = []
+    with tempfile.TemporaryDirectory() as workdir:
+        token = prepare(workdir)
+        for _ in range(args.runs):
+            output = subprocess.run(
+                [sys.executable, __file__, '--child', '--workdir', workdir, '--token', token,
+                 '--fork-workers', str(args.fork_workers)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    for phase in runs[0]:
+        samples = [run[phase] * 1000 for run in runs]
+        print(f"{phase:>18}: median {statistics.median(samples):8.1f} ms  max {max(samples):8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""Stripe calls made by each step of a subscription's life.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_subscribe_calls.py
+
+Runs the app in-process with the Flask test client against
+benchmarks/stripe_stub.py and prints, for each request, the X-Stripe-Calls
+header and the Stripe operations the stub received. "cold" steps clear the
+payment method cache first, as after its TTL or a restart.
+"""
+import json
+import os
+import sys
+import tempfile
+import warnings
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from stripe_stub import StripeStub  # noqa: E402
+
+
+def main():
+    warnings.filterwarnings('ignore')
+    stub = StripeStub().start()
+    os.environ.update(STRIPE_SECRET='sk_test_bench', PRICE_ID='price_bench', PRICE_ID_TEST='price_bench')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(BACKEND_DIR, 'config.json')) as f:
+            config = json.load(f)
+        config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        config['ASYNC_SUBSCRIPTIONS'] = False
+        config['STRIPE'] = dict(config.get('STRIPE', {}), api_base=stub.url, max_retries=0, call_count_header=True)
+
+        from app import create_app
+        from extensions import db, payment_method_cache
+
+        app = create_app(config)
+        with app.app_context():
+            db.create_all()
+        client = app.test_client()
+
+        client.post('/register', json={'email': 'bench@example.com', 'password': 'bench-password'})
+        token = client.post('/login', json={'email': 'bench@example.com', 'password': 'bench-password'}).json['token']
+        headers = {'Authorization': f'Bearer {token}'}
+
+        steps = [
+            ('first subscribe', False, '/subscribe', 'pm_card_1'),
+            ('cancel', False, '/cancel-subscription', None),
+            ('re-subscribe, same card, cold', True, '/subscribe', 'pm_card_1'),
+            ('cancel', False, '/cancel-subscription', None),
+            ('re-subscribe, same card', False, '/subscribe', 'pm_card_1'),
+            ('cancel', False, '/cancel-subscription', None),
+            ('re-subscribe, new card', False, '/subscribe', 'pm_card_2'),
+        ]
+        for name, cold, path, payment_method_id in steps:
+            if cold:
+                payment_method_cache.clear()
+            stub.state.calls.clear()
+            body = {'paymentMethodId': payment_method_id} if payment_method_id else None
+            response = client.post(path, json=body, headers=headers)
+            operations = ', '.join(f'{op} x{n}' if n > 1 else op for op, n in stub.state.calls.items())
+            print(f"{name:>30}: {response.status_code}  {response.headers.get('X-Stripe-Calls', '0'):>2} calls  ({operations})")
+
+    stub.stop()
+
+
+if __name__ == '__main__':
+    main()
\ No newline at end of file
@@ -0,0 +1,143 @@
+"""Bulk user import and streaming export: throughput and peak memory.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_user_export.py --rows 1000000
+
+A temporary SQLite database is filled through the batched import path from
+a generated NDJSON file, then exported through /admin/users/export as
+NDJSON and CSV, and finally loaded the old way, with User.query.all() and
+one jsonify() response, for comparison. Every step runs in a fresh
+interpreter so that each peak RSS belongs to that step alone; the RSS
+after building the app is shown as the baseline.
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_TOKEN = 'bench-admin-token'
+STATUSES = ('active', 'canceled', 'past_due', 'pending')
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def child(args):
+    """Runs inside the fresh interpreter; prints one JSON line of results."""
+    sys.path.insert(0, BACKEND_DIR)
+    os.chdir(args.workdir)
+    os.environ['ADMIN_TOKEN'] = ADMIN_TOKEN
+    import warnings
+    warnings.filterwarnings('ignore')
+    from app import create_app
+    from extensions import db
+
+    app = create_app('config.json')
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+
+    with app.app_context():
+        if args.step == 'import':
+            from admin import import_records, parse_records
+            db.create_all()
+            with open(os.path.join(args.workdir, 'users.ndjson')) as lines:
+                totals = import_records(parse_records(lines, 'ndjson'), args.batch_size)
+            rows, size = totals['inserted'], os.path.getsize(os.path.join(args.workdir, 'users.ndjson'))
+        elif args.step == 'jsonify-all':
+            from flask import jsonify
+            from user import User
+            with app.test_request_context():
+                users = User.query.all()
+                body = jsonify([{
+                    'id': u.id, 'email': u.email, 'customer_id': u.customer_id,
+                    'subscription_id': u.subscription_id, 'subscription_status': u.subscription_status,
+                    'token_version': u.token_version,
+                } for u in users]).get_data()
+            rows, size = len(users), len(body)
+
+    if args.step.startswith('export-'):
+        fmt = args.step.split('-', 1)[1]
+        response = app.test_client().get(f'/admin/users/export?format={fmt}',
+                                         headers={'X-Admin-Token': ADMIN_TOKEN}, buffered=False)
+        rows = size = 0
+        for chunk in response.response:
+            size += len(chunk)
+            rows += chunk.count(b'\n')
+        response.close()
+        if fmt == 'csv':
+            rows -= 1  # header
+
+    elapsed = time.perf_counter() - started
+    print(json.dumps({
+        'step': args.step,
+        'rows': rows,
+        'seconds': elapsed,
+        'rows_per_second': rows / elapsed if elapsed else 0,
+        'megabytes': size / 1e6,
+        'baseline_rss_mb': baseline,
+        'peak_rss_mb': peak_rss_mb(),
+    }))
+
+
+def write_input(path, rows):
+    with open(path, 'w') as f:
+        for i in range(rows):
+            f.write(json.dumps({
+                'email': f'user{i}@example.com',
+                'customer_id': f'cus_{i:014d}',
+                'subscription_id': f'sub_{i:014d}',
+                'subscription_status': STATUSES[i % len(STATUSES)],
+            }))
+            f.write('\n')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--skip-jsonify', action='store_true', help='Skip the all-in-memory comparison.')
+    parser.add_argument('--step', help=argparse.SUPPRESS)
+    parser.add_argument('--workdir', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.step:
+        child(args)
+        return
+
+    steps = ['import', 'export-ndjson', 'export-csv']
+    if not args.skip_jsonify:
+        steps.append('jsonify-all')
+
+    with tempfile.TemporaryDirectory() as workdir:
+        with open(os.path.join(BACKEND_DIR, 'config.json')) as f:
+            config = json.load(f)
+        config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(workdir, 'bench.db')}"
+        config['ADMIN_EXPORT_BATCH_SIZE'] = args.batch_size
+        # Pages of a memory-mapped SQLite file count towards RSS although
+        # they are shared page cache; without mmap the peak is our own memory
+        config.setdefault('DATABASE', {}).setdefault('sqlite', {})['mmap_size'] = 0
+        with open(os.path.join(workdir, 'config.json'), 'w') as f:
+            json.dump(config, f)
+        write_input(os.path.join(workdir, 'users.ndjson'), args.rows)
+
+        for step in steps:
+            output = subprocess.run(
+                [sys.executable, __file__, '--step', step, '--workdir', workdir,
+                 '--batch-size', str(args.batch_size)],
+                capture_output=True, text=True, check=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            print(f"{result['step']:>14}: {result['rows']:>9} rows  {result['seconds']:7.2f} s  "
+                  f"{result['rows_per_second']:>9.0f} rows/s  {result['megabytes']:7.1f} MB  "
+                  f"peak RSS {result['peak_rss_mb']:7.1f} MB (baseline {result['baseline_rss_mb']:.1f} MB)")
+
+
+if __name__ == '__main__':
+    main()
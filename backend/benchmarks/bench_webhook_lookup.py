@@ -0,0 +1,86 @@
+"""Webhook customer_id lookup time with and without the user indexes.
+
+Usage (from the backend directory):
+
+    python benchmarks/bench_webhook_lookup.py --rows 1000000 --lookups 50
+
+Builds the user table from the model in a temporary SQLite file, first
+without any secondary index (the schema before the indexes migration),
+times the lookup the webhook drain runs for each customer, then creates
+the model's indexes and times it again.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import bindparam, create_engine, insert, select  # noqa: E402
+from sqlalchemy.schema import CreateTable  # noqa: E402
+from user import User  # noqa: E402
+
+table = User.__table__
+
+
+def populate(engine, rows, chunk=50000):
+    with engine.begin() as conn:
+        conn.execute(CreateTable(table))
+        for start in range(0, rows, chunk):
+            conn.execute(insert(table), [
+                {
+                    "id": i + 1,
+                    "email": f"user{i}@example.com",
+                    "password_hash": None,
+                    "customer_id": f"cus_{i:010d}",
+                    "subscription_id": f"sub_{i:010d}",
+                    "subscription_status": "active" if i % 3 else "canceled",
+                    "token_version": 0,
+                }
+                for i in range(start, min(start + chunk, rows))
+            ])
+
+
+def time_lookups(engine, customer_ids):
+    query = select(table.c.id, table.c.subscription_status).where(table.c.customer_id == bindparam('customer_id'))
+    timings = []
+    with engine.connect() as conn:
+        for customer_id in customer_ids:
+            start = time.perf_counter()
+            conn.execute(query, {"customer_id": customer_id}).first()
+            timings.append(time.perf_counter() - start)
+    timings.sort()
+    return timings[len(timings) // 2], sum(timings) / len(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--lookups', type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        engine = create_engine(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+
+        start = time.perf_counter()
+        populate(engine, args.rows)
+        print(f"populated {args.rows} rows in {time.perf_counter() - start:.1f} s")
+
+        customer_ids = [f"cus_{random.randrange(args.rows):010d}" for _ in range(args.lookups)]
+        median, mean = time_lookups(engine, customer_ids)
+        print(f"no index:  median {median * 1000:9.3f} ms  mean {mean * 1000:9.3f} ms")
+
+        start = time.perf_counter()
+        for index in table.indexes:
+            index.create(engine)
+        print(f"created {len(table.indexes)} indexes in {time.perf_counter() - start:.1f} s")
+
+        median_indexed, mean_indexed = time_lookups(engine, customer_ids)
+        print(f"indexed:   median {median_indexed * 1000:9.3f} ms  mean {mean_indexed * 1000:9.3f} ms")
+        print(f"speedup:   {median / median_indexed:.0f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+"""Load test the API against a fresh database and the local Stripe stub.
+
+Usage (from the backend directory):
+
+    python benchmarks/loadtest.py --scenario mixed --duration 20 --concurrency 16
+    python benchmarks/loadtest.py --scenario subscribe --stripe-latency-ms 120
+    python benchmarks/loadtest.py --compare results/old.json results/new.json
+
+The app built by create_app() is served in-process by a threaded werkzeug server on
+a temporary SQLite database, with Stripe pointed at benchmarks/stripe_stub.py
+and Celery running eagerly. Load generator threads run in the same
+process. That is what makes per-request query counts and CPU time
+measurable, but it also means absolute RPS is lower than a gunicorn
+deployment: compare runs with each other rather than with production.
+
+Results are written as JSON to benchmarks/results/ (or --output) so runs
+from different commits can be compared with --compare.
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+sys.path.insert(0, BACKEND_DIR)
+
+from stripe_stub import StripeStub  # noqa: E402
+
+WEBHOOK_SECRET = 'whsec_bench'
+PASSWORD = 'bench-password'
+
+# Relative weights of the actions each scenario drives
+SCENARIOS = {
+    'login_storm': {'login': 1},
+    'me_polling': {'me': 1},
+    'subscribe': {'subscribe': 1},
+    'webhook_burst': {'webhook': 1},
+    'mixed': {'me': 70, 'login': 10, 'subscribe': 5, 'webhook': 15},
+}
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def sign_webhook(payload, secret=WEBHOOK_SECRET):
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return f"t={timestamp},v1={signature}"
+
+
+class RouteStats:
+    """Per-route DB query counts and CPU time, collected inside the app."""
+
+    def __init__(self):
+        self.routes = defaultdict(lambda: {'requests': 0, 'queries': 0, 'cpu_seconds': 0.0})
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def install(self, app, engine):
+        from flask import request
+        from sqlalchemy import event
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def count_query(*args):
+            self._local.queries = getattr(self._local, 'queries', 0) + 1
+
+        @app.before_request
+        def start_request():
+            self._local.queries = 0
+            self._local.cpu = time.thread_time()
+
+        @app.teardown_request
+        def finish_request(exc):
+            if not hasattr(self._local, 'cpu'):
+                return
+            route = f"{request.method} {request.url_rule.rule if request.url_rule else request.path}"
+            with self._lock:
+                stats = self.routes[route]
+                stats['requests'] += 1
+                stats['queries'] += self._local.queries
+                stats['cpu_seconds'] += time.thread_time() - self._local.cpu
+            del self._local.cpu
+
+    def report(self):
+        with self._lock:
+            return {
+                route: {
+                    'requests': stats['requests'],
+                    'queries_per_request': stats['queries'] / stats['requests'],
+                    'cpu_ms_per_request': stats['cpu_seconds'] * 1000 / stats['requests'],
+                }
+                for route, stats in sorted(self.routes.items())
+            }
+
+
+def start_app(args, workdir, stub):
+    with open(os.path.join(BACKEND_DIR, 'config.json')) as f:
+        config = json.load(f)
+    config.update({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'CELERY_BROKER_URL': 'memory://',
+        'CELERY_RESULT_BACKEND': 'cache+memory://',
+        'CELERY_TASK_ALWAYS_EAGER': True,
+        'STRIPE': dict(config.get('STRIPE', {}), api_base=stub.url, max_retries=0),
+        # Every request comes from 127.0.0.1; re-enable with --config-override
+        'RATE_LIMITS': dict(config.get('RATE_LIMITS', {}), enabled=False),
+    })
+    config.update(json.loads(args.config_override or '{}'))
+
+    os.environ.update({
+        'STRIPE_SECRET': 'sk_test_bench',
+        'STRIPE_WEBHOOK_SECRET': WEBHOOK_SECRET,
+        'PRICE_ID': 'price_bench',
+        'PRICE_ID_TEST': 'price_bench',
+    })
+
+    import logging
+    from werkzeug.serving import make_server
+    # Per-request access logs would dominate the output
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    from app import create_app
+    from extensions import db
+
+    app = create_app(config)
+    route_stats = RouteStats()
+    with app.app_context():
+        db.create_all()
+        route_stats.install(app, db.engine)
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='api-server', daemon=True).start()
+    return app, server, route_stats
+
+
+def seed_users(app, count):
+    """Insert subscribed users directly and mint their tokens, skipping the KDF per user."""
+    from sqlalchemy import insert
+    from extensions import db, password_hasher
+    from user import User, create_user_token
+
+    with app.app_context():
+        password_hash = password_hasher.hash(PASSWORD)
+        db.session.execute(insert(User), [
+            {
+                'email': f'seed{i}@example.com',
+                'password_hash': password_hash,
+                'customer_id': f'cus_seed{i:08d}',
+                'subscription_id': f'sub_seed{i:08d}',
+                'subscription_status': 'active',
+            }
+            for i in range(count)
+        ])
+        db.session.commit()
+        users = User.query.order_by(User.id).all()
+        return [{'email': u.email, 'customer_id': u.customer_id, 'token': create_user_token(u)} for u in users]
+
+
+class LoadDriver:
+    def __init__(self, base_url, users, weights):
+        self.base_url = base_url
+        self.users = users
+        self.actions = list(weights)
+        self.weights = list(weights.values())
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.throttled = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, action, started, response):
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            self.samples[action].append(elapsed)
+            if response.status_code == 429:
+                self.throttled[action] += 1
+            elif response.status_code >= 400:
+                self.errors[action] += 1
+
+    def run(self, concurrency, duration):
+        deadline = time.perf_counter() + duration
+        threads = [threading.Thread(target=self._worker, args=(deadline,)) for _ in range(concurrency)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - started
+
+    def _worker(self, deadline):
+        import requests
+
+        session = requests.Session()
+        while time.perf_counter() < deadline:
+            action = random.choices(self.actions, self.weights)[0]
+            getattr(self, f'_{action}')(session)
+
+    def _login(self, session):
+        user = random.choice(self.users)
+        started = time.perf_counter()
+        response = session.post(f'{self.base_url}/login', json={'email': user['email'], 'password': PASSWORD})
+        self.record('login', started, response)
+
+    def _me(self, session):
+        user = random.choice(self.users)
+        started = time.perf_counter()
+        response = session.get(f'{self.base_url}/me', headers={'Authorization': f"Bearer {user['token']}"})
+        self.record('me', started, response)
+
+    def _subscribe(self, session):
+        email = f'new-{uuid.uuid4().hex}@example.com'
+        started = time.perf_counter()
+        response = session.post(f'{self.base_url}/register', json={'email': email, 'password': PASSWORD})
+        self.record('register', started, response)
+        if response.status_code != 201:
+            return
+        started = time.perf_counter()
+        response = session.post(
+            f'{self.base_url}/subscribe',
+            json={'paymentMethodId': f'pm_{uuid.uuid4().hex[:12]}'},
+            headers={'Authorization': f"Bearer {response.json()['token']}"}
+        )
+        self.record('subscribe', started, response)
+
+    def _webhook(self, session):
+        user = random.choice(self.users)
+        event_type, status = random.choice([
+            ('invoice.payment_succeeded', None),
+            ('invoice.payment_failed', None),
+            ('customer.subscription.updated', random.choice(['active', 'past_due'])),
+        ])
+        event = {
+            'id': f'evt_{uuid.uuid4().hex}',
+            'object': 'event',
+            'type': event_type,
+            'created': int(time.time()),
+            'data': {'object': {'customer': user['customer_id'], **({'status': status} if status else {})}},
+        }
+        payload = json.dumps(event)
+        started = time.perf_counter()
+        response = session.post(f'{self.base_url}/webhook', data=payload, headers={
+            'Content-Type': 'application/json',
+            'Stripe-Signature': sign_webhook(payload),
+        })
+        self.record('webhook', started, response)
+
+    def report(self, elapsed):
+        return {
+            action: {
+                'requests': len(samples),
+                'errors': self.errors[action],
+                'throttled': self.throttled[action],
+                'rps': len(samples) / elapsed,
+                'p50_ms': percentile(samples, 50) * 1000,
+                'p95_ms': percentile(samples, 95) * 1000,
+                'p99_ms': percentile(samples, 99) * 1000,
+            }
+            for action, samples in sorted(self.samples.items())
+        }
+
+
+def print_report(result):
+    print(f"scenario {result['scenario']} @ {result['commit']}: "
+          f"{result['total_rps']:.1f} req/s over {result['elapsed_seconds']:.1f} s")
+    print(f"{'action':>12} {'requests':>9} {'errors':>7} {'429s':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for action, stats in result['actions'].items():
+        print(f"{action:>12} {stats['requests']:>9} {stats['errors']:>7} {stats.get('throttled', 0):>6} {stats['rps']:>8.1f} "
+              f"{stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+    print(f"\n{'route':>34} {'requests':>9} {'queries/req':>12} {'cpu ms/req':>11}")
+    for route, stats in result['routes'].items():
+        print(f"{route:>34} {stats['requests']:>9} {stats['queries_per_request']:>12.2f} "
+              f"{stats['cpu_ms_per_request']:>11.2f}")
+    print(f"\nstripe calls: {json.dumps(result['stripe_calls'])}")
+
+
+def compare(baseline_path, candidate_path):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    with open(candidate_path) as f:
+        candidate = json.load(f)
+    print(f"{baseline['commit']} -> {candidate['commit']} ({candidate['scenario']})")
+    for action, new in candidate['actions'].items():
+        old = baseline['actions'].get(action)
+        if not old:
+            continue
+        print(f"{action:>12}: rps {old['rps']:8.1f} -> {new['rps']:8.1f}  "
+              f"p50 {old['p50_ms']:8.2f} -> {new['p50_ms']:8.2f} ms  "
+              f"p99 {old['p99_ms']:8.2f} -> {new['p99_ms']:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='mixed')
+    parser.add_argument('--duration', type=float, default=20, help='seconds of load')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--users', type=int, default=500, help='seeded, already subscribed users')
+    parser.add_argument('--stripe-latency-ms', type=float, default=80)
+    parser.add_argument('--stripe-jitter-ms', type=float, default=20)
+    parser.add_argument('--config-override', help='JSON merged into the app config')
+    parser.add_argument('--output', help='results file (default: benchmarks/results/...)')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CANDIDATE'))
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    import warnings
+    warnings.filterwarnings('ignore')
+
+    stub = StripeStub(latency_ms=args.stripe_latency_ms, jitter_ms=args.stripe_jitter_ms).start()
+    with tempfile.TemporaryDirectory() as workdir:
+        app, server, route_stats = start_app(args, workdir, stub)
+        try:
+            users = seed_users(app, args.users)
+            driver = LoadDriver(f"http://127.0.0.1:{server.server_port}", users, SCENARIOS[args.scenario])
+            elapsed = driver.run(args.concurrency, args.duration)
+        finally:
+            server.shutdown()
+            stub.stop()
+
+    actions = driver.report(elapsed)
+    result = {
+        'commit': git_commit(),
+        'timestamp': datetime.utcnow().isoformat(timespec='seconds') + 'Z',
+        'scenario': args.scenario,
+        'args': {k: v for k, v in vars(args).items() if k not in ('compare', 'output')},
+        'elapsed_seconds': elapsed,
+        'total_rps': sum(a['requests'] for a in actions.values()) / elapsed,
+        'actions': actions,
+        'routes': route_stats.report(),
+        'stripe_calls': dict(stub.state.calls),
+    }
+    print_report(result)
+
+    output = args.output or os.path.join(
+        BENCH_DIR, 'results',
+        f"{datetime.utcnow():%Y%m%dT%H%M%S}-{result['commit']}-{args.scenario}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f"results written to {output}")
+
+
+if __name__ == '__main__':
+    main()
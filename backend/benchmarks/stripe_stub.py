@@ -0,0 +1,220 @@
+"""Local stand-in for the Stripe endpoints the API uses.
+
+Usage (from the backend directory):
+
+    python benchmarks/stripe_stub.py --port 12111 --latency-ms 80
+
+and point the app at it with ``"STRIPE": {"api_base": "http://127.0.0.1:12111"}``.
+Every request sleeps for the configured latency (plus optional jitter)
+before answering, so the app sees realistic Stripe round trips. Responses
+for repeated Idempotency-Keys are replayed like Stripe does.
+"""
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+
+class StripeState:
+    """In-memory customers, payment methods and subscriptions."""
+
+    def __init__(self, subscription_status='active'):
+        self.subscription_status = subscription_status
+        self.customers = {}
+        self.payment_methods = {}
+        self.subscriptions = {}
+        self.idempotent_responses = {}
+        self.calls = Counter()
+        self.lock = threading.Lock()
+        self._ids = itertools.count(1)
+
+    def new_id(self, prefix):
+        return f"{prefix}_stub{next(self._ids):010d}"
+
+    def create_customer(self, params):
+        customer = {
+            "id": self.new_id("cus"),
+            "object": "customer",
+            "email": params.get("email"),
+            "invoice_settings": {"default_payment_method": None},
+        }
+        self.customers[customer["id"]] = customer
+        return customer
+
+    def create_subscription(self, params):
+        subscription_id = self.new_id("sub")
+        status = self.subscription_status
+        subscription = {
+            "id": subscription_id,
+            "object": "subscription",
+            "customer": params.get("customer"),
+            "status": status,
+            "created": int(time.time()),
+            "latest_invoice": {
+                "id": self.new_id("in"),
+                "object": "invoice",
+                "payment_intent": {
+                    "id": self.new_id("pi"),
+                    "object": "payment_intent",
+                    "status": "succeeded" if status == "active" else "requires_payment_method",
+                    "client_secret": f"{subscription_id}_secret",
+                },
+            },
+        }
+        self.subscriptions[subscription_id] = subscription
+        return subscription
+
+
+def _flatten(params):
+    # Stripe form encoding: items[0][price]=x -> {"items[0][price]": "x"}
+    return {key: values[-1] for key, values in params.items()}
+
+
+def make_handler(state, latency, jitter):
+    class StripeStubHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # Headers and body are separate writes; with Nagle on, every
+        # keep-alive response would stall ~40 ms on the client's delayed ACK
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _delay(self):
+            if latency or jitter:
+                time.sleep(max(0.0, latency + random.uniform(-jitter, jitter)))
+
+        def _send(self, status, body):
+            payload = json.dumps(body).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _not_found(self):
+            self._send(404, {"error": {"type": "invalid_request_error", "message": f"No such route: {self.path}"}})
+
+        def do_GET(self):
+            self._delay()
+            url = urlsplit(self.path)
+            query = _flatten(parse_qs(url.query))
+            with state.lock:
+                if url.path == '/v1/customers':
+                    state.calls['customer.list'] += 1
+                    data = [c for c in state.customers.values() if c["email"] == query.get("email")]
+                    return self._send(200, {"object": "list", "data": data, "has_more": False, "url": url.path})
+                match = re.fullmatch(r'/v1/customers/([^/]+)', url.path)
+                if match and match.group(1) in state.customers:
+                    state.calls['customer.retrieve'] += 1
+                    return self._send(200, state.customers[match.group(1)])
+                if url.path == '/v1/subscriptions':
+                    state.calls['subscription.list'] += 1
+                    ordered = sorted(state.subscriptions)
+                    if query.get("starting_after"):
+                        ordered = [s for s in ordered if s > query["starting_after"]]
+                    limit = int(query.get("limit", 10))
+                    page = [state.subscriptions[s] for s in ordered[:limit]]
+                    return self._send(200, {"object": "list", "data": page,
+                                            "has_more": len(ordered) > limit, "url": url.path})
+            self._not_found()
+
+        def do_POST(self):
+            self._delay()
+            length = int(self.headers.get('Content-Length') or 0)
+            params = _flatten(parse_qs(self.rfile.read(length).decode()))
+            key = self.headers.get('Idempotency-Key')
+            path = urlsplit(self.path).path
+            with state.lock:
+                if key and (path, key) in state.idempotent_responses:
+                    state.calls['idempotent_replay'] += 1
+                    return self._send(200, state.idempotent_responses[(path, key)])
+
+                if path == '/v1/customers':
+                    state.calls['customer.create'] += 1
+                    body = state.create_customer(params)
+                elif re.fullmatch(r'/v1/customers/[^/]+', path) and path.rsplit('/', 1)[1] in state.customers:
+                    state.calls['customer.modify'] += 1
+                    body = state.customers[path.rsplit('/', 1)[1]]
+                    default = params.get("invoice_settings[default_payment_method]")
+                    if default:
+                        body["invoice_settings"]["default_payment_method"] = default
+                elif re.fullmatch(r'/v1/payment_methods/[^/]+/attach', path):
+                    state.calls['payment_method.attach'] += 1
+                    payment_method_id = path.split('/')[3]
+                    state.payment_methods[payment_method_id] = params.get("customer")
+                    body = {"id": payment_method_id, "object": "payment_method", "customer": params.get("customer")}
+                elif path == '/v1/subscriptions':
+                    state.calls['subscription.create'] += 1
+                    body = state.create_subscription(params)
+                else:
+                    return self._not_found()
+
+                if key:
+                    state.idempotent_responses[(path, key)] = body
+                self._send(200, body)
+
+        def do_DELETE(self):
+            self._delay()
+            match = re.fullmatch(r'/v1/subscriptions/([^/]+)', urlsplit(self.path).path)
+            with state.lock:
+                if match and match.group(1) in state.subscriptions:
+                    state.calls['subscription.delete'] += 1
+                    subscription = state.subscriptions[match.group(1)]
+                    subscription["status"] = "canceled"
+                    return self._send(200, subscription)
+            self._not_found()
+
+    return StripeStubHandler
+
+
+class StripeStub:
+    """Threaded HTTP server wrapping StripeState."""
+
+    def __init__(self, host='127.0.0.1', port=0, latency_ms=0, jitter_ms=0, subscription_status='active'):
+        self.state = StripeState(subscription_status)
+        handler = make_handler(self.state, latency_ms / 1000, jitter_ms / 1000)
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, name='stripe-stub', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--latency-ms', type=float, default=0)
+    parser.add_argument('--jitter-ms', type=float, default=0)
+    parser.add_argument('--subscription-status', default='active')
+    args = parser.parse_args()
+
+    stub = StripeStub(args.host, args.port, args.latency_ms, args.jitter_ms, args.subscription_status)
+    print(f"Stripe stub listening on {stub.url}")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+
+class TwoTierCache:
+    """In-process LRU/TTL cache with an optional shared Redis tier.
+
+    Reads check the local tier first, then Redis. Writes go to both tiers and,
+    when Redis is configured, publish an invalidation message so that the
+    local tiers of the other worker processes drop their copy of the key.
+    """
+
+    def __init__(self, namespace, config_key):
+        self.namespace = namespace
+        self.config_key = config_key
+        self.max_entries = 10000
+        self.ttl = 30
+        self.redis_ttl = 300
+        self.redis = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._sender_id = uuid.uuid4().hex
+        self._listener_pid = None
+        self._counters = dict.fromkeys(
+            ('hits', 'redis_hits', 'misses', 'evictions', 'expirations',
+             'invalidations', 'redis_errors'), 0)
+
+    def init_app(self, app, redis_client=None):
+        options = app.config.get(self.config_key, {})
+        self.max_entries = options.get('max_entries', self.max_entries)
+        self.ttl = options.get('ttl', self.ttl)
+        self.redis_ttl = options.get('redis_ttl', self.redis_ttl)
+
+        # A client can be passed in directly (e.g. fakeredis in tests)
+        if redis_client is None and options.get('redis_url'):
+            import redis
+            redis_client = redis.Redis.from_url(options['redis_url'])
+        self.redis = redis_client
+        app.extensions[f'{self.namespace}_cache'] = self
+
+    @property
+    def channel(self):
+        return f'{self.namespace}:invalidate'
+
+    def _redis_key(self, key):
+        return f'{self.namespace}:{key}'
+
+    def _count(self, name):
+        self._counters[name] += 1
+
+    def get(self, key):
+        self._ensure_listener()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self._count('hits')
+                    return value
+                del self._entries[key]
+                self._count('expirations')
+
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(self._redis_key(key))
+            except Exception:
+                raw = None
+                self._count('redis_errors')
+            if raw is not None:
+                value = json.loads(raw)
+                self._store_local(key, value)
+                self._count('redis_hits')
+                return value
+
+        self._count('misses')
+        return None
+
+    def set(self, key, value, publish=False):
+        """Store ``value`` in both tiers.
+
+        Pass ``publish=True`` when the value replaces data that other
+        processes may already hold, e.g. after a status change.
+        """
+        self._store_local(key, value)
+        if self.redis is not None:
+            try:
+                self.redis.set(self._redis_key(key), json.dumps(value), ex=self.redis_ttl)
+                if publish:
+                    self._publish(key)
+            except Exception:
+                self._count('redis_errors')
+
+    def fill(self, key, value):
+        """Store ``value`` just loaded after a miss.
+
+        Redis is only written if it holds nothing for the key: a read that
+        started before a concurrent writer's ``set`` may finish after it,
+        and must not replace the newer value.
+        """
+        self._store_local(key, value)
+        if self.redis is not None:
+            try:
+                self.redis.set(self._redis_key(key), json.dumps(value), ex=self.redis_ttl, nx=True)
+            except Exception:
+                self._count('redis_errors')
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._count('invalidations')
+        if self.redis is not None:
+            try:
+                self.redis.delete(self._redis_key(key))
+                self._publish(key)
+            except Exception:
+                self._count('redis_errors')
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counters)
+            stats['size'] = len(self._entries)
+        stats['max_entries'] = self.max_entries
+        stats['redis'] = self.redis is not None
+        return stats
+
+    def _store_local(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._count('evictions')
+
+    def _publish(self, key):
+        self.redis.publish(self.channel, f'{self._sender_id}:{key}')
+
+    def _evict_local(self, key):
+        with self._lock:
+            if self._entries.pop(key, None) is not None:
+                self._count('invalidations')
+
+    def _ensure_listener(self):
+        # Started lazily so that every forked worker gets its own thread
+        if self.redis is None or self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+            # Anything cached before the fork may have missed invalidations
+            self._entries.clear()
+        thread = threading.Thread(target=self._listen, name=f'{self.namespace}-cache-listener', daemon=True)
+        thread.start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    data = message.get('data')
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    if not isinstance(data, str):
+                        continue
+                    sender, _, key = data.partition(':')
+                    if sender != self._sender_id:
+                        self._evict_local(_parse_key(key))
+            except Exception:
+                self._count('redis_errors')
+                # Entries may have gone stale while we were disconnected
+                self.clear()
+                time.sleep(1)
+
+
+def _parse_key(key):
+    return int(key) if key.isdigit() else key
@@ -1,18 +1,107 @@
-from celery import Celery
+import threading
+import time
+
+# Stripe calls, webhook processing and periodic jobs each get a queue, so a
+# backlog of one never delays the others; unrouted tasks use the default one
+QUEUES = ('stripe', 'webhooks', 'maintenance', 'celery')
+TASK_ROUTES = {
+    'tasks.process_subscription_job': {'queue': 'stripe'},
+    'tasks.drain_webhook_events': {'queue': 'webhooks'},
+    'tasks.reconcile_stripe_subscriptions': {'queue': 'maintenance'},
+    'tasks.purge_expired_revocations': {'queue': 'maintenance'},
+}
+
+
+def celery_settings(config):
+    """Celery settings from the app's ``CELERY_*`` keys, e.g. ``CELERY_TASK_ACKS_LATE`` -> ``task_acks_late``."""
+    return {key[len('CELERY_'):].lower(): value for key, value in config.items() if key.startswith('CELERY_')}
+
 
 def make_celery(app):
-    celery = Celery(
-        app.import_name,
-        backend=app.config.get('CELERY_RESULT_BACKEND', 'redis://localhost:6379'),
-        broker=app.config.get('CELERY_BROKER_URL', 'redis://localhost:6379')
-    )
-    
-    celery.conf.update(app.config)
+    # Imported here so that importing app.py doesn't load Celery
+    from celery import Celery
+    from kombu import Exchange, Queue
 
+    settings = celery_settings(app.config)
+    celery = Celery(app.import_name, broker=settings.get('broker_url', 'redis://localhost:6379'))
+    celery.conf.update(
+        task_queues=[Queue(name, Exchange(name), routing_key=name) for name in QUEUES],
+        task_default_queue='celery',
+        task_routes=TASK_ROUTES,
+        # Every task is idempotent, so one lost with its worker is redelivered
+        # rather than dropped; nothing reads task results (job state is in the
+        # database), so none are written unless CELERY_TASK_IGNORE_RESULT is off
+        task_acks_late=True,
+        task_ignore_result=True,
+    )
+    celery.conf.update(settings)
+    # Periodic jobs, run by `celery -A worker.celery beat`
+    beat_schedule = {}
+    interval = app.config.get('RECONCILIATION', {}).get('interval')
+    if interval:
+        beat_schedule['reconcile-stripe-subscriptions'] = {'task': 'tasks.reconcile_stripe_subscriptions', 'schedule': interval}
+    interval = app.config.get('TOKEN_REVOCATION', {}).get('purge_interval')
+    if interval:
+        beat_schedule['purge-expired-revocations'] = {'task': 'tasks.purge_expired_revocations', 'schedule': interval}
+    celery.conf.update(beat_schedule=beat_schedule)
     class ContextTask(celery.Task):
         def __call__(self, *args, **kwargs):
             with app.app_context():
                 return self.run(*args, **kwargs)
-
     celery.Task = ContextTask
-    return celery
\ No newline at end of file
+    # shared_task resolves the current app per thread; make this one the default everywhere
+    celery.set_default()
+    app.extensions['celery'] = celery
+    return celery
+
+
+def apply_worker_profile(celery, profiles, name):
+    """Configure this worker process from the WORKER_PROFILES entry ``name``.
+
+    A profile names the queues the worker consumes and its pool,
+    concurrency and prefetch multiplier; command line options still win.
+    """
+    if name not in profiles:
+        raise KeyError(f"Unknown worker profile {name!r}; configured: {', '.join(sorted(profiles)) or 'none'}")
+    profile = profiles[name]
+    settings = {
+        'worker_pool': profile.get('pool'),
+        'worker_concurrency': profile.get('concurrency'),
+        'worker_prefetch_multiplier': profile.get('prefetch_multiplier'),
+    }
+    celery.conf.update({key: value for key, value in settings.items() if value is not None})
+    if profile.get('queues'):
+        celery.amqp.queues.select(profile['queues'])
+    return profile
+
+
+# Batching
+
+_coalesced_until = {}
+_coalesced_lock = threading.Lock()
+
+
+def delay_coalesced(task, window):
+    """Queue ``task`` to run ``window`` seconds from now, unless this process already did so within that time.
+
+    For tasks that process everything pending, such as the webhook drain: a
+    burst of calls results in one run per window that handles the whole
+    burst in its batches. With ``window`` 0, or when tasks run eagerly, every
+    call queues the task. Returns whether it was queued.
+    """
+    if not window or task.app.conf.task_always_eager:
+        task.delay()
+        return True
+    now = time.monotonic()
+    with _coalesced_lock:
+        if _coalesced_until.get(task.name, 0) > now:
+            return False
+        _coalesced_until[task.name] = now + window
+    try:
+        task.apply_async(countdown=window)
+    except Exception:
+        # Let the next call try again
+        with _coalesced_lock:
+            _coalesced_until.pop(task.name, None)
+        raise
+    return True
\ No newline at end of file
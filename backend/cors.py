@@ -0,0 +1,88 @@
+import re
+
+
+class CORSMiddleware:
+    """WSGI middleware applying the CORS policy to every response.
+
+    Header values are built once at startup. Preflight (OPTIONS) requests
+    are answered here and never reach Flask's routing, and allowed
+    origins are looked up in a set. Entries containing ``*`` are wildcard
+    patterns, e.g. ``https://*.example.com``.
+    """
+
+    # Wildcard-matched origins remembered to skip the regex next time
+    MAX_CACHED_ORIGINS = 1024
+
+    def __init__(self, app, origins, methods, allow_headers, expose_headers=(), max_age=600):
+        self.app = app
+        self.origins = {origin for origin in origins if '*' not in origin}
+        self.patterns = [_compile_pattern(origin) for origin in origins if '*' in origin]
+        self._matched = set()
+
+        self.preflight_headers = [
+            ('Access-Control-Allow-Headers', ', '.join(allow_headers)),
+            ('Access-Control-Allow-Methods', ', '.join(methods)),
+            ('Access-Control-Allow-Credentials', 'true'),
+            ('Access-Control-Max-Age', str(max_age)),
+        ]
+        self.response_headers = [('Access-Control-Allow-Credentials', 'true')]
+        if expose_headers:
+            self.response_headers.append(('Access-Control-Expose-Headers', ', '.join(expose_headers)))
+
+    def is_allowed(self, origin):
+        if origin in self.origins or origin in self._matched:
+            return True
+        for pattern in self.patterns:
+            if pattern.match(origin):
+                if len(self._matched) < self.MAX_CACHED_ORIGINS:
+                    self._matched.add(origin)
+                return True
+        return False
+
+    def headers_for(self, origin):
+        """CORS headers added to a (non-preflight) response for ``origin``; empty if it isn't allowed.
+
+        Every response also gets ``Vary: Origin`` (``add_vary_origin``),
+        since whether these are sent depends on the origin.
+        """
+        if origin is None or not self.is_allowed(origin):
+            return []
+        return [('Access-Control-Allow-Origin', origin)] + self.response_headers
+
+    def __call__(self, environ, start_response):
+        origin = environ.get('HTTP_ORIGIN')
+
+        if environ['REQUEST_METHOD'] == 'OPTIONS':
+            headers = [('Content-Length', '0'), ('Vary', 'Origin')]
+            if origin is not None and self.is_allowed(origin):
+                headers.append(('Access-Control-Allow-Origin', origin))
+                headers.extend(self.preflight_headers)
+            start_response('204 No Content', headers)
+            return []
+
+        cors_headers = self.headers_for(origin)
+
+        def cors_start_response(status, headers, exc_info=None):
+            # Also without CORS headers, so that no cache serves this response to another origin
+            add_vary_origin(headers)
+            headers.extend(cors_headers)
+            return start_response(status, headers, exc_info)
+
+        return self.app(environ, cors_start_response)
+
+
+def add_vary_origin(headers):
+    """Add ``Origin`` to the ``Vary`` header in a WSGI ``headers`` list."""
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == 'vary':
+            fields = {field.strip().lower() for field in value.split(',')}
+            if not fields & {'origin', '*'}:
+                headers[index] = (name, f'{value}, Origin')
+            return
+    headers.append(('Vary', 'Origin'))
+
+
+def _compile_pattern(origin):
+    # "*" stands for one or more subdomain labels
+    parts = [re.escape(part) for part in origin.split('*')]
+    return re.compile('^' + r'[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*'.join(parts) + '$')
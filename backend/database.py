@@ -0,0 +1,80 @@
+import threading
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+# Pragmas applied to every new SQLite connection; WAL lets readers and a
+# writer work concurrently instead of failing with "database is locked"
+SQLITE_DEFAULTS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'mmap_size': 268435456,
+}
+
+POOL_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle', 'pool_pre_ping', 'pool_use_lifo')
+
+
+def is_sqlite(uri):
+    return make_url(uri).get_backend_name() == 'sqlite'
+
+
+def engine_options(uri, options):
+    """Build SQLALCHEMY_ENGINE_OPTIONS from the DATABASE config section."""
+    if is_sqlite(uri):
+        pragmas = dict(SQLITE_DEFAULTS, **options.get('sqlite', {}))
+        # The driver's own lock wait, in seconds, matching busy_timeout
+        return {'connect_args': {'timeout': pragmas['busy_timeout'] / 1000}}
+
+    pool = options.get('pool', {})
+    return {name: pool[name] for name in POOL_OPTIONS if name in pool}
+
+
+def install_sqlite_pragmas(engine, options):
+    pragmas = dict(SQLITE_DEFAULTS, **options.get('sqlite', {}))
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            if value is not None:
+                cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+
+class PoolStats:
+    """Connection pool counters for one engine, reported on /health."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(('connects', 'checkouts', 'checkins', 'invalidations'), 0)
+        for name, counter in (('connect', 'connects'), ('checkout', 'checkouts'),
+                              ('checkin', 'checkins'), ('invalidate', 'invalidations')):
+            event.listen(engine, name, self._counter(counter))
+
+    def _counter(self, name):
+        def increment(*args):
+            with self._lock:
+                self._counters[name] += 1
+        return increment
+
+    def snapshot(self):
+        pool = self.engine.pool
+        with self._lock:
+            stats = dict(self._counters)
+        stats['pool'] = type(pool).__name__
+        # Only QueuePool and friends report sizing
+        for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+            if hasattr(pool, name):
+                stats[name] = getattr(pool, name)()
+        return stats
+
+
+def init_engine(app, engine, name='primary'):
+    """Apply connect-time tuning to ``engine`` and start collecting pool stats."""
+    options = app.config.get('DATABASE', {})
+    if engine.dialect.name == 'sqlite':
+        install_sqlite_pragmas(engine, options)
+    stats = PoolStats(engine)
+    app.extensions.setdefault('pool_stats', {})[name] = stats
+    return stats
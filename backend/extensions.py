@@ -1,3 +1,33 @@
 from flask_sqlalchemy import SQLAlchemy
+from flask_jwt_extended import JWTManager
+from cache import TwoTierCache
+from passwords import PasswordHasher
+from stripe_client import StripeClient
+from metrics import Metrics
+from async_db import AsyncDatabase
+from profiling import Profiler
+from replicas import ReadReplicas, RoutingSession
+from ratelimit import RateLimiter
 
-db = SQLAlchemy()
\ No newline at end of file
+# Queries of read-only views go to a replica when READ_REPLICAS lists any
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+jwt = JWTManager()
+subscription_cache = TwoTierCache('subscription', config_key='SUBSCRIPTION_CACHE')
+# Kept per process for a short ttl, which bounds how long a status change made
+# in another process (e.g. a webhook drain in a Celery worker) goes unseen
+# without the Redis tier
+token_versions = TwoTierCache('token_version', config_key='TOKEN_VERSION_CACHE')
+# Stripe customer id -> its default payment method id
+payment_method_cache = TwoTierCache('payment_method', config_key='PAYMENT_METHOD_CACHE')
+# Users who just wrote, whose reads stay on the primary for the cache's ttl
+recent_writes = TwoTierCache('recent_write', config_key='RECENT_WRITES_CACHE')
+password_hasher = PasswordHasher()
+metrics = Metrics()
+# Opt-in sampled request profiling, results under /admin/profiles
+profiler = Profiler()
+stripe_client = StripeClient(metrics.registry)
+# Sliding-window limits on the password endpoints, per IP and per email
+rate_limiter = RateLimiter(metrics.registry)
+# Async sessions for the ASGI app's views
+async_db = AsyncDatabase(metrics)
+read_replicas = ReadReplicas(recent_writes, metrics)
\ No newline at end of file
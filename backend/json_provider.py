@@ -0,0 +1,88 @@
+import json
+from flask import current_app
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Flask's stdlib-based serialization is used instead
+    orjson = None
+
+MIMETYPE = 'application/json'
+
+
+def _orjson_dumps(obj, default=None, sort_keys=True, indent=False):
+    # Dates go to ``default`` so they keep Flask's HTTP date format
+    option = orjson.OPT_PASSTHROUGH_DATETIME
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    if indent:
+        option |= orjson.OPT_INDENT_2
+    return orjson.dumps(obj, default=default, option=option)
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider serializing with orjson when it is installed.
+
+    Output is what DefaultJSONProvider produces (sorted keys, compact
+    unless in debug mode, dates as HTTP dates), except that non-ASCII
+    characters are written as UTF-8 rather than ``\\u`` escapes, with the
+    stdlib fallback too. Values orjson refuses, such as integers beyond 64
+    bits or non-string keys, are serialized by the stdlib. Responses are
+    encoded straight to bytes.
+    """
+
+    ensure_ascii = False
+
+    def __init__(self, app, use_orjson=True):
+        super().__init__(app)
+        self.use_orjson = use_orjson and orjson is not None
+
+    def dumps_bytes(self, obj, indent=False):
+        """Serialize ``obj`` to UTF-8 bytes."""
+        if self.use_orjson:
+            try:
+                return _orjson_dumps(obj, self.default, self.sort_keys, indent)
+            except TypeError:
+                pass
+        separators = None if indent else (',', ':')
+        return super().dumps(obj, indent=2 if indent else None, separators=separators).encode()
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return self.dumps_bytes(obj).decode()
+
+    def loads(self, s, **kwargs):
+        if self.use_orjson and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # content_type rather than mimetype: no charset to add for JSON, and cheaper
+        return self._app.response_class(self.dumps_bytes(obj, indent) + b'\n', content_type=self.mimetype)
+
+
+def serialize_constant(obj):
+    """``obj`` as the compact, sorted UTF-8 JSON body jsonify() would send."""
+    if orjson is not None:
+        body = _orjson_dumps(obj)
+    else:
+        body = json.dumps(obj, ensure_ascii=False, sort_keys=True, separators=(',', ':')).encode()
+    return body + b'\n'
+
+
+class ConstantJSON:
+    """A JSON response whose body never changes, serialized once at import.
+
+    Each call returns a new response, so views can still set cookies or
+    headers on it.
+    """
+
+    def __init__(self, obj, status=200):
+        self.status = status
+        self.body = serialize_constant(obj)
+
+    def __call__(self):
+        return current_app.response_class(self.body, status=self.status, content_type=MIMETYPE)
\ No newline at end of file
@@ -0,0 +1,372 @@
+import bisect
+import contextvars
+import glob
+import json
+import os
+import threading
+import time
+
+# Latency buckets in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Thread-safe cumulative histogram of observed values."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+
+    def snapshot(self):
+        with self._lock:
+            counts = list(self._counts)
+            total = self._sum
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return {
+            "count": running,
+            "sum": total,
+            "buckets": dict(zip([str(b) for b in self.buckets] + ["+Inf"], cumulative))
+        }
+
+
+class Value:
+    """Counter or gauge value."""
+
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount=1):
+        with self._lock:
+            self._value -= amount
+
+    def set(self, value):
+        with self._lock:
+            self._value = value
+
+    def snapshot(self):
+        return self._value
+
+
+class MetricFamily:
+    """A named metric with one child per combination of label values."""
+
+    def __init__(self, name, kind, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.kind = kind
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = Histogram(self.buckets) if self.kind == 'histogram' else Value()
+                    self._children[values] = child
+        return child
+
+    def children(self):
+        return list(self._children.items())
+
+    def snapshot(self):
+        return {
+            "kind": self.kind,
+            "help": self.help,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(values), child.snapshot()] for values, child in self.children()]
+        }
+
+
+class Registry:
+    def __init__(self):
+        self._families = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    def _family(self, name, kind, help, labelnames, **kwargs):
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(name, kind, help, labelnames, **kwargs)
+            return family
+
+    def counter(self, name, help, labelnames=()):
+        return self._family(name, 'counter', help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._family(name, 'gauge', help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._family(name, 'histogram', help, labelnames, buckets=buckets)
+
+    def collector(self, func):
+        """Register ``func()`` to refresh gauges/counters right before a snapshot."""
+        self._collectors.append(func)
+        return func
+
+    def snapshot(self):
+        for collect in self._collectors:
+            collect()
+        return {name: family.snapshot() for name, family in list(self._families.items())}
+
+
+def merge_snapshots(snapshots):
+    """Sum counters, gauges and histogram buckets across process snapshots."""
+    merged = {}
+    for snapshot in snapshots:
+        for name, family in snapshot.items():
+            target = merged.setdefault(name, dict(family, samples={}))
+            for values, value in family["samples"]:
+                key = tuple(values)
+                current = target["samples"].get(key)
+                if current is None:
+                    target["samples"][key] = value
+                elif family["kind"] == "histogram":
+                    target["samples"][key] = {
+                        "count": current["count"] + value["count"],
+                        "sum": current["sum"] + value["sum"],
+                        "buckets": {le: current["buckets"][le] + count for le, count in value["buckets"].items()}
+                    }
+                else:
+                    target["samples"][key] = current + value
+    return merged
+
+
+def render_text(families):
+    """Render merged families in the Prometheus text exposition format."""
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        labelnames = family["labelnames"]
+        for values, value in sorted(family["samples"].items()):
+            labels = [f'{label}="{_escape(v)}"' for label, v in zip(labelnames, values)]
+            suffix = _label_set(labels)
+            if family["kind"] == "histogram":
+                for le, count in value["buckets"].items():
+                    bucket_labels = _label_set(labels + ['le="%s"' % le])
+                    lines.append(f"{name}_bucket{bucket_labels} {count}")
+                lines.append(f"{name}_sum{suffix} {value['sum']}")
+                lines.append(f"{name}_count{suffix} {value['count']}")
+            else:
+                lines.append(f"{name}{suffix} {value}")
+    return "\n".join(lines) + "\n"
+
+
+def _label_set(labels):
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class Metrics:
+    """Request, database, Stripe and Celery instrumentation exposed on /metrics.
+
+    Each process records into its own registry. With ``multiproc_dir``
+    configured (gunicorn), every process periodically writes a snapshot
+    file there and /metrics merges the files of all processes. Gauges of
+    processes that have exited are dropped; their counters are kept.
+    """
+
+    def __init__(self):
+        self.registry = Registry()
+        self.multiproc_dir = None
+        self.flush_interval = 5
+        self._flusher_pid = None
+        self._celery_instrumented = False
+        # Per request; a context variable rather than a thread local so that
+        # concurrent requests on one event loop (asgi.py) don't share it
+        self._request = contextvars.ContextVar('metrics_request', default=None)
+
+        self.requests = self.registry.counter(
+            'http_requests_total', 'HTTP requests by route and status', ['blueprint', 'route', 'method', 'status'])
+        self.request_latency = self.registry.histogram(
+            'http_request_duration_seconds', 'HTTP request latency', ['blueprint', 'route', 'method'])
+        self.in_flight = self.registry.gauge('http_requests_in_flight', 'Requests currently being handled')
+        self.db_latency = self.registry.histogram(
+            'db_query_duration_seconds', 'SQL statement latency', ['statement'])
+        self.db_queries = self.registry.histogram(
+            'db_queries_per_request', 'SQL statements executed per HTTP request', ['route'],
+            buckets=(0, 1, 2, 3, 5, 8, 13, 21, 50))
+        self.task_queue_time = self.registry.histogram(
+            'celery_task_queue_seconds', 'Time tasks waited in the queue', ['task'])
+        self.task_run_time = self.registry.histogram(
+            'celery_task_run_seconds', 'Task run time', ['task', 'state'])
+
+    def init_app(self, app):
+        options = app.config.get('METRICS', {})
+        self.multiproc_dir = options.get('multiproc_dir') or os.environ.get('METRICS_MULTIPROC_DIR')
+        self.flush_interval = options.get('flush_interval', self.flush_interval)
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        app.teardown_request(self._teardown_request)
+        app.extensions['metrics'] = self
+
+    # HTTP requests
+
+    def _before_request(self):
+        self._ensure_flusher()
+        self.in_flight.labels().inc()
+        self._request.set({'started': time.perf_counter(), 'queries': 0})
+
+    def _after_request(self, response):
+        from flask import request
+
+        state = self._request.get()
+        if state is not None:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            blueprint = request.blueprint or ''
+            self.request_latency.labels(blueprint, route, request.method).observe(time.perf_counter() - state['started'])
+            self.requests.labels(blueprint, route, request.method, str(response.status_code)).inc()
+            self.db_queries.labels(route).observe(state['queries'])
+        return response
+
+    def _teardown_request(self, exc):
+        if self._request.get() is not None:
+            self.in_flight.labels().dec()
+            self._request.set(None)
+
+    # SQLAlchemy
+
+    def instrument_engine(self, engine):
+        from sqlalchemy import event
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault('query_start', []).append(time.perf_counter())
+
+        @event.listens_for(engine, 'after_cursor_execute')
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            elapsed = time.perf_counter() - conn.info['query_start'].pop()
+            verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else 'OTHER'
+            self.db_latency.labels(verb).observe(elapsed)
+            state = self._request.get()
+            if state is not None:
+                state['queries'] += 1
+
+        @event.listens_for(engine, 'handle_error')
+        def handle_error(context):
+            # A failed statement never reaches after_cursor_execute; drop its start time
+            conn = context.connection
+            if conn is not None and conn.info.get('query_start'):
+                conn.info['query_start'].pop()
+
+    # Celery
+
+    def instrument_celery(self):
+        from celery import signals
+
+        # Signal receivers are process-wide; connect them once
+        if self._celery_instrumented:
+            return
+        self._celery_instrumented = True
+
+        @signals.before_task_publish.connect(weak=False)
+        def stamp_publish_time(headers=None, **kwargs):
+            if headers is not None:
+                headers['published_at'] = time.time()
+
+        @signals.task_prerun.connect(weak=False)
+        def task_started(task=None, **kwargs):
+            # Worker processes serve no requests, so their flusher starts here
+            self._ensure_flusher()
+            published_at = getattr(task.request, 'published_at', None)
+            if published_at:
+                self.task_queue_time.labels(task.name).observe(max(0.0, time.time() - published_at))
+            task.request.metrics_started = time.perf_counter()
+
+        @signals.task_postrun.connect(weak=False)
+        def task_finished(task=None, state=None, **kwargs):
+            started = getattr(task.request, 'metrics_started', None)
+            if started is not None:
+                self.task_run_time.labels(task.name, state or 'UNKNOWN').observe(time.perf_counter() - started)
+
+        @signals.worker_process_shutdown.connect(weak=False)
+        @signals.worker_shutdown.connect(weak=False)
+        def worker_stopped(**kwargs):
+            # Keep what was counted since the last periodic flush
+            if self.multiproc_dir:
+                try:
+                    self.flush()
+                except OSError:
+                    pass
+
+    # Exposition
+
+    def render(self):
+        if not self.multiproc_dir:
+            return render_text(merge_snapshots([self.registry.snapshot()]))
+
+        self.flush()
+        snapshots = []
+        for path in glob.glob(os.path.join(self.multiproc_dir, 'metrics-*.json')):
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            families = data['families']
+            if not _pid_alive(data['pid']):
+                families = {name: family for name, family in families.items() if family['kind'] != 'gauge'}
+            snapshots.append(families)
+        return render_text(merge_snapshots(snapshots))
+
+    def flush(self):
+        """Write this process's snapshot to the shared directory."""
+        path = os.path.join(self.multiproc_dir, f'metrics-{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump({"pid": os.getpid(), "families": self.registry.snapshot()}, f)
+        os.replace(tmp_path, path)
+
+    def _ensure_flusher(self):
+        # One flusher thread per (forked) process
+        if not self.multiproc_dir or self._flusher_pid == os.getpid():
+            return
+        self._flusher_pid = os.getpid()
+        threading.Thread(target=self._flush_forever, name='metrics-flusher', daemon=True).start()
+
+    def _flush_forever(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except OSError:
+                pass
\ No newline at end of file
@@ -0,0 +1,30 @@
+"""index user customer/subscription lookups
+
+Revision ID: 2a31a248f044
+Revises: 5e9818def547
+Create Date: 2026-10-17 09:15:32.018477
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a31a248f044'
+down_revision = '5e9818def547'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_user_customer_id'), ['customer_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_user_subscription_id'), ['subscription_id'], unique=False)
+        batch_op.create_index('ix_user_subscription_status_id', ['subscription_status', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_subscription_status_id')
+        batch_op.drop_index(batch_op.f('ix_user_subscription_id'))
+        batch_op.drop_index(batch_op.f('ix_user_customer_id'))
@@ -0,0 +1,65 @@
+"""token version, subscription jobs and webhook events
+
+Revision ID: 5e9818def547
+Revises: f39525b595e8
+Create Date: 2026-10-17 09:14:05.671930
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5e9818def547'
+down_revision = 'f39525b595e8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), nullable=False, server_default='0'))
+
+    op.create_table('subscription_job',
+    sa.Column('id', sa.String(length=32), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=32), nullable=False),
+    sa.Column('payment_method_id', sa.String(length=120), nullable=False),
+    sa.Column('price_id', sa.String(length=120), nullable=True),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('customer_id', sa.String(length=120), nullable=True),
+    sa.Column('subscription_id', sa.String(length=120), nullable=True),
+    sa.Column('result', sa.Text(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('webhook_event',
+    sa.Column('id', sa.String(length=255), nullable=False),
+    sa.Column('type', sa.String(length=100), nullable=False),
+    sa.Column('customer_id', sa.String(length=120), nullable=True),
+    sa.Column('status', sa.String(length=50), nullable=True),
+    sa.Column('created', sa.Integer(), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('received_at', sa.DateTime(), nullable=False),
+    sa.Column('batch_id', sa.String(length=32), nullable=True),
+    sa.Column('processed_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('webhook_event', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_webhook_event_customer_id'), ['customer_id'], unique=False)
+        batch_op.create_index(batch_op.f('ix_webhook_event_processed_at'), ['processed_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('webhook_event', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_webhook_event_processed_at'))
+        batch_op.drop_index(batch_op.f('ix_webhook_event_customer_id'))
+
+    op.drop_table('webhook_event')
+    op.drop_table('subscription_job')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('token_version')
@@ -0,0 +1,39 @@
+"""subscription reconciliation runs
+
+Revision ID: 716d19380ef2
+Revises: 7a7cc7962cc2
+Create Date: 2026-10-17 04:52:00.133049
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '716d19380ef2'
+down_revision = '7a7cc7962cc2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('reconciliation_run',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('cursor', sa.String(length=255), nullable=True),
+    sa.Column('pages', sa.Integer(), nullable=False),
+    sa.Column('scanned', sa.Integer(), nullable=False),
+    sa.Column('drifted', sa.Integer(), nullable=False),
+    sa.Column('updated', sa.Integer(), nullable=False),
+    sa.Column('adopted', sa.Integer(), nullable=False),
+    sa.Column('unmatched', sa.Integer(), nullable=False),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('started_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('reconciliation_run')
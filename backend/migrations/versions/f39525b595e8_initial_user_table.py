@@ -0,0 +1,33 @@
+"""initial user table
+
+Revision ID: f39525b595e8
+Revises: 
+Create Date: 2026-10-17 09:12:41.204113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f39525b595e8'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('password_hash', sa.String(length=256), nullable=True),
+    sa.Column('customer_id', sa.String(length=120), nullable=False),
+    sa.Column('subscription_id', sa.String(length=120), nullable=False),
+    sa.Column('subscription_status', sa.String(length=50), nullable=False),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('email')
+    )
+
+
+def downgrade():
+    op.drop_table('user')
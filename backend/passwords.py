@@ -0,0 +1,89 @@
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from werkzeug.security import generate_password_hash, check_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when the hashing pool queue is full or a hash takes longer than ``timeout``."""
+
+
+class PasswordHasher:
+    """Password hashing backend with an optional bounded process pool.
+
+    With ``pool_workers`` set to 0 hashes are computed on the request thread,
+    otherwise they are handed to a process pool that accepts at most
+    ``pool_workers + max_queue`` outstanding jobs before rejecting new ones.
+    """
+
+    def __init__(self):
+        self.method = 'scrypt'
+        self.pool_workers = 0
+        self.max_queue = 64
+        self.timeout = 10
+        self._canonical_method = None
+        self._executor = None
+        self._executor_pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        options = app.config.get('PASSWORD_HASHING', {})
+        method = options.get('algorithm', 'scrypt')
+        iterations = options.get('iterations')
+        # werkzeug encodes the pbkdf2 iteration count in the method string
+        if iterations and method.startswith('pbkdf2') and method.count(':') == 1:
+            method = f'{method}:{iterations}'
+        self.method = method
+        self.pool_workers = options.get('pool_workers', 0)
+        self.max_queue = options.get('max_queue', 64)
+        self.timeout = options.get('timeout', 10)
+        self._canonical_method = None
+        app.extensions['password_hasher'] = self
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def check(self, password_hash, password):
+        # Users without a hash (e.g. bulk imported) have no password to match
+        if not password_hash:
+            return False
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True when the stored hash was made with different parameters."""
+        if not password_hash:
+            return False
+        if self._canonical_method is None:
+            # Let werkzeug fill in its defaults, e.g. "scrypt" -> "scrypt:32768:8:1"
+            self._canonical_method = generate_password_hash('', self.method).split('$', 1)[0]
+        return password_hash.split('$', 1)[0] != self._canonical_method
+
+    def _run(self, func, *args):
+        if not self.pool_workers:
+            return func(*args)
+
+        executor = self._get_executor()
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            future = executor.submit(func, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            # The pool is backed up; the slot is freed once the hash completes
+            raise PasswordHasherBusy() from None
+
+    def _get_executor(self):
+        # The pool is created lazily so that each forked worker owns its own
+        if self._executor_pid != os.getpid():
+            with self._lock:
+                if self._executor_pid != os.getpid():
+                    self._executor = ProcessPoolExecutor(max_workers=self.pool_workers)
+                    self._slots = threading.BoundedSemaphore(self.pool_workers + self.max_queue)
+                    self._executor_pid = os.getpid()
+        return self._executor
@@ -0,0 +1,235 @@
+import collections
+import contextvars
+import cProfile
+import hmac
+import marshal
+import os
+import pstats
+import random
+import sys
+import threading
+import time
+import click
+from flask import current_app, request
+from flask.cli import AppGroup
+
+MODES = ('sampler', 'cprofile')
+
+# CLI commands live under "flask profiling ..."
+profiling_cli = AppGroup('profiling', help='Request profiling.')
+
+
+def sign_debug_token(secret, expires):
+    """Debug header value that makes requests until ``expires`` (epoch seconds) be profiled."""
+    signature = hmac.new(secret.encode(), str(int(expires)).encode(), 'sha256').hexdigest()
+    return f"{int(expires)}.{signature}"
+
+
+def verify_debug_token(secret, value):
+    expires, _, _ = value.partition('.')
+    if not expires.isdigit() or int(expires) < time.time():
+        return False
+    return hmac.compare_digest(sign_debug_token(secret, int(expires)), value)
+
+
+class Profiler:
+    """Opt-in per-route request profiling.
+
+    A ``sample_rate`` fraction of requests, plus any request carrying a
+    valid signed debug header, is profiled either by a stack sampler (a
+    background thread reading the request thread's stack every
+    ``interval`` seconds, yielding collapsed stacks for flame graphs) or by
+    cProfile (deterministic, yielding pstats, with much more overhead on
+    the profiled request). Results are aggregated per route in this process
+    until reset. With no sample rate and no debug secret no hooks are
+    registered at all.
+
+    One request per thread is profiled at a time, so of the coroutine
+    views sharing an event loop thread (asgi.py) only one is profiled at
+    once, and its samples include the time the loop spends on the others.
+    cProfile profiles one request per process at a time: from Python 3.12
+    only one profiler can be active at once.
+    """
+
+    def __init__(self):
+        self.mode = 'sampler'
+        self.sample_rate = 0.0
+        self.interval = 0.005
+        self.header = 'X-Debug-Profile'
+        self.secret = None
+        self.max_stacks_per_route = 10000
+        self._lock = threading.Lock()
+        # thread ident -> route of the request being profiled on it
+        self._active = {}
+        self._wake = threading.Event()
+        self._sampler_pid = None
+        self._request = contextvars.ContextVar('profiling_request', default=None)
+        # route -> {"requests", "seconds"} and the profile data of each mode
+        self._routes = {}
+        self._stacks = {}
+        self._stats = {}
+
+    def init_app(self, app):
+        options = app.config.get('PROFILING', {})
+        self.mode = options.get('mode', self.mode)
+        if self.mode not in MODES:
+            raise ValueError(f"PROFILING.mode must be one of {', '.join(MODES)}")
+        self.sample_rate = options.get('sample_rate', self.sample_rate)
+        self.interval = options.get('interval', self.interval)
+        self.header = options.get('header', self.header)
+        self.max_stacks_per_route = options.get('max_stacks_per_route', self.max_stacks_per_route)
+        self.secret = app.config.get('PROFILING_SECRET')
+
+        app.cli.add_command(profiling_cli)
+        app.extensions['profiler'] = self
+        # Off unless something can select a request: no per-request cost at all
+        if self.enabled:
+            app.before_request(self._before_request)
+            app.teardown_request(self._teardown_request)
+
+    @property
+    def enabled(self):
+        return bool(self.sample_rate) or bool(self.secret)
+
+    # Requests
+
+    def _selected(self):
+        if self.sample_rate and random.random() < self.sample_rate:
+            return True
+        token = request.headers.get(self.header) if self.secret else None
+        return bool(token) and verify_debug_token(self.secret, token)
+
+    def _before_request(self):
+        if not self._selected():
+            return
+        ident = threading.get_ident()
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        with self._lock:
+            if ident in self._active or (self.mode == 'cprofile' and self._active):
+                return
+            self._active[ident] = route
+
+        profile = None
+        if self.mode == 'cprofile':
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # Another profiler (or debugger) is active; skip this request
+                with self._lock:
+                    self._active.pop(ident, None)
+                return
+        else:
+            self._ensure_sampler()
+            self._wake.set()
+        self._request.set((route, ident, profile, time.perf_counter()))
+
+    def _teardown_request(self, exc):
+        state = self._request.get()
+        if state is None:
+            return
+        route, ident, profile, started = state
+        if profile is not None:
+            profile.disable()
+        self._request.set(None)
+        with self._lock:
+            self._active.pop(ident, None)
+            totals = self._routes.setdefault(route, {"requests": 0, "seconds": 0.0})
+            totals["requests"] += 1
+            totals["seconds"] += time.perf_counter() - started
+            if profile is not None:
+                if route in self._stats:
+                    self._stats[route].add(profile)
+                else:
+                    self._stats[route] = pstats.Stats(profile)
+
+    # Stack sampler
+
+    def _ensure_sampler(self):
+        # One sampler thread per (forked) process, started on first use
+        if self._sampler_pid == os.getpid():
+            return
+        with self._lock:
+            if self._sampler_pid == os.getpid():
+                return
+            self._sampler_pid = os.getpid()
+            threading.Thread(target=self._sample_forever, name='profiling-sampler', daemon=True).start()
+
+    def _sample_forever(self):
+        while True:
+            # Idle until a profiled request starts
+            self._wake.wait()
+            self._wake.clear()
+            while self._active:
+                frames = sys._current_frames()
+                with self._lock:
+                    for ident, route in self._active.items():
+                        frame = frames.get(ident)
+                        if frame is not None:
+                            self._record_stack(route, frame)
+                del frames
+                time.sleep(self.interval)
+
+    def _record_stack(self, route, frame):
+        names = []
+        while frame is not None:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack = ';'.join(reversed(names))
+        stacks = self._stacks.setdefault(route, collections.Counter())
+        if stack not in stacks and len(stacks) >= self.max_stacks_per_route:
+            stack = '[truncated]'
+        stacks[stack] += 1
+
+    # Results
+
+    def summary(self):
+        with self._lock:
+            return {
+                "mode": self.mode,
+                "pid": os.getpid(),
+                "routes": {
+                    route: dict(totals, samples=sum(self._stacks.get(route, {}).values()))
+                    for route, totals in self._routes.items()
+                },
+            }
+
+    def has_profiles(self, route=None):
+        with self._lock:
+            profiles = self._stats if self.mode == 'cprofile' else self._stacks
+            return any(route is None or name == route for name in profiles)
+
+    def collapsed(self, route=None):
+        """Collapsed stacks ("frame;frame;frame count" lines) of one route or all, for flamegraph.pl or speedscope."""
+        with self._lock:
+            counts = collections.Counter()
+            for name, stacks in self._stacks.items():
+                if route is None or name == route:
+                    counts.update(stacks)
+        return ''.join(f"{stack} {count}\n" for stack, count in counts.most_common())
+
+    def pstats_data(self, route=None):
+        """Marshalled pstats of one route or all, as written by ``pstats.Stats.dump_stats``."""
+        with self._lock:
+            selected = [stats for name, stats in self._stats.items() if route is None or name == route]
+            combined = pstats.Stats()
+            combined.add(*selected)
+            return marshal.dumps(combined.stats)
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._stacks.clear()
+            self._stats.clear()
+
+
+@profiling_cli.command('token')
+@click.option('--ttl', type=int, default=600, show_default=True, help='Seconds the token stays valid.')
+def token_command(ttl):
+    """Print a debug header that gets requests profiled."""
+    secret = current_app.config.get('PROFILING_SECRET')
+    if not secret:
+        raise click.ClickException('PROFILING_SECRET is not set')
+    header = current_app.extensions['profiler'].header
+    click.echo(f"{header}: {sign_debug_token(secret, time.time() + ttl)}")
\ No newline at end of file
@@ -0,0 +1,198 @@
+import functools
+import hashlib
+import math
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app, request
+from json_provider import ConstantJSON
+
+RATE_LIMITED = ConstantJSON({"error": "Too many attempts. Please try again later"}, 429)
+
+
+def retry_after(previous, current, limit, window, elapsed):
+    """Seconds until a request would be admitted again.
+
+    ``current`` includes the rejected request; the estimate decays as the
+    previous window slides out, and once the current one ends its count
+    becomes the decaying one.
+    """
+    if current <= limit:
+        wait = window * (1 - (limit - current) / previous) - elapsed
+    else:
+        wait = (window - elapsed) + max(0.0, window * (1 - (limit - 1) / (current - 1)))
+    return max(1, math.ceil(wait))
+
+
+class MemoryBackend:
+    """Per-process window counters, least recently used keys dropped beyond ``max_entries``."""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        # key -> (window index, previous window count, current window count)
+        self._windows = OrderedDict()
+        self._lock = threading.Lock()
+
+    def hit(self, key, window, index):
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is None or entry[0] < index - 1:
+                previous, current = 0, 0
+            elif entry[0] == index - 1:
+                previous, current = entry[2], 0
+            else:
+                previous, current = entry[1], entry[2]
+            current += 1
+            self._windows[key] = (index, previous, current)
+            self._windows.move_to_end(key)
+            while len(self._windows) > self.max_entries:
+                self._windows.popitem(last=False)
+        return previous, current
+
+    def release(self, key, window, index):
+        with self._lock:
+            entry = self._windows.get(key)
+            if entry is not None and entry[0] == index:
+                self._windows[key] = (index, entry[1], entry[2] - 1)
+
+
+class RedisBackend:
+    """Window counters shared by all processes, one expiring Redis key per key and window."""
+
+    def __init__(self, redis_client):
+        self.redis = redis_client
+
+    def _key(self, key, index):
+        return f'ratelimit:{key}:{index}'
+
+    def hit(self, key, window, index):
+        pipe = self.redis.pipeline()
+        pipe.incr(self._key(key, index))
+        # Still needed while it is the previous window
+        pipe.expire(self._key(key, index), int(window * 2) + 1)
+        pipe.get(self._key(key, index - 1))
+        current, _, previous = pipe.execute()
+        return int(previous or 0), current
+
+    def release(self, key, window, index):
+        self.redis.decr(self._key(key, index))
+
+
+class RateLimiter:
+    """Sliding-window admission control for the password endpoints.
+
+    Each rule (``per_ip``, ``per_email``) admits ``limit`` requests per
+    ``window`` seconds and key, counting the current fixed window plus the
+    previous one weighted by how much of it the sliding window still
+    covers. Rejected requests are not counted, so retrying doesn't extend
+    a block. Counters live in this process, or in Redis when configured so
+    that the limits hold across workers; if Redis fails, requests are
+    admitted.
+    """
+
+    RULES = ('per_ip', 'per_email')
+
+    def __init__(self, registry):
+        self.enabled = True
+        self.proxy_count = 0
+        self.rules = {}
+        self.backend = MemoryBackend()
+        self.decisions = registry.counter(
+            'rate_limit_requests_total', 'Rate limited endpoint requests by rule and outcome', ['rule', 'outcome'])
+
+    def init_app(self, app, redis_client=None):
+        options = app.config.get('RATE_LIMITS', {})
+        self.enabled = options.get('enabled', True)
+        # Reverse proxies in front of the app that append to X-Forwarded-For
+        self.proxy_count = options.get('proxy_count', 0)
+        self.rules = {
+            name: (options[name]['limit'], options[name]['window'])
+            for name in self.RULES if options.get(name)
+        }
+
+        # A client can be passed in directly (e.g. fakeredis in tests)
+        if redis_client is None and options.get('redis_url'):
+            import redis
+            redis_client = redis.Redis.from_url(options['redis_url'])
+        if redis_client is not None:
+            self.backend = RedisBackend(redis_client)
+        else:
+            self.backend = MemoryBackend(options.get('max_entries', 100000))
+        app.extensions['rate_limiter'] = self
+
+    def check(self, rule, key):
+        """Count a request for ``key`` under ``rule``.
+
+        Returns ``(wait, index)``: seconds to wait, 0 if admitted, and the
+        window the request was counted in (None if it wasn't).
+        """
+        if rule not in self.rules:
+            return 0, None
+        limit, window = self.rules[rule]
+        now = time.time()
+        index = int(now // window)
+        try:
+            previous, current = self.backend.hit(f'{rule}:{key}', window, index)
+        except Exception:
+            self.decisions.labels(rule, 'error').inc()
+            return 0, None
+
+        elapsed = now - index * window
+        if previous * (1 - elapsed / window) + current <= limit:
+            self.decisions.labels(rule, 'admitted').inc()
+            return 0, index
+        self.release(rule, key, index)
+        self.decisions.labels(rule, 'rejected').inc()
+        return retry_after(previous, current, limit, window, elapsed), None
+
+    def release(self, rule, key, index):
+        """Uncount a request counted by ``check``."""
+        try:
+            self.backend.release(f'{rule}:{key}', self.rules[rule][1], index)
+        except Exception:
+            pass
+
+    def admit(self):
+        """Check the current request against each rule; a 429 response if it is throttled, else None."""
+        if not self.enabled:
+            return None
+        ip = self.client_ip()
+        wait, ip_index = self.check('per_ip', ip)
+        if not wait:
+            email = (request.get_json(silent=True) or {}).get('email')
+            if isinstance(email, str) and email.strip():
+                wait, _ = self.check('per_email', _email_key(email))
+                if wait and ip_index is not None:
+                    self.release('per_ip', ip, ip_index)
+        if not wait:
+            return None
+        response = RATE_LIMITED()
+        response.headers['Retry-After'] = str(wait)
+        return response
+
+    def client_ip(self):
+        if self.proxy_count:
+            forwarded = [part.strip() for part in request.headers.get('X-Forwarded-For', '').split(',') if part.strip()]
+            if len(forwarded) >= self.proxy_count:
+                return forwarded[-self.proxy_count]
+        return request.remote_addr or 'unknown'
+
+
+def _email_key(email):
+    # Keys don't carry the address itself, e.g. in Redis
+    return hashlib.blake2b(email.strip().lower().encode(), digest_size=12).hexdigest()
+
+
+def rate_limited(view):
+    """Reject the request with 429 before ``view`` runs when a rate limit is exceeded.
+
+    Goes directly below the route so that nothing touches the database or
+    the password hasher first.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        throttled = current_app.extensions['rate_limiter'].admit()
+        if throttled is not None:
+            return throttled
+        return view(*args, **kwargs)
+    return wrapper
\ No newline at end of file
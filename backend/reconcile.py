@@ -0,0 +1,193 @@
+import time
+from datetime import datetime, timedelta
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import case, update
+from extensions import db, stripe_client
+from user import User, apply_subscription_statuses
+from webhooks import WebhookEvent
+
+# Status written for each Stripe subscription status
+STRIPE_STATUSES = {
+    "active": "active",
+    "trialing": "pending",
+    "incomplete": "pending",
+    "incomplete_expired": "canceled",
+    "canceled": "canceled",
+    "past_due": "payment_failed",
+    "unpaid": "payment_failed",
+    "paused": "paused",
+}
+
+# Stored statuses that already agree with a Stripe status; webhooks store
+# some Stripe statuses verbatim
+EQUIVALENT_STATUSES = {
+    stripe_status: {stored, stripe_status}
+    for stripe_status, stored in STRIPE_STATUSES.items()
+}
+
+# subscription_id of users without one: "none" from /register, "" from imports
+NO_SUBSCRIPTION_IDS = ("", "none")
+
+# CLI commands live under "flask subscriptions ..."
+subscriptions_cli = AppGroup('subscriptions', help='Stripe subscription maintenance.')
+
+
+class ReconciliationRun(db.Model):
+    """Progress of one pass over all Stripe subscriptions.
+
+    ``cursor`` is the last subscription id fully applied, so a run that
+    died resumes from the next page.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default="running")  # running/completed/failed
+    cursor = db.Column(db.String(255), nullable=True)
+    pages = db.Column(db.Integer, nullable=False, default=0)
+    scanned = db.Column(db.Integer, nullable=False, default=0)
+    drifted = db.Column(db.Integer, nullable=False, default=0)
+    updated = db.Column(db.Integer, nullable=False, default=0)
+    adopted = db.Column(db.Integer, nullable=False, default=0)
+    unmatched = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    def report(self):
+        end = self.finished_at or datetime.utcnow()
+        return {
+            "run": self.id,
+            "status": self.status,
+            "pages": self.pages,
+            "scanned": self.scanned,
+            "drifted": self.drifted,
+            "updated": self.updated,
+            "adopted": self.adopted,
+            "unmatched": self.unmatched,
+            "runtime_seconds": round((end - self.started_at).total_seconds(), 3),
+        }
+
+
+def reconcile_subscriptions(page_size=100, lease_seconds=900):
+    """Compare every Stripe subscription with the users table and fix drift.
+
+    Stripe is read page by page (newest first, canceled included). Each
+    page is matched against users by subscription_id, falling back to
+    customer_id for users without one, and drifted rows are fixed with one
+    bulk UPDATE per page, committed together with the cursor checkpoint. A failed run,
+    or a running one whose checkpoint is older than ``lease_seconds``, is
+    resumed from its cursor; a fresher running one is left alone. Returns
+    the run report.
+    """
+    run = ReconciliationRun.query.order_by(ReconciliationRun.id.desc()).first()
+    if run is not None and run.status == "running" and \
+            run.updated_at > datetime.utcnow() - timedelta(seconds=lease_seconds):
+        return dict(run.report(), status="already_running")
+    if run is None or run.status == "completed":
+        run = ReconciliationRun()
+        db.session.add(run)
+    else:
+        run.status = "running"
+        run.error = None
+    db.session.commit()
+
+    try:
+        while True:
+            fetched_at = int(time.time())
+            page = stripe_client.list_subscriptions(starting_after=run.cursor, limit=page_size)
+            subscriptions = page.data
+            if subscriptions:
+                drifted, adopted, unmatched = _drifted_statuses(subscriptions, fetched_at)
+                run.cursor = subscriptions[-1].id
+                run.pages += 1
+                run.scanned += len(subscriptions)
+                run.drifted += len(drifted)
+                run.adopted += adopted
+                run.unmatched += unmatched
+                # One bulk UPDATE, committed together with the checkpoint
+                run.updated += apply_subscription_statuses(drifted, key="subscription_id")
+                db.session.commit()
+            if not page.has_more:
+                break
+    except Exception as e:
+        db.session.rollback()
+        run.status = "failed"
+        run.error = str(e)
+        db.session.commit()
+        raise
+
+    run.status = "completed"
+    run.finished_at = datetime.utcnow()
+    db.session.commit()
+    report = run.report()
+    current_app.logger.info("Subscription reconciliation finished: %s", report)
+    return report
+
+
+def _drifted_statuses(subscriptions, fetched_at):
+    """Return ({subscription_id: status} for rows that disagree with Stripe, adopted, unmatched).
+
+    Users without a stored subscription id are matched by customer and
+    adopt the subscription; pages are newest first, so that is the
+    customer's latest one.
+    """
+    by_subscription = {s.id: s for s in subscriptions}
+    rows = (
+        db.session.query(User.subscription_id, User.subscription_status)
+        .filter(User.subscription_id.in_(list(by_subscription)))
+        .all()
+    )
+    matched = {subscription_id for subscription_id, _ in rows}
+
+    by_customer = {}
+    for s in subscriptions:
+        if s.id not in matched and isinstance(s.customer, str):
+            by_customer.setdefault(s.customer, s.id)
+    adopted = []
+    if by_customer:
+        adopted = (
+            db.session.query(User.customer_id, User.subscription_status)
+            .filter(User.customer_id.in_(list(by_customer)), User.subscription_id.in_(NO_SUBSCRIPTION_IDS))
+            .all()
+        )
+    if adopted:
+        adopt = {customer_id: by_customer[customer_id] for customer_id, _ in adopted}
+        db.session.execute(
+            update(User)
+            .where(User.customer_id.in_(list(adopt)), User.subscription_id.in_(NO_SUBSCRIPTION_IDS))
+            .values(subscription_id=case(adopt, value=User.customer_id))
+            .execution_options(synchronize_session=False)
+        )
+        rows += [(adopt[customer_id], stored) for customer_id, stored in adopted]
+    unmatched = len(subscriptions) - len(matched) - len(adopted)
+
+    # A webhook received after the page was fetched is newer than the page
+    customers = [s.customer for s in subscriptions if isinstance(s.customer, str)]
+    newer = {
+        customer_id for (customer_id,) in
+        db.session.query(WebhookEvent.customer_id)
+        .filter(WebhookEvent.customer_id.in_(customers), WebhookEvent.created >= fetched_at)
+        .distinct()
+    }
+
+    drifted = {}
+    for subscription_id, stored in rows:
+        subscription = by_subscription[subscription_id]
+        target = STRIPE_STATUSES.get(subscription.status, subscription.status)
+        accepted = EQUIVALENT_STATUSES.get(subscription.status, {target})
+        if stored not in accepted and subscription.customer not in newer:
+            drifted[subscription_id] = target
+    return drifted, len(adopted), unmatched
+
+
+@subscriptions_cli.command('reconcile')
+@click.option('--page-size', type=int, default=None, help='Subscriptions per Stripe page (max 100).')
+def reconcile_command(page_size):
+    """Bring stored subscription statuses in line with Stripe."""
+    options = current_app.config.get('RECONCILIATION', {})
+    report = reconcile_subscriptions(
+        page_size=page_size or options.get('page_size', 100),
+        lease_seconds=options.get('lease_seconds', 900)
+    )
+    click.echo(", ".join(f"{key}={value}" for key, value in report.items()))
\ No newline at end of file
@@ -0,0 +1,207 @@
+import functools
+import threading
+import time
+from flask import current_app
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import OperationalError
+from database import engine_options, init_engine
+
+# Bind keys given to the replicas in SQLALCHEMY_BINDS
+BIND_PREFIX = 'replica_'
+
+
+def replica_binds(uris, options):
+    """SQLALCHEMY_BINDS entries for the READ_REPLICAS uris, tuned like the primary."""
+    return {
+        f'{BIND_PREFIX}{index}': dict(engine_options(uri, options), url=uri)
+        for index, uri in enumerate(uris)
+    }
+
+
+class RoutingSession(Session):
+    """``db.session`` class that sends a read-only view's queries to its replica.
+
+    The replica is chosen by ``read_only`` and kept in ``info``. Flushes and
+    INSERT/UPDATE/DELETE statements always use the primary, as does
+    everything after the first flush of the request.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if replica is not None and bind is None and not self._flushing and not getattr(clause, 'is_dml', False):
+            return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReadReplicas:
+    """Round-robin choice of a healthy read replica for read-only views.
+
+    A replica whose query fails with an OperationalError (connection
+    refused, lost, missing table) is skipped for ``retry_interval`` seconds
+    and the view is run again on the primary. Users whose own rows were
+    committed in the last ``RECENT_WRITES_CACHE.ttl`` seconds read from the
+    primary, so they see their writes despite replication lag; with its
+    Redis tier configured this holds across worker processes.
+    """
+
+    def __init__(self, recent_writes, metrics):
+        self.recent_writes = recent_writes
+        self.metrics = metrics
+        self.db = None
+        self.names = []
+        self.retry_interval = 30
+        # model class -> attribute holding the id of the user owning a row
+        self.tracked = {}
+        self._down_until = {}
+        self._next = 0
+        self._lock = threading.Lock()
+        self._listening = False
+        self._counters = {}
+
+    def init_app(self, app, db):
+        """Set up the replica engines; call within an app context after ``db.init_app``."""
+        options = app.config.get('READ_REPLICAS', {})
+        self.retry_interval = options.get('retry_interval', self.retry_interval)
+        self.db = db
+        self.names = sorted(name for name in app.config.get('SQLALCHEMY_BINDS', {}) if name.startswith(BIND_PREFIX))
+        self._counters = {name: dict.fromkeys(('reads', 'failures'), 0) for name in self.names}
+        self._counters['primary'] = dict.fromkeys(('recent_writes', 'all_down'), 0)
+        self._down_until = {}
+        for name in self.names:
+            engine = db.engines[name]
+            init_engine(app, engine, name=name)
+            self.metrics.instrument_engine(engine)
+        # Session events are class-wide; without replicas nothing is recorded
+        if self.names and not self._listening:
+            self._listening = True
+            event.listen(RoutingSession, 'after_flush', self._after_flush)
+            event.listen(RoutingSession, 'after_commit', self._after_commit)
+            event.listen(RoutingSession, 'after_rollback', self._after_rollback)
+        app.extensions['read_replicas'] = self
+
+    @property
+    def enabled(self):
+        return bool(self.names)
+
+    def track_writes(self, model, attribute):
+        """Keep ``model`` rows' owner (the user id in ``attribute``) on the primary after they change."""
+        self.tracked[model] = attribute
+
+    def mark_written(self, user_id):
+        """Send ``user_id``'s reads to the primary for a while, e.g. after a bulk UPDATE."""
+        self.recent_writes.set(user_id, True)
+
+    def choose(self, user_id=None):
+        """Name of the replica for the next read-only view, or None for the primary."""
+        if user_id is not None and self.recent_writes.get(user_id):
+            self._count('primary', 'recent_writes')
+            return None
+        now = time.monotonic()
+        with self._lock:
+            healthy = [name for name in self.names if self._down_until.get(name, 0) <= now]
+            if not healthy:
+                self._counters['primary']['all_down'] += 1
+                return None
+            name = healthy[self._next % len(healthy)]
+            self._next += 1
+            self._counters[name]['reads'] += 1
+            return name
+
+    def mark_down(self, name):
+        with self._lock:
+            self._down_until[name] = time.monotonic() + self.retry_interval
+            self._counters[name]['failures'] += 1
+
+    def check(self):
+        """Run ``SELECT 1`` on every replica; returns ``{name: error or None}``.
+
+        A replica that fails is marked down, as if a view had failed on it.
+        """
+        errors = {}
+        for name in self.names:
+            try:
+                with self.db.engines[name].connect() as connection:
+                    connection.execute(text('SELECT 1'))
+                errors[name] = None
+            except Exception as e:
+                self.mark_down(name)
+                errors[name] = str(e)
+        return errors
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            stats = {name: dict(counters) for name, counters in self._counters.items()}
+            for name in self.names:
+                stats[name]['healthy'] = self._down_until.get(name, 0) <= now
+        return stats
+
+    def _count(self, name, counter):
+        with self._lock:
+            self._counters[name][counter] += 1
+
+    # Session events
+
+    def _after_flush(self, session, flush_context):
+        # Later reads in this transaction must see what was just written
+        session.info.pop('replica', None)
+        if not self.tracked:
+            return
+        written = session.info.setdefault('written_users', set())
+        for instance in (*session.new, *session.dirty, *session.deleted):
+            attribute = self.tracked.get(type(instance))
+            if attribute is not None:
+                user_id = getattr(instance, attribute, None)
+                if user_id is not None:
+                    written.add(user_id)
+
+    def _after_commit(self, session):
+        for user_id in session.info.pop('written_users', ()):
+            self.mark_written(user_id)
+
+    def _after_rollback(self, session):
+        session.info.pop('written_users', None)
+
+
+def _jwt_user_id():
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        # No JWT verified for this request
+        return None
+    return int(identity) if identity is not None else None
+
+
+def read_only(view):
+    """Run ``view``'s queries on a read replica when any are configured.
+
+    Goes below ``@jwt_required()`` so that the caller's recent writes are
+    taken into account. If the replica fails, it is marked down and the
+    view runs again on the primary.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        replicas = current_app.extensions.get('read_replicas')
+        if replicas is None or not replicas.enabled:
+            return view(*args, **kwargs)
+        replica = replicas.choose(_jwt_user_id())
+        if replica is None:
+            return view(*args, **kwargs)
+
+        session = replicas.db.session
+        session.info['replica'] = replica
+        try:
+            return view(*args, **kwargs)
+        except OperationalError:
+            # Only failures of the replica itself, not of writes on the primary
+            if session.info.get('replica') != replica:
+                raise
+            replicas.mark_down(replica)
+            session.info.pop('replica', None)
+            session.rollback()
+            return view(*args, **kwargs)
+        finally:
+            session.info.pop('replica', None)
+    return wrapper
\ No newline at end of file
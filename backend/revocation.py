@@ -0,0 +1,209 @@
+import hashlib
+import math
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+from extensions import db, jwt, metrics
+
+# Rows committed just before a sync may carry an older revoked_at than the
+# previous sync time; re-reading a small window catches them
+SYNC_OVERLAP = timedelta(seconds=30)
+
+# CLI commands live under "flask tokens ..."
+tokens_cli = AppGroup('tokens', help='Revoked access tokens.')
+
+
+class RevokedToken(db.Model):
+    """Access token revoked by /logout, kept until it would have expired."""
+    jti = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+    revoked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over strings (no false negatives)."""
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity = max(1, capacity)
+        self.size = max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+
+class RevocationList:
+    """Revoked JTIs in the database, fronted by a per-process Bloom filter.
+
+    A token whose jti is not in the filter is accepted without any I/O;
+    only filter positives are looked up in the table. Each process picks
+    up new revocations with a throttled incremental query, rebuilds the
+    filter from the unexpired rows now and then (expired entries cannot be
+    removed from a Bloom filter), and, with Redis configured, hears about
+    revocations from other workers straight away over pub/sub.
+    """
+
+    def __init__(self):
+        self.capacity = 100000
+        self.error_rate = 0.001
+        self.sync_interval = 5
+        self.rebuild_interval = 3600
+        self.redis = None
+        self.channel = 'revoked_tokens'
+        self._filter = None
+        self._synced_at = None
+        self._synced_until = None
+        self._built_at = None
+        self._needs_rebuild = False
+        self._sync_lock = threading.Lock()
+        self._listener_pid = None
+        self.checks = metrics.registry.counter(
+            'token_revocation_checks_total', 'Access token revocation checks by outcome', ['result'])
+
+    def init_app(self, app, redis_client=None):
+        options = app.config.get('TOKEN_REVOCATION', {})
+        self.capacity = options.get('bloom_capacity', self.capacity)
+        self.error_rate = options.get('bloom_error_rate', self.error_rate)
+        self.sync_interval = options.get('sync_interval', self.sync_interval)
+        self.rebuild_interval = options.get('rebuild_interval', self.rebuild_interval)
+
+        # A client can be passed in directly (e.g. fakeredis in tests)
+        if redis_client is None and options.get('redis_url'):
+            import redis
+            redis_client = redis.Redis.from_url(options['redis_url'])
+        self.redis = redis_client
+        # Built from the database of any app set up before this one
+        self._filter = None
+        app.cli.add_command(tokens_cli)
+        app.extensions['revocation_list'] = self
+
+    def revoke(self, jti, expires_at, user_id=None):
+        try:
+            db.session.add(RevokedToken(jti=jti, user_id=user_id, expires_at=expires_at))
+            db.session.commit()
+        except IntegrityError:
+            # Already revoked
+            db.session.rollback()
+        if self._filter is not None:
+            self._filter.add(jti)
+        if self.redis is not None:
+            try:
+                self.redis.publish(self.channel, jti)
+            except Exception:
+                pass
+
+    def is_revoked(self, jti):
+        self._ensure_listener()
+        self._maybe_sync()
+        if jti not in self._filter:
+            self.checks.labels('clear').inc()
+            return False
+
+        revoked = db.session.query(
+            db.session.query(RevokedToken.jti)
+            .filter(RevokedToken.jti == jti, RevokedToken.expires_at > datetime.utcnow())
+            .exists()
+        ).scalar()
+        self.checks.labels('revoked' if revoked else 'false_positive').inc()
+        return revoked
+
+    def purge_expired(self):
+        deleted = RevokedToken.query.filter(RevokedToken.expires_at <= datetime.utcnow()).delete()
+        db.session.commit()
+        return deleted
+
+    def _maybe_sync(self):
+        now = time.monotonic()
+        if self._filter is not None and now - self._synced_at < self.sync_interval:
+            return
+        # One request per process refreshes; the rest keep using the current filter
+        blocking = self._filter is None
+        if not self._sync_lock.acquire(blocking=blocking):
+            return
+        try:
+            if self._filter is None or self._needs_rebuild or now - self._built_at >= self.rebuild_interval:
+                self._rebuild(now)
+            elif now - self._synced_at >= self.sync_interval:
+                self._sync(now)
+        finally:
+            self._sync_lock.release()
+
+    def _rebuild(self, now):
+        started_at = datetime.utcnow()
+        jtis = [jti for (jti,) in db.session.query(RevokedToken.jti).filter(RevokedToken.expires_at > started_at)]
+        bloom = BloomFilter(max(self.capacity, 2 * len(jtis)), self.error_rate)
+        for jti in jtis:
+            bloom.add(jti)
+        self._filter = bloom
+        self._built_at = self._synced_at = now
+        self._synced_until = started_at
+        self._needs_rebuild = False
+
+    def _sync(self, now):
+        started_at = datetime.utcnow()
+        rows = db.session.query(RevokedToken.jti).filter(
+            RevokedToken.revoked_at > self._synced_until - SYNC_OVERLAP
+        )
+        for (jti,) in rows:
+            if jti not in self._filter:
+                self._filter.add(jti)
+        self._synced_at = now
+        self._synced_until = started_at
+        # Grow the filter before its false positive rate degrades
+        if self._filter.count > self._filter.capacity:
+            self._needs_rebuild = True
+
+    def _ensure_listener(self):
+        # Started lazily so that every forked worker gets its own thread
+        if self.redis is None or self._listener_pid == os.getpid():
+            return
+        self._listener_pid = os.getpid()
+        threading.Thread(target=self._listen, name='revoked-token-listener', daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                for message in pubsub.listen():
+                    data = message.get('data')
+                    if isinstance(data, bytes):
+                        data = data.decode()
+                    if isinstance(data, str) and self._filter is not None:
+                        self._filter.add(data)
+            except Exception:
+                # Messages may have been missed; the next request resyncs
+                self._synced_at = float('-inf')
+                time.sleep(1)
+
+
+revocation_list = RevocationList()
+
+
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    return revocation_list.is_revoked(jwt_payload['jti'])
+
+
+@tokens_cli.command('purge')
+def purge_command():
+    """Delete revocations of tokens that have expired anyway."""
+    click.echo(f"Deleted {revocation_list.purge_expired()} expired revocations")
\ No newline at end of file
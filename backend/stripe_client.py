@@ -0,0 +1,242 @@
+import importlib
+import os
+import threading
+import time
+import uuid
+from flask import g, has_app_context, request
+
+
+class LazyModule:
+    """Stands in for a module that is only imported on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        return getattr(importlib.import_module(self._name), attr)
+
+
+# The SDK (and requests under it) is loaded by the first Stripe call rather
+# than at import; error classes can still be named, e.g. in except clauses
+stripe = LazyModule('stripe')
+
+
+class StripeClient:
+    """Single entry point for the Stripe calls made by the API.
+
+    Configures the SDK with a pooled ``requests`` session, explicit timeouts
+    and a retry budget, adds idempotency keys to every write and records a
+    latency histogram per operation. The ``*_async`` operations, used by the
+    ASGI app, go through an httpx client when httpx is installed.
+    """
+
+    def __init__(self, registry):
+        self.latency = registry.histogram(
+            'stripe_request_duration_seconds', 'Latency of Stripe API calls', ['operation'])
+        self.errors = registry.counter('stripe_errors_total', 'Failed Stripe API calls', ['operation'])
+        self.calls_per_request = registry.histogram(
+            'stripe_calls_per_request', 'Stripe API calls made by one HTTP request', ['route'],
+            buckets=(1, 2, 3, 4, 5, 6, 8))
+        self.options = {}
+        self._configured_pid = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.options = app.config.get('STRIPE', {})
+        self._configured_pid = None
+        app.after_request(self._report_calls)
+        app.extensions['stripe_client'] = self
+
+    def configure(self):
+        """Set up the SDK; runs on the first call in each process.
+
+        Deferring this keeps app creation cheap and means a forked worker
+        never inherits the parent's pooled connections.
+        """
+        if self._configured_pid == os.getpid():
+            return
+        with self._lock:
+            if self._configured_pid == os.getpid():
+                return
+            import requests
+            import stripe
+            from requests.adapters import HTTPAdapter
+
+            options = self.options
+            stripe.api_key = os.getenv("STRIPE_SECRET")
+            if options.get('api_base'):
+                stripe.api_base = options['api_base']
+            # Network errors and 409/429/5xx are retried by the SDK itself
+            stripe.max_network_retries = options.get('max_retries', 2)
+
+            adapter = HTTPAdapter(
+                pool_connections=options.get('pool_connections', 1),
+                pool_maxsize=options.get('pool_maxsize', 10),
+                max_retries=0
+            )
+            session = requests.Session()
+            session.mount('https://', adapter)
+            session.mount('http://', adapter)
+            stripe.default_http_client = stripe.RequestsClient(
+                timeout=(options.get('connect_timeout', 5), options.get('read_timeout', 20)),
+                session=session,
+                async_fallback_client=self._async_http_client(options)
+            )
+            self._configured_pid = os.getpid()
+
+    def _async_http_client(self, options):
+        # The SDK sends *_async requests through the fallback client
+        try:
+            from stripe_http import PooledHTTPXClient
+        except ImportError:
+            return None
+        # One event loop has far more calls in flight than a thread pool has
+        # threads, hence its own size. httpx's default of 100 connections
+        # costs more CPU in pool bookkeeping than it saves in waiting
+        import httpx
+        return PooledHTTPXClient(
+            options.get('async_pool_maxsize', 32),
+            timeout=httpx.Timeout(options.get('read_timeout', 20), connect=options.get('connect_timeout', 5))
+        )
+
+    def _count_call(self):
+        # Per request (or task) count, reported by _report_calls
+        if has_app_context():
+            g.stripe_calls = g.get('stripe_calls', 0) + 1
+
+    def _report_calls(self, response):
+        calls = g.get('stripe_calls')
+        if calls:
+            route = request.url_rule.rule if request.url_rule else 'unmatched'
+            self.calls_per_request.labels(route).observe(calls)
+            if self.options.get('call_count_header'):
+                response.headers['X-Stripe-Calls'] = str(calls)
+        return response
+
+    def call(self, operation, func, *args, **kwargs):
+        """Invoke a stripe SDK function and record its latency under ``operation``."""
+        self.configure()
+        self._count_call()
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except stripe.error.StripeError:
+            self.errors.labels(operation).inc()
+            raise
+        finally:
+            self.latency.labels(operation).observe(time.perf_counter() - start)
+
+    async def call_async(self, operation, func, *args, **kwargs):
+        """Await an async stripe SDK function and record its latency under ``operation``."""
+        self.configure()
+        self._count_call()
+        start = time.perf_counter()
+        try:
+            return await func(*args, **kwargs)
+        except stripe.error.StripeError:
+            self.errors.labels(operation).inc()
+            raise
+        finally:
+            self.latency.labels(operation).observe(time.perf_counter() - start)
+
+    def stats(self):
+        errors = {labels: int(value.snapshot()) for labels, value in self.errors.children()}
+        return {
+            operation: dict(histogram.snapshot(), errors=errors.get((operation,), 0))
+            for (operation,), histogram in self.latency.children()
+        }
+
+    # Operations used by the API
+
+    def list_customers(self, email):
+        return self.call('customer.list', stripe.Customer.list, email=email)
+
+    def retrieve_customer(self, customer_id):
+        return self.call('customer.retrieve', stripe.Customer.retrieve, customer_id)
+
+    def create_customer(self, email, idempotency_key=None):
+        return self.call(
+            'customer.create', stripe.Customer.create,
+            email=email, idempotency_key=idempotency_key or new_idempotency_key()
+        )
+
+    def attach_payment_method(self, payment_method_id, customer_id, idempotency_key=None):
+        return self.call(
+            'payment_method.attach', stripe.PaymentMethod.attach,
+            payment_method_id, customer=customer_id,
+            idempotency_key=idempotency_key or new_idempotency_key()
+        )
+
+    def set_default_payment_method(self, customer_id, payment_method_id, idempotency_key=None):
+        return self.call(
+            'customer.modify', stripe.Customer.modify,
+            customer_id, invoice_settings={"default_payment_method": payment_method_id},
+            idempotency_key=idempotency_key or new_idempotency_key()
+        )
+
+    def create_subscription(self, customer_id, price_id, idempotency_key=None, **options):
+        return self.call(
+            'subscription.create', stripe.Subscription.create,
+            customer=customer_id,
+            items=[{"price": price_id}],
+            expand=["latest_invoice.payment_intent"],
+            idempotency_key=idempotency_key or new_idempotency_key(),
+            **options
+        )
+
+    def list_subscriptions(self, starting_after=None, limit=100):
+        # One page, newest first; canceled subscriptions included
+        params = {"status": "all", "limit": limit}
+        if starting_after:
+            params["starting_after"] = starting_after
+        return self.call('subscription.list', stripe.Subscription.list, **params)
+
+    def delete_subscription(self, subscription_id):
+        # DELETE is idempotent on Stripe's side, no key needed
+        return self.call('subscription.delete', stripe.Subscription.delete, subscription_id)
+
+    # The same operations for the ASGI app
+
+    async def list_customers_async(self, email):
+        return await self.call_async('customer.list', stripe.Customer.list_async, email=email)
+
+    async def retrieve_customer_async(self, customer_id):
+        return await self.call_async('customer.retrieve', stripe.Customer.retrieve_async, customer_id)
+
+    async def create_customer_async(self, email, idempotency_key=None):
+        return await self.call_async(
+            'customer.create', stripe.Customer.create_async,
+            email=email, idempotency_key=idempotency_key or new_idempotency_key()
+        )
+
+    async def attach_payment_method_async(self, payment_method_id, customer_id, idempotency_key=None):
+        return await self.call_async(
+            'payment_method.attach', stripe.PaymentMethod.attach_async,
+            payment_method_id, customer=customer_id,
+            idempotency_key=idempotency_key or new_idempotency_key()
+        )
+
+    async def set_default_payment_method_async(self, customer_id, payment_method_id, idempotency_key=None):
+        return await self.call_async(
+            'customer.modify', stripe.Customer.modify_async,
+            customer_id, invoice_settings={"default_payment_method": payment_method_id},
+            idempotency_key=idempotency_key or new_idempotency_key()
+        )
+
+    async def create_subscription_async(self, customer_id, price_id, idempotency_key=None, **options):
+        return await self.call_async(
+            'subscription.create', stripe.Subscription.create_async,
+            customer=customer_id,
+            items=[{"price": price_id}],
+            expand=["latest_invoice.payment_intent"],
+            idempotency_key=idempotency_key or new_idempotency_key(),
+            **options
+        )
+
+    async def delete_subscription_async(self, subscription_id):
+        # cancel is the same DELETE request; the SDK has no delete_async
+        return await self.call_async('subscription.delete', stripe.Subscription.cancel_async, subscription_id)
+
+
+def new_idempotency_key():
+    return uuid.uuid4().hex
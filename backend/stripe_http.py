@@ -0,0 +1,77 @@
+"""httpx transport for the Stripe SDK's async calls, with a bounded connection pool.
+
+Imported by StripeClient when it configures the SDK, so that neither stripe
+nor httpx is loaded before the first Stripe call.
+"""
+import ssl
+import textwrap
+import anyio
+import httpx
+import stripe
+
+
+class PooledHTTPXClient(stripe.HTTPClient):
+    """Async Stripe HTTP client over an ``httpx.AsyncClient`` of at most ``max_connections``.
+
+    Implements the SDK's public ``HTTPClient`` interface for custom clients
+    rather than configuring ``stripe.HTTPXClient``, which offers no way to
+    size its pool. Only the async methods are provided: it is meant as the
+    ``async_fallback_client`` of a synchronous client.
+    """
+
+    name = "httpx"
+
+    def __init__(self, max_connections, timeout=80, verify_ssl_certs=True, **kwargs):
+        super().__init__(verify_ssl_certs=verify_ssl_certs, **kwargs)
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        verify = ssl.create_default_context(cafile=stripe.ca_bundle_path) if verify_ssl_certs else False
+        self._client_async = httpx.AsyncClient(limits=limits, verify=verify)
+        self._timeout = timeout
+
+    def _request_kwargs(self, headers, post_data):
+        kwargs = {"headers": headers, "data": post_data or {}}
+        if self._timeout:
+            kwargs["timeout"] = self._timeout
+        return kwargs
+
+    async def request_async(self, method, url, headers, post_data=None):
+        try:
+            response = await self._client_async.request(method, url, **self._request_kwargs(headers, post_data))
+        except Exception as e:
+            self._handle_request_error(e)
+        return response.content, response.status_code, response.headers
+
+    async def request_stream_async(self, method, url, headers, post_data=None):
+        try:
+            response = await self._client_async.send(
+                self._client_async.build_request(method, url, **self._request_kwargs(headers, post_data)),
+                stream=True
+            )
+        except Exception as e:
+            self._handle_request_error(e)
+        return response.aiter_bytes(), response.status_code, response.headers
+
+    def sleep_async(self, secs):
+        return anyio.sleep(secs)
+
+    async def close_async(self):
+        await self._client_async.aclose()
+
+    def request(self, method, url, headers, post_data=None, **kwargs):
+        raise RuntimeError("PooledHTTPXClient only serves async requests")
+
+    def request_stream(self, method, url, headers, post_data=None, **kwargs):
+        raise RuntimeError("PooledHTTPXClient only serves async requests")
+
+    def close(self):
+        pass
+
+    def _handle_request_error(self, e):
+        # Network errors are retried by the SDK, like its own clients' are
+        message = textwrap.fill(
+            "Unexpected error communicating with Stripe. If this problem persists, "
+            "let us know at support@stripe.com."
+        )
+        raise stripe.APIConnectionError(
+            f"{message}\n\n(Network error: A {type(e).__name__} was raised)", should_retry=True
+        ) from e
\ No newline at end of file
@@ -0,0 +1,111 @@
+import json
+from celery import shared_task
+from flask import current_app
+from extensions import db, stripe_client
+from stripe_client import stripe
+from user import (
+    User, SubscriptionJob, InvalidPaymentMethod, set_subscription_status,
+    cache_subscription, find_or_create_customer, create_stripe_subscription,
+    subscription_outcome, stored_customer_id
+)
+from webhooks import drain_events
+from reconcile import reconcile_subscriptions
+from revocation import revocation_list
+
+
+
+@shared_task(bind=True, max_retries=5)
+def process_subscription_job(self, job_id):
+    """Run the Stripe calls for a queued subscription job.
+
+    Every Stripe write uses an idempotency key derived from the job id and
+    the customer id is checkpointed on the job, so a retried or duplicated
+    task repeats no side effects.
+    """
+    job = db.session.get(SubscriptionJob, job_id)
+    if job is None or job.status in ("succeeded", "failed"):
+        return job.status if job else None
+
+    user = db.session.get(User, job.user_id)
+    if user is None:
+        return _fail(job, "User not found")
+
+    job.status = "running"
+    db.session.commit()
+
+    try:
+        customer = None
+        if not job.customer_id:
+            if job.kind == "register_and_subscribe":
+                customer = stripe_client.create_customer(user.email, idempotency_key=f"{job.id}-customer")
+            elif not stored_customer_id(user):
+                customer = find_or_create_customer(user.email, idempotency_prefix=job.id)
+            # A stored customer id is reused without asking Stripe
+            job.customer_id = customer.id if customer else user.customer_id
+            db.session.commit()
+
+        options = {}
+        if job.kind == "subscribe":
+            options["payment_behavior"] = "default_incomplete"
+        subscription = create_stripe_subscription(
+            job.customer_id, job.payment_method_id, job.price_id,
+            idempotency_prefix=job.id, customer=customer, **options
+        )
+    except InvalidPaymentMethod as e:
+        return _fail(job, f"Invalid payment method: {str(e)}")
+    except stripe.error.CardError as e:
+        return _fail(job, e.user_message or str(e))
+    except (stripe.error.APIConnectionError, stripe.error.RateLimitError) as e:
+        # Worth retrying; any other Stripe error fails the job straight away
+        if self.request.retries >= self.max_retries:
+            return _fail(job, f"Payment processor unavailable: {str(e)}")
+        job.status = "queued"
+        db.session.commit()
+        raise self.retry(exc=e, countdown=2 ** self.request.retries)
+    except stripe.error.StripeError as e:
+        return _fail(job, f"Payment processing error: {str(e)}")
+
+    status, body, status_code = subscription_outcome(subscription)
+    job.subscription_id = subscription.id
+    job.result = json.dumps(body)
+    if status:
+        user.customer_id = job.customer_id
+        user.subscription_id = subscription.id
+        set_subscription_status(user, status)
+        job.status = "succeeded"
+    else:
+        job.status = "failed"
+        job.error = body["error"]
+    db.session.commit()
+    if status:
+        cache_subscription(user)
+    return job.status
+
+
+@shared_task
+def drain_webhook_events():
+    """Apply every pending webhook event in batches."""
+    return drain_events(current_app.config.get('WEBHOOK_BATCH_SIZE', 500))
+
+
+@shared_task
+def reconcile_stripe_subscriptions():
+    """Periodic (beat) pass fixing statuses that drifted from Stripe."""
+    options = current_app.config.get('RECONCILIATION', {})
+    return reconcile_subscriptions(
+        page_size=options.get('page_size', 100),
+        lease_seconds=options.get('lease_seconds', 900)
+    )
+
+
+@shared_task
+def purge_expired_revocations():
+    """Periodic (beat) deletion of revocations of tokens that have expired anyway."""
+    return revocation_list.purge_expired()
+
+
+def _fail(job, error):
+    job.status = "failed"
+    job.error = error
+    db.session.commit()
+    return job.status
@@ -0,0 +1,122 @@
+"""Fixtures shared by the backend tests.
+
+Each test gets its own app on a temporary SQLite database, with Celery
+running eagerly on the in-memory broker and Stripe pointed at a fresh
+benchmarks/stripe_stub.py. Pass ``redis=True`` to ``make_app`` to give the
+caches and the rate limiter a fakeredis client instead of their per-process
+tiers.
+"""
+import hashlib
+import hmac
+import json
+import os
+import sys
+import time
+
+import pytest
+
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(TESTS_DIR)
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'benchmarks'))
+
+from stripe_stub import StripeStub  # noqa: E402
+
+WEBHOOK_SECRET = 'whsec_test'
+PASSWORD = 'test-password'
+
+
+@pytest.fixture
+def stripe_stub():
+    stub = StripeStub().start()
+    yield stub
+    stub.stop()
+
+
+@pytest.fixture
+def make_app(tmp_path, stripe_stub, monkeypatch):
+    """Build an app; keyword arguments override config.json."""
+    from app import create_app
+    from extensions import (
+        db, subscription_cache, token_versions, payment_method_cache, recent_writes, rate_limiter
+    )
+
+    monkeypatch.setenv('STRIPE_SECRET', 'sk_test_stub')
+    monkeypatch.setenv('STRIPE_WEBHOOK_SECRET', WEBHOOK_SECRET)
+    monkeypatch.setenv('PRICE_ID', 'price_test')
+    monkeypatch.setenv('PRICE_ID_TEST', 'price_test')
+
+    def make(redis=False, **overrides):
+        with open(os.path.join(BACKEND_DIR, 'config.json')) as f:
+            config = json.load(f)
+        config.update({
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{tmp_path / 'test.db'}",
+            'CELERY_BROKER_URL': 'memory://',
+            'CELERY_RESULT_BACKEND': 'cache+memory://',
+            'CELERY_TASK_ALWAYS_EAGER': True,
+            'STRIPE': dict(config.get('STRIPE', {}), api_base=stripe_stub.url, max_retries=0),
+            # Cheap hashes; the tests don't measure hashing
+            'PASSWORD_HASHING': {'algorithm': 'pbkdf2:sha256', 'iterations': 1000},
+        })
+        config.update(overrides)
+        app = create_app(config)
+
+        # The extensions are module-level singletons shared by every app built here
+        caches = (subscription_cache, token_versions, payment_method_cache, recent_writes)
+        for cache in caches:
+            cache.clear()
+        if redis:
+            import fakeredis
+
+            client = fakeredis.FakeRedis(server=fakeredis.FakeServer())
+            for cache in caches:
+                cache.init_app(app, redis_client=client)
+            rate_limiter.init_app(app, redis_client=client)
+            app.extensions['redis'] = client
+
+        with app.app_context():
+            # Replica binds registered by earlier apps stay on the shared db
+            db.create_all(bind_key=None)
+        return app
+
+    return make
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def register(client, email, password=PASSWORD):
+    """Register a user; returns the Authorization header of their token."""
+    response = client.post('/register', json={'email': email, 'password': password})
+    assert response.status_code == 201, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+def webhook_event(event_type, customer_id, created, status=None, event_id=None):
+    subscription = {'id': 'sub_test', 'object': 'subscription', 'customer': customer_id}
+    if status:
+        subscription['status'] = status
+    return {
+        'id': event_id or f'evt_{hashlib.sha1(f"{event_type}{customer_id}{created}".encode()).hexdigest()[:16]}',
+        'object': 'event',
+        'type': event_type,
+        'created': created,
+        'data': {'object': subscription},
+    }
+
+
+def post_webhook(client, event, secret=WEBHOOK_SECRET):
+    payload = json.dumps(event)
+    timestamp = int(time.time())
+    signature = hmac.new(secret.encode(), f"{timestamp}.{payload}".encode(), hashlib.sha256).hexdigest()
+    return client.post('/webhook', data=payload, headers={
+        'Content-Type': 'application/json',
+        'Stripe-Signature': f"t={timestamp},v1={signature}",
+    })
\ No newline at end of file
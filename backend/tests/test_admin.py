@@ -0,0 +1,59 @@
+import json
+
+import pytest
+from conftest import PASSWORD, register
+from extensions import db
+from user import User
+
+ADMIN = {'X-Admin-Token': 'admin-secret'}
+
+
+@pytest.fixture
+def app(make_app, monkeypatch):
+    monkeypatch.setenv('ADMIN_TOKEN', ADMIN['X-Admin-Token'])
+    return make_app()
+
+
+def test_admin_endpoints_need_the_token(make_app, monkeypatch, app):
+    assert app.test_client().get('/admin/users/export', headers={'X-Admin-Token': 'wrong'}).status_code == 403
+
+    monkeypatch.delenv('ADMIN_TOKEN')
+    assert make_app().test_client().get('/admin/users/export', headers=ADMIN).status_code == 404
+
+
+@pytest.mark.parametrize('fmt', ['ndjson', 'csv'])
+def test_exported_users_import_into_another_database(make_app, app, client, tmp_path, fmt):
+    register(client, 'active@example.com')
+    register(client, 'inactive@example.com')
+    with app.app_context():
+        user = User.query.filter_by(email='active@example.com').one()
+        user.subscription_status, user.customer_id = 'active', 'cus_active'
+        db.session.commit()
+
+    everyone = client.get(f'/admin/users/export?format={fmt}', headers=ADMIN)
+    active = client.get(f'/admin/users/export?format={fmt}&status=active', headers=ADMIN).get_data(as_text=True)
+
+    assert everyone.status_code == 200
+    assert everyone.mimetype == {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}[fmt]
+    assert 'password' not in everyone.get_data(as_text=True)
+    assert 'active@example.com' in active and 'inactive@example.com' not in active
+
+    other = make_app(SQLALCHEMY_DATABASE_URI=f"sqlite:///{tmp_path / 'other.db'}").test_client()
+    register(other, 'inactive@example.com')
+    imported = other.post(f'/admin/users/import?format={fmt}', data=everyone.get_data(), headers=ADMIN)
+
+    assert imported.get_json() == {'inserted': 1, 'skipped': 1, 'invalid': 0}
+    # Imported users have no password yet
+    login = other.post('/login', json={'email': 'active@example.com', 'password': PASSWORD})
+    assert login.status_code == 401
+    exported = other.get('/admin/users/export?status=active', headers=ADMIN).get_data(as_text=True)
+    assert json.loads(exported)['customer_id'] == 'cus_active'
+
+
+def test_import_counts_invalid_records(client):
+    body = '\n'.join([json.dumps({'email': 'new@example.com'}), json.dumps({'email': ''}), json.dumps(['x'])])
+
+    response = client.post('/admin/users/import', data=body, headers=ADMIN)
+
+    assert response.get_json() == {'inserted': 1, 'skipped': 0, 'invalid': 2}
+    assert client.post('/admin/users/import?format=xml', data='', headers=ADMIN).status_code == 400
\ No newline at end of file
@@ -0,0 +1,28 @@
+import json
+import subprocess
+import sys
+
+from conftest import BACKEND_DIR
+
+# Run in a fresh interpreter: other tests have long since imported everything
+CHECK_IMPORTS = """
+import json, sys
+import app
+imported = {'import': [name for name in NAMES if name in sys.modules]}
+app.create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'CELERY_BROKER_URL': 'memory://'})
+imported['create_app'] = [name for name in NAMES if name in sys.modules]
+print(json.dumps(imported))
+"""
+
+
+def test_stripe_and_celery_are_imported_lazily():
+    names = ['stripe', 'requests', 'httpx', 'celery', 'kombu']
+    output = subprocess.run(
+        [sys.executable, '-c', f"NAMES = {names!r}\n{CHECK_IMPORTS}"],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    imported = json.loads(output.splitlines()[-1])
+
+    assert imported['import'] == []
+    # Celery is configured by create_app; the Stripe SDK waits for the first call
+    assert imported['create_app'] == ['celery', 'kombu']
\ No newline at end of file
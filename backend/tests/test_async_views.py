@@ -0,0 +1,60 @@
+import asyncio
+
+import httpx
+import pytest
+from asgi import AsyncViewsApp
+from conftest import PASSWORD
+from extensions import db, recent_writes, subscription_cache, token_versions
+from stripe_http import PooledHTTPXClient
+from user import User
+
+
+@pytest.fixture
+def app(make_app, tmp_path):
+    # The replica is a second SQLite database that never receives any rows
+    app = make_app(READ_REPLICAS={'uris': [f"sqlite:///{tmp_path / 'replica.db'}"], 'retry_interval': 30})
+    with app.app_context():
+        db.metadata.create_all(db.engines['replica_0'])
+    return app
+
+
+def asgi_client(app):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=AsyncViewsApp(app)), base_url='http://test')
+
+
+def test_async_writes_keep_the_user_on_the_primary(app, stripe_stub):
+    async def scenario():
+        async with asgi_client(app) as client:
+            signup = await client.post('/register-and-subscribe', json={
+                'email': 'async@example.com', 'password': PASSWORD, 'paymentMethodId': 'pm_card_visa'})
+            assert signup.status_code == 201, signup.json()
+            with app.app_context():
+                user_id = User.query.filter_by(email='async@example.com').one().id
+            assert recent_writes.get(user_id) is True
+
+            recent_writes.clear()
+            headers = {'Authorization': f"Bearer {signup.json()['token']}"}
+            cancel = await client.post('/cancel-subscription', headers=headers)
+            assert cancel.status_code == 200, cancel.json()
+            assert recent_writes.get(user_id) is True
+            # Make /me read the database
+            subscription_cache.clear()
+            token_versions.clear()
+            return await client.get('/me', headers=headers)
+
+    me = asyncio.run(scenario())
+
+    # Read from the primary: the replica has no users
+    assert me.status_code == 200
+    assert me.json()['isSubscribed'] is False
+    assert stripe_stub.state.calls['subscription.delete'] == 1
+
+
+def test_async_client_keeps_a_bounded_pool():
+    client = PooledHTTPXClient(7, timeout=5)
+    pool = client._client_async._transport._pool
+
+    assert pool._max_connections == 7
+    assert pool._max_keepalive_connections == 7
+    with pytest.raises(RuntimeError):
+        client.request('GET', 'http://test', {})
\ No newline at end of file
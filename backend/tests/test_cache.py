@@ -0,0 +1,117 @@
+import os
+import time
+
+import fakeredis
+import pytest
+from cache import TwoTierCache
+
+
+@pytest.fixture
+def server():
+    return fakeredis.FakeServer()
+
+
+def process(server=None, **config):
+    """A cache as one worker process would have it, sharing ``server`` as its Redis tier."""
+    cache = TwoTierCache('test', 'TEST_CACHE')
+    cache.max_entries = config.get('max_entries', cache.max_entries)
+    cache.ttl = config.get('ttl', cache.ttl)
+    if server is not None:
+        cache.redis = fakeredis.FakeRedis(server=server)
+    return cache
+
+
+def wait_for(condition, timeout=2):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def listening(cache):
+    # get() starts the listener; wait until it has subscribed
+    cache.get('warm-up')
+    return wait_for(lambda: dict(cache.redis.pubsub_numsub(cache.channel))[cache.channel.encode()] >= 1)
+
+
+def test_local_tier_evicts_least_recently_used():
+    cache = process(max_entries=2)
+    cache.set(1, 'a')
+    cache.set(2, 'b')
+    cache.get(1)
+    cache.set(3, 'c')
+
+    assert [cache.get(key) for key in (1, 2, 3)] == ['a', None, 'c']
+    assert cache.stats()['evictions'] == 1
+
+
+def test_local_tier_expires_entries():
+    cache = process(ttl=0.05)
+    cache.set(1, 'a')
+    time.sleep(0.06)
+
+    assert cache.get(1) is None
+    assert cache.stats()['expirations'] == 1
+
+
+def test_other_processes_read_through_redis(server):
+    writer, reader = process(server), process(server)
+    writer.set(1, {'status': 'active'})
+
+    assert reader.get(1) == {'status': 'active'}
+    assert reader.stats()['redis_hits'] == 1
+    # Kept locally from then on
+    reader.get(1)
+    assert reader.stats()['hits'] == 1
+
+
+def test_fill_does_not_replace_a_newer_value(server):
+    writer, reader, other = process(server), process(server), process(server)
+
+    # A read that started before the write finishes after it
+    writer.set(1, 'new')
+    reader.fill(1, 'old')
+
+    assert other.get(1) == 'new'
+    # With nothing in Redis, a fill is stored for everyone
+    reader.fill(2, 'loaded')
+    assert other.get(2) == 'loaded'
+
+
+def test_published_set_evicts_other_processes_copies(server):
+    writer, reader = process(server), process(server)
+    listening(reader)
+    writer.set(1, 'old')
+    assert reader.get(1) == 'old'
+
+    writer.set(1, 'new', publish=True)
+
+    wait_for(lambda: reader.get(1) == 'new')
+    assert reader.stats()['invalidations'] == 1
+
+
+def test_invalidate_reaches_every_process(server):
+    writer, reader = process(server), process(server)
+    listening(reader)
+    listening(writer)
+    writer.set(1, 'value')
+    reader.get(1)
+
+    writer.invalidate(1)
+
+    wait_for(lambda: reader.get(1) is None)
+    # A process ignores its own messages; it already dropped the key
+    assert writer.stats()['invalidations'] == 1
+
+
+def test_unreachable_redis_falls_back_to_the_local_tier(server):
+    server.connected = False
+    cache = process(server)
+    # Without a listener thread, whose reconnects would clear the local tier
+    cache._listener_pid = os.getpid()
+
+    cache.set(1, 'local')
+
+    assert cache.get(1) == 'local'
+    assert cache.get(2) is None
+    assert cache.stats()['redis_errors'] == 2
\ No newline at end of file
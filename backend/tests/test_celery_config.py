@@ -0,0 +1,105 @@
+import celery_config
+import pytest
+from celery import Celery
+from celery_config import apply_worker_profile, delay_coalesced
+
+
+@pytest.fixture
+def celery(monkeypatch):
+    monkeypatch.setattr(celery_config, '_coalesced_until', {})
+    app = Celery('coalesce', broker='memory://', set_as_current=False)
+
+    @app.task(name='tests.drain')
+    def drain():
+        pass
+
+    with app.connection_for_write() as connection:
+        connection.SimpleQueue('celery').clear()
+    return app
+
+
+def queued(celery):
+    with celery.connection_for_write() as connection:
+        return connection.SimpleQueue('celery').qsize()
+
+
+def test_delay_coalesced_queues_once_per_window(celery):
+    drain = celery.tasks['tests.drain']
+
+    assert [delay_coalesced(drain, 60) for _ in range(5)] == [True, False, False, False, False]
+    assert queued(celery) == 1
+
+
+def test_delay_coalesced_queues_again_after_the_window(celery):
+    drain = celery.tasks['tests.drain']
+    delay_coalesced(drain, 60)
+
+    # The window ran out
+    celery_config._coalesced_until[drain.name] = 0
+
+    assert delay_coalesced(drain, 60) is True
+    assert queued(celery) == 2
+
+
+def test_delay_coalesced_without_window_queues_every_call(celery):
+    drain = celery.tasks['tests.drain']
+
+    assert [delay_coalesced(drain, 0) for _ in range(3)] == [True, True, True]
+    assert queued(celery) == 3
+
+
+def test_failed_publish_does_not_hold_the_window(celery, monkeypatch):
+    drain = celery.tasks['tests.drain']
+    apply_async = drain.apply_async
+    failures = []
+
+    def broker_down_once(*args, **kwargs):
+        if not failures:
+            failures.append(True)
+            raise ConnectionError("Broker unreachable")
+        return apply_async(*args, **kwargs)
+    monkeypatch.setattr(drain, 'apply_async', broker_down_once)
+
+    with pytest.raises(ConnectionError):
+        delay_coalesced(drain, 60)
+    assert delay_coalesced(drain, 60) is True
+    assert queued(celery) == 1
+
+
+def test_tasks_are_routed_to_their_queues(app):
+    celery = app.extensions['celery']
+    route = celery.amqp.router.route
+
+    assert route({}, 'tasks.process_subscription_job')['queue'].name == 'stripe'
+    assert route({}, 'tasks.drain_webhook_events')['queue'].name == 'webhooks'
+    assert route({}, 'tasks.reconcile_stripe_subscriptions')['queue'].name == 'maintenance'
+    assert route({}, 'tasks.purge_expired_revocations')['queue'].name == 'maintenance'
+    assert route({}, 'tasks.something_else')['queue'].name == 'celery'
+    assert celery.conf.task_acks_late is True
+
+
+def test_worker_profile_selects_its_queues(app):
+    celery = app.extensions['celery']
+
+    profile = apply_worker_profile(celery, app.config['WORKER_PROFILES'], 'webhooks')
+
+    assert set(celery.amqp.queues.consume_from) == set(profile['queues'])
+    assert celery.conf.worker_prefetch_multiplier == profile['prefetch_multiplier']
+    with pytest.raises(KeyError):
+        apply_worker_profile(celery, app.config['WORKER_PROFILES'], 'unknown')
+
+
+def test_beat_schedules_the_periodic_jobs(app):
+    schedule = app.extensions['celery'].conf.beat_schedule
+
+    assert schedule['reconcile-stripe-subscriptions']['schedule'] == app.config['RECONCILIATION']['interval']
+    assert schedule['purge-expired-revocations'] == {
+        'task': 'tasks.purge_expired_revocations',
+        'schedule': app.config['TOKEN_REVOCATION']['purge_interval'],
+    }
+
+
+def test_unset_interval_drops_its_job(make_app):
+    app = make_app(TOKEN_REVOCATION={'purge_interval': None})
+
+    assert set(app.extensions['celery'].conf.beat_schedule) == {'reconcile-stripe-subscriptions'}
\ No newline at end of file
@@ -0,0 +1,48 @@
+import pytest
+from cors import CORSMiddleware
+from werkzeug.test import Client
+from werkzeug.wrappers import Response
+
+ALLOWED = 'http://localhost:3000'
+
+
+@pytest.mark.parametrize('origin', [ALLOWED, 'https://evil.example.com', None], ids=['allowed', 'other', 'none'])
+def test_every_response_varies_on_origin(client, origin):
+    headers = {'Origin': origin} if origin else {}
+
+    response = client.get('/', headers=headers)
+
+    assert response.headers.get_all('Vary') == ['Origin']
+    assert response.headers.get('Access-Control-Allow-Origin') == (origin if origin == ALLOWED else None)
+
+
+def test_preflight_of_allowed_origin(client):
+    response = client.options('/login', headers={'Origin': ALLOWED, 'Access-Control-Request-Method': 'POST'})
+
+    assert response.status_code == 204
+    assert response.headers['Access-Control-Allow-Origin'] == ALLOWED
+    assert 'POST' in response.headers['Access-Control-Allow-Methods']
+    assert response.headers['Vary'] == 'Origin'
+
+
+def test_wildcard_origins():
+    middleware = CORSMiddleware(None, ['https://*.example.com'], ['GET'], [])
+
+    assert middleware.is_allowed('https://app.example.com')
+    assert middleware.is_allowed('https://a.b.example.com')
+    assert not middleware.is_allowed('https://example.com')
+    assert not middleware.is_allowed('https://app.example.com.evil.net')
+
+
+@pytest.mark.parametrize('vary, expected', [
+    ('Accept-Encoding', 'Accept-Encoding, Origin'),
+    ('Accept-Encoding, origin', 'Accept-Encoding, origin'),
+    ('*', '*'),
+])
+def test_existing_vary_header_is_extended(vary, expected):
+    app = Response('ok', headers={'Vary': vary})
+    client = Client(CORSMiddleware(app, [ALLOWED], ['GET'], []))
+
+    response = client.get('/', headers={'Origin': ALLOWED})
+
+    assert response.headers.get_all('Vary') == [expected]
\ No newline at end of file
@@ -0,0 +1,92 @@
+import sqlite3
+import time
+
+import pytest
+from conftest import post_webhook, register, webhook_event
+from extensions import db
+from user import User
+
+
+def get(client, path, headers, etag=None):
+    if etag:
+        headers = dict(headers, **{'If-None-Match': etag})
+    return client.get(path, headers=headers)
+
+
+@pytest.fixture(params=[False, True], ids=['memory', 'redis'])
+def app(make_app, request):
+    return make_app(redis=request.param)
+
+
+@pytest.mark.parametrize('path', ['/me', '/check-subscription'])
+def test_current_etag_gets_304(client, path):
+    headers = register(client, 'etag@example.com')
+
+    response = get(client, path, headers)
+    etag = response.headers['ETag']
+    not_modified = get(client, path, headers, etag)
+
+    assert response.status_code == 200
+    assert etag.startswith('W/"')
+    assert response.cache_control.private and response.cache_control.no_cache
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b''
+    assert not_modified.headers['ETag'] == etag
+
+
+def test_status_changes_bump_the_etag(app, client):
+    headers = register(client, 'changes@example.com')
+    etag = get(client, '/me', headers).headers['ETag']
+
+    # Subscribing (synchronously, against the Stripe stub)
+    response = client.post('/subscribe', json={'paymentMethodId': 'pm_card_visa'}, headers=headers)
+    assert response.status_code == 200, response.get_json()
+    subscribed = get(client, '/me', headers, etag)
+    assert subscribed.status_code == 200
+    assert subscribed.get_json()['isSubscribed'] is True
+    assert subscribed.headers['ETag'] != etag
+    etag = subscribed.headers['ETag']
+    assert get(client, '/me', headers, etag).status_code == 304
+
+    # A webhook applied by the drain
+    with app.app_context():
+        customer_id = User.query.filter_by(email='changes@example.com').one().customer_id
+    post_webhook(client, webhook_event('customer.subscription.deleted', customer_id, 100))
+    canceled = get(client, '/check-subscription', headers, etag)
+    assert canceled.status_code == 200
+    assert canceled.get_json()['isSubscribed'] is False
+    assert canceled.headers['ETag'] != etag
+
+
+def test_unchanged_status_keeps_the_etag(app, client):
+    headers = register(client, 'unchanged@example.com')
+    with app.app_context():
+        user = User.query.filter_by(email='unchanged@example.com').one()
+        user.customer_id = 'cus_unchanged'
+        db.session.commit()
+    etag = get(client, '/me', headers).headers['ETag']
+
+    post_webhook(client, webhook_event('customer.subscription.deleted', 'cus_unchanged', 100))
+    etag = get(client, '/me', headers, etag).headers['ETag']
+    post_webhook(client, webhook_event('customer.subscription.deleted', 'cus_unchanged', 200))
+
+    assert get(client, '/me', headers, etag).status_code == 304
+
+
+def test_change_from_another_process_bumps_the_etag_within_the_ttl(make_app, tmp_path):
+    # Without Redis, nothing tells this process about the change until its copy expires
+    app = make_app(TOKEN_VERSION_CACHE={'ttl': 0.2})
+    client = app.test_client()
+    headers = register(client, 'elsewhere@example.com')
+    etag = get(client, '/me', headers).headers['ETag']
+
+    # E.g. a Celery worker's drain, which can't touch this process's caches
+    with sqlite3.connect(tmp_path / 'test.db') as connection:
+        connection.execute("UPDATE user SET subscription_status = 'active', token_version = token_version + 1")
+
+    assert get(client, '/me', headers, etag).status_code == 304
+    time.sleep(0.25)
+    response = get(client, '/me', headers, etag)
+    assert response.status_code == 200
+    assert response.get_json()['isSubscribed'] is True
+    assert response.headers['ETag'] != etag
\ No newline at end of file
@@ -0,0 +1,14 @@
+import pytest
+from extensions import db
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+
+def test_failed_statements_leave_no_start_time(app):
+    with app.app_context(), db.engine.connect() as connection:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                connection.execute(text("SELECT * FROM no_such_table"))
+        connection.execute(text("SELECT 1"))
+
+        assert connection.info['query_start'] == []
\ No newline at end of file
@@ -0,0 +1,120 @@
+import time
+
+import pytest
+from conftest import PASSWORD, register
+from ratelimit import MemoryBackend, RateLimiter, retry_after
+from metrics import Registry
+
+
+def limits(per_ip=None, per_email=None, **options):
+    rules = {'per_ip': per_ip, 'per_email': per_email}
+    return dict({'enabled': True, 'proxy_count': 1}, **{name: rule for name, rule in rules.items() if rule}, **options)
+
+
+def login(client, email='nobody@example.com', ip='203.0.113.1', password='wrong'):
+    return client.post('/login', json={'email': email, 'password': password},
+                       headers={'X-Forwarded-For': ip})
+
+
+@pytest.mark.parametrize('redis', [False, True], ids=['memory', 'redis'])
+def test_per_ip_limit_rejects_with_retry_after(make_app, redis):
+    app = make_app(redis=redis, RATE_LIMITS=limits(per_ip={'limit': 3, 'window': 3600}))
+    client = app.test_client()
+
+    assert [login(client).status_code for _ in range(3)] == [401, 401, 401]
+    response = login(client)
+
+    assert response.status_code == 429
+    assert 1 <= int(response.headers['Retry-After']) <= 2 * 3600
+    # Another address is admitted
+    assert login(client, ip='203.0.113.2').status_code == 401
+
+
+@pytest.mark.parametrize('redis', [False, True], ids=['memory', 'redis'])
+def test_rejected_requests_are_not_counted(make_app, redis):
+    app = make_app(redis=redis, RATE_LIMITS=limits(per_ip={'limit': 2, 'window': 3600}))
+    client = app.test_client()
+    limiter = app.extensions['rate_limiter']
+
+    for _ in range(10):
+        login(client)
+
+    index = int(time.time() // 3600)
+    assert limiter.backend.hit('per_ip:203.0.113.1', 3600, index) == (0, 3)
+    if redis:
+        assert app.extensions['redis'].get(f'ratelimit:per_ip:203.0.113.1:{index}') == b'3'
+
+
+def test_per_email_limit_spans_addresses_and_releases_the_ip_hit(make_app):
+    app = make_app(RATE_LIMITS=limits(per_ip={'limit': 5, 'window': 3600}, per_email={'limit': 2, 'window': 3600}))
+    client = app.test_client()
+
+    assert login(client, ip='203.0.113.1').status_code == 401
+    assert login(client, ip='203.0.113.2').status_code == 401
+    assert login(client, ip='203.0.113.1').status_code == 429
+    # Other emails from the same address are still admitted; the rejected attempt left no IP hit behind
+    for index in range(4):
+        assert login(client, email=f'other{index}@example.com', ip='203.0.113.1').status_code == 401
+    assert login(client, email='fifth@example.com', ip='203.0.113.1').status_code == 429
+
+
+def test_email_is_matched_case_insensitively(make_app):
+    app = make_app(RATE_LIMITS=limits(per_email={'limit': 1, 'window': 3600}))
+    client = app.test_client()
+
+    assert login(client, email='Someone@Example.com').status_code == 401
+    assert login(client, email=' someone@example.com ').status_code == 429
+
+
+def test_disabled_limits_admit_everything(make_app):
+    app = make_app(RATE_LIMITS=limits(per_ip={'limit': 1, 'window': 3600}, enabled=False))
+    client = app.test_client()
+    register(client, 'user@example.com')
+
+    assert all(login(client, 'user@example.com', password=PASSWORD).status_code == 200 for _ in range(3))
+
+
+def test_redis_errors_admit_requests(make_app):
+    app = make_app(redis=True, RATE_LIMITS=limits(per_ip={'limit': 1, 'window': 3600}))
+    client = app.test_client()
+    app.extensions['redis'].connection_pool.connection_kwargs['server'].connected = False
+
+    assert [login(client).status_code for _ in range(3)] == [401, 401, 401]
+    assert 'rate_limit_requests_total{rule="per_ip",outcome="error"}' in client.get('/metrics').get_data(as_text=True)
+
+
+def test_memory_backend_slides_into_the_next_window():
+    backend = MemoryBackend()
+    for _ in range(4):
+        backend.hit('key', 60, 10)
+    backend.release('key', 60, 10)
+
+    assert backend.hit('key', 60, 11) == (3, 1)
+    assert backend.hit('key', 60, 13) == (0, 1)
+
+
+def test_memory_backend_drops_least_recently_used_keys():
+    backend = MemoryBackend(max_entries=2)
+    for key in ('a', 'b', 'a', 'c'):
+        backend.hit(key, 60, 1)
+
+    assert backend.hit('a', 60, 1) == (0, 3)
+    assert backend.hit('b', 60, 1) == (0, 1)
+
+
+def test_unknown_rule_is_admitted():
+    limiter = RateLimiter(Registry())
+
+    assert limiter.check('per_ip', '203.0.113.1') == (0, None)
+
+
+@pytest.mark.parametrize('previous, current, limit, window, elapsed, expected', [
+    # Rejected by the previous window's weight: admitted once enough of it slides out
+    (20, 3, 10, 60, 30, 9),
+    # Current window full: wait for it to end, then for its weight to decay
+    (0, 4, 3, 60, 10, 70),
+    # Never less than a second
+    (10, 1, 10, 60, 59.9, 1),
+])
+def test_retry_after(previous, current, limit, window, elapsed, expected):
+    assert retry_after(previous, current, limit, window, elapsed) == expected
\ No newline at end of file
@@ -0,0 +1,67 @@
+import pytest
+from conftest import register
+from extensions import db
+from reconcile import reconcile_subscriptions
+from user import User
+
+
+def stripe_subscription(stub, status='active', email='stripe@example.com'):
+    """Create a customer with a subscription in the stub; returns (customer id, subscription id)."""
+    with stub.state.lock:
+        customer = stub.state.create_customer({'email': email})
+        subscription = stub.state.create_subscription({'customer': customer['id']})
+        subscription['status'] = status
+    return customer['id'], subscription['id']
+
+
+def set_user(app, email, **values):
+    with app.app_context():
+        user = User.query.filter_by(email=email).one()
+        for name, value in values.items():
+            setattr(user, name, value)
+        db.session.commit()
+
+
+def stored(app, email):
+    with app.app_context():
+        user = User.query.filter_by(email=email).one()
+        return user.subscription_id, user.subscription_status
+
+
+def reconcile(app):
+    with app.app_context():
+        return reconcile_subscriptions(page_size=2)
+
+
+@pytest.mark.parametrize('no_subscription', ['none', ''], ids=['registered', 'imported'])
+def test_users_without_a_subscription_adopt_their_customers(app, client, stripe_stub, no_subscription):
+    register(client, 'adopt@example.com')
+    customer_id, subscription_id = stripe_subscription(stripe_stub)
+    set_user(app, 'adopt@example.com', customer_id=customer_id, subscription_id=no_subscription)
+
+    report = reconcile(app)
+
+    assert report['adopted'] == 1
+    assert report['updated'] == 1
+    assert stored(app, 'adopt@example.com') == (subscription_id, 'active')
+
+
+def test_drifted_statuses_are_fixed(app, client, stripe_stub):
+    register(client, 'drift@example.com')
+    register(client, 'fine@example.com')
+    customer_id, subscription_id = stripe_subscription(stripe_stub, status='past_due')
+    set_user(app, 'drift@example.com', customer_id=customer_id, subscription_id=subscription_id,
+             subscription_status='active')
+    customer_id, subscription_id = stripe_subscription(stripe_stub, status='canceled')
+    set_user(app, 'fine@example.com', customer_id=customer_id, subscription_id=subscription_id,
+             subscription_status='canceled')
+    stripe_subscription(stripe_stub, email='stranger@example.com')
+
+    report = reconcile(app)
+
+    assert report['scanned'] == 3
+    assert report['pages'] == 2
+    assert report['drifted'] == 1
+    assert report['unmatched'] == 1
+    assert stored(app, 'drift@example.com')[1] == 'payment_failed'
+    assert stored(app, 'fine@example.com')[1] == 'canceled'
\ No newline at end of file
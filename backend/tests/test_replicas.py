@@ -0,0 +1,65 @@
+from conftest import register
+from extensions import db, subscription_cache, token_versions
+
+
+def replica_app(make_app, *uris):
+    return make_app(READ_REPLICAS={'uris': list(uris), 'retry_interval': 30})
+
+
+def test_health_checks_each_replica(make_app, tmp_path):
+    app = replica_app(make_app, f"sqlite:///{tmp_path / 'replica.db'}", f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+
+    response = app.test_client().get('/health')
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'degraded'
+    assert body['read_replicas']['replica_0']['reachable'] is True
+    assert body['read_replicas']['replica_0']['healthy'] is True
+    assert body['read_replicas']['replica_1']['reachable'] is False
+    assert body['read_replicas']['replica_1']['healthy'] is False
+    assert 'unable to open' in body['read_replicas']['replica_1']['error']
+
+
+def test_health_without_replicas(client):
+    response = client.get('/health')
+
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'healthy'
+
+
+def test_failing_replica_falls_back_to_the_primary(make_app, tmp_path):
+    # The replica has no tables, so reading from it fails
+    app = replica_app(make_app, f"sqlite:///{tmp_path / 'replica.db'}")
+    client = app.test_client()
+    headers = register(client, 'fallback@example.com')
+    app.extensions['read_replicas'].recent_writes.clear()
+    subscription_cache.clear()
+    token_versions.clear()
+
+    response = client.get('/me', headers=headers)
+
+    assert response.status_code == 200
+    stats = app.extensions['read_replicas'].stats()
+    assert stats['replica_0'] == {'reads': 1, 'failures': 1, 'healthy': False}
+
+
+def test_reads_use_the_replica_until_the_user_writes(make_app, tmp_path):
+    app = replica_app(make_app, f"sqlite:///{tmp_path / 'replica.db'}")
+    with app.app_context():
+        db.metadata.create_all(db.engines['replica_0'])
+    client = app.test_client()
+    headers = register(client, 'replica@example.com')
+    subscription_cache.clear()
+    token_versions.clear()
+
+    # Just registered: read from the primary
+    assert client.get('/me', headers=headers).status_code == 200
+    # Once the write has aged out, from the replica, which has no such user
+    app.extensions['read_replicas'].recent_writes.clear()
+    subscription_cache.clear()
+    token_versions.clear()
+    assert client.get('/me', headers=headers).status_code == 404
+    stats = app.extensions['read_replicas'].stats()
+    assert stats['primary']['recent_writes'] == 1
+    assert stats['replica_0']['reads'] == 1
\ No newline at end of file
@@ -0,0 +1,91 @@
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import fakeredis
+from conftest import PASSWORD, register
+from extensions import db
+from revocation import BloomFilter, RevocationList, RevokedToken, revocation_list
+from tasks import purge_expired_revocations
+
+
+def login(client, email):
+    response = client.post('/login', json={'email': email, 'password': PASSWORD})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['token']}"}
+
+
+def revoke_elsewhere(app, expires_in=3600):
+    """Insert a revocation as another process would, without touching this one's filter."""
+    jti = str(uuid.uuid4())
+    with app.app_context():
+        db.session.add(RevokedToken(jti=jti, expires_at=datetime.utcnow() + timedelta(seconds=expires_in)))
+        db.session.commit()
+    return jti
+
+
+def test_logout_revokes_only_the_presented_token(client):
+    headers = register(client, 'logout@example.com')
+    other = login(client, 'logout@example.com')
+
+    assert client.post('/logout', headers=headers).status_code == 200
+
+    assert client.get('/me', headers=headers).status_code == 401
+    assert client.get('/me', headers=other).status_code == 200
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(1000, 0.01)
+    added = [str(uuid.uuid4()) for _ in range(1000)]
+    for jti in added:
+        bloom.add(jti)
+
+    assert all(jti in bloom for jti in added)
+    false_positives = sum(str(uuid.uuid4()) in bloom for _ in range(10000))
+    assert false_positives < 300
+
+
+def test_revocations_from_other_processes_are_synced(make_app):
+    app = make_app(TOKEN_REVOCATION={'sync_interval': 0.2})
+    with app.app_context():
+        assert revocation_list.is_revoked('unknown') is False
+        jti = revoke_elsewhere(app)
+
+        # Not in this process's filter until the next sync
+        assert revocation_list.is_revoked(jti) is False
+        time.sleep(0.25)
+        assert revocation_list.is_revoked(jti) is True
+
+
+def test_revocations_are_published_over_redis(app):
+    server = fakeredis.FakeServer()
+    # Two processes with syncs too rare to matter here
+    processes = [RevocationList(), RevocationList()]
+    for process in processes:
+        process.init_app(app, redis_client=fakeredis.FakeRedis(server=server))
+        process.sync_interval = 3600
+    revoker, listener = processes
+
+    with app.app_context():
+        listener.is_revoked('warm-up')
+        deadline = time.monotonic() + 2
+        while dict(listener.redis.pubsub_numsub(listener.channel))[listener.channel.encode()] < 1:
+            assert time.monotonic() < deadline, "listener never subscribed"
+            time.sleep(0.01)
+
+        revoker.revoke('published-jti', expires_at=datetime.utcnow() + timedelta(hours=1))
+
+        deadline = time.monotonic() + 2
+        while not listener.is_revoked('published-jti'):
+            assert time.monotonic() < deadline, "revocation never arrived"
+            time.sleep(0.01)
+
+
+def test_purge_deletes_only_expired_revocations(app):
+    expired = revoke_elsewhere(app, expires_in=-60)
+    current = revoke_elsewhere(app)
+
+    with app.app_context():
+        assert purge_expired_revocations() == 1
+        assert [row.jti for row in RevokedToken.query.all()] == [current]
+        assert db.session.get(RevokedToken, expired) is None
\ No newline at end of file
@@ -0,0 +1,84 @@
+import pytest
+from conftest import register
+from extensions import db, subscription_cache, token_versions
+from sqlalchemy import event
+from user import User
+
+
+class StatementCounter:
+    def __init__(self, engine):
+        self.engine = engine
+        self.count = 0
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        self.count += 1
+
+
+@pytest.fixture
+def app(make_app, request):
+    return make_app(**getattr(request, 'param', {}))
+
+
+@pytest.fixture
+def count_statements(app):
+    def counter():
+        with app.app_context():
+            return StatementCounter(db.engine)
+    return counter
+
+
+@pytest.mark.parametrize('app', [{}, {'JWT_SUBSCRIPTION_CLAIMS': True}], indirect=True, ids=['cache', 'claims'])
+def test_cached_reads_run_no_sql(client, count_statements):
+    headers = register(client, 'reads@example.com')
+    etag = client.get('/me', headers=headers).headers['ETag']
+
+    with count_statements() as statements:
+        for _ in range(5):
+            assert client.get('/me', headers=headers).status_code == 200
+            assert client.get('/check-subscription', headers=headers).status_code == 200
+            assert client.get('/me', headers=dict(headers, **{'If-None-Match': etag})).status_code == 304
+
+    assert statements.count == 0
+
+
+def user_id(app, email):
+    with app.app_context():
+        return User.query.filter_by(email=email).one().id
+
+
+def test_entries_are_served_only_at_the_current_version(app, client):
+    headers = register(client, 'versions@example.com')
+    uid = user_id(app, 'versions@example.com')
+    client.get('/me', headers=headers)
+    version = token_versions.get(uid)
+
+    # Served from the cache at the current version...
+    subscription_cache.set(uid, {'email': 'cached@example.com', 'subscription_status': 'active', 'token_version': version})
+    assert client.get('/me', headers=headers).get_json()['email'] == 'cached@example.com'
+
+    # ...but not once the version moved on
+    token_versions.set(uid, version + 1)
+    me = client.get('/me', headers=headers).get_json()
+    assert me['email'] == 'versions@example.com'
+    assert me['isSubscribed'] is False
+
+
+def test_lagging_row_does_not_replace_a_newer_entry(app, client):
+    headers = register(client, 'lagging@example.com')
+    uid = user_id(app, 'lagging@example.com')
+    client.get('/me', headers=headers)
+    version = token_versions.get(uid)
+    newer = {'email': 'lagging@example.com', 'subscription_status': 'active', 'token_version': version + 1}
+
+    # E.g. a replica that hasn't caught up with a change this process cached
+    subscription_cache.set(uid, newer)
+    assert client.get('/me', headers=headers).status_code == 200
+
+    assert subscription_cache.get(uid) == newer
\ No newline at end of file
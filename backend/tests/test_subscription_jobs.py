@@ -0,0 +1,97 @@
+import stripe
+import tasks
+from conftest import PASSWORD, register
+from extensions import db
+from user import SubscriptionJob, User
+
+
+def subscribe_in_background(client, headers):
+    response = client.post('/subscribe', json={'paymentMethodId': 'pm_card_visa'}, headers=headers)
+    assert response.status_code == 202, response.get_json()
+    return response.get_json()['jobId']
+
+
+def stripe_writes(stub):
+    calls = stub.state.calls
+    return {name: calls[name] for name in
+            ('customer.create', 'payment_method.attach', 'customer.modify', 'subscription.create')}
+
+
+def test_job_subscribes_once(make_app, stripe_stub):
+    app = make_app(ASYNC_SUBSCRIPTIONS=True)
+    client = app.test_client()
+    headers = register(client, 'job@example.com')
+
+    job_id = subscribe_in_background(client, headers)
+
+    job = client.get(f'/subscription-jobs/{job_id}', headers=headers).get_json()
+    assert job['status'] == 'succeeded'
+    assert stripe_writes(stripe_stub) == {
+        'customer.create': 1, 'payment_method.attach': 1, 'customer.modify': 1, 'subscription.create': 1}
+    assert client.get('/me', headers=headers).get_json()['isSubscribed'] is True
+
+
+def test_retry_after_lost_response_repeats_no_stripe_writes(make_app, stripe_stub, monkeypatch):
+    app = make_app(ASYNC_SUBSCRIPTIONS=True)
+    client = app.test_client()
+    headers = register(client, 'retry@example.com')
+
+    create = tasks.create_stripe_subscription
+    attempts = []
+
+    def lose_first_response(*args, **kwargs):
+        # Stripe creates the subscription, but the response never arrives
+        subscription = create(*args, **kwargs)
+        attempts.append(kwargs['idempotency_prefix'])
+        if len(attempts) == 1:
+            raise stripe.error.APIConnectionError("Connection reset")
+        return subscription
+    monkeypatch.setattr(tasks, 'create_stripe_subscription', lose_first_response)
+
+    job_id = subscribe_in_background(client, headers)
+
+    assert attempts == [job_id, job_id]
+    assert stripe_writes(stripe_stub)['subscription.create'] == 1
+    assert stripe_writes(stripe_stub)['customer.create'] == 1
+    assert stripe_stub.state.calls['idempotent_replay'] >= 1
+    assert len(stripe_stub.state.subscriptions) == 1
+    with app.app_context():
+        job = db.session.get(SubscriptionJob, job_id)
+        assert job.status == 'succeeded'
+        assert job.subscription_id in stripe_stub.state.subscriptions
+
+
+def test_redelivered_job_repeats_no_stripe_writes(make_app, stripe_stub):
+    app = make_app(ASYNC_SUBSCRIPTIONS=True)
+    client = app.test_client()
+    headers = register(client, 'redelivered@example.com')
+    job_id = subscribe_in_background(client, headers)
+    writes = stripe_writes(stripe_stub)
+
+    # The worker died after the Stripe calls, before recording the outcome
+    with app.app_context():
+        job = db.session.get(SubscriptionJob, job_id)
+        job.status = 'running'
+        job.subscription_id = None
+        db.session.commit()
+    tasks.process_subscription_job.apply(args=[job_id])
+
+    assert stripe_writes(stripe_stub) == writes
+    with app.app_context():
+        job = db.session.get(SubscriptionJob, job_id)
+        user = db.session.get(User, job.user_id)
+        assert job.status == 'succeeded'
+        assert user.subscription_id == job.subscription_id
+        assert user.subscription_status == 'active'
+
+
+def test_finished_job_is_not_run_again(make_app, stripe_stub):
+    app = make_app(ASYNC_SUBSCRIPTIONS=True)
+    client = app.test_client()
+    headers = register(client, 'finished@example.com')
+    job_id = subscribe_in_background(client, headers)
+    calls = sum(stripe_stub.state.calls.values())
+
+    assert tasks.process_subscription_job.apply(args=[job_id]).get() == 'succeeded'
+    assert sum(stripe_stub.state.calls.values()) == calls
+    assert client.post('/login', json={'email': 'finished@example.com', 'password': PASSWORD}).status_code == 200
\ No newline at end of file
@@ -0,0 +1,116 @@
+import json
+
+from conftest import post_webhook, register, webhook_event
+from extensions import db
+from user import User
+from webhooks import WebhookEvent, drain_events, record_event
+
+
+def customer(app, client, email, customer_id, status='inactive'):
+    """Register a user linked to Stripe customer ``customer_id``; returns their auth header."""
+    headers = register(client, email)
+    with app.app_context():
+        user = User.query.filter_by(email=email).one()
+        user.customer_id = customer_id
+        user.subscription_status = status
+        db.session.commit()
+    return headers
+
+
+def user_state(app, customer_id):
+    with app.app_context():
+        user = User.query.filter_by(customer_id=customer_id).one()
+        return user.subscription_status, user.token_version
+
+
+def record(app, *events):
+    """Store events as /webhook does, without draining them."""
+    with app.app_context():
+        for event in events:
+            record_event(event, json.dumps(event))
+
+
+def test_webhook_applies_status(app, client):
+    headers = customer(app, client, 'paid@example.com', 'cus_paid')
+
+    response = post_webhook(client, webhook_event('invoice.payment_succeeded', 'cus_paid', 100))
+
+    assert response.get_json() == {'status': 'success'}
+    assert user_state(app, 'cus_paid')[0] == 'active'
+    assert client.get('/me', headers=headers).get_json()['isSubscribed'] is True
+
+
+def test_duplicate_and_unsigned_webhooks_are_not_applied(app, client):
+    customer(app, client, 'dup@example.com', 'cus_dup')
+    event = webhook_event('invoice.payment_succeeded', 'cus_dup', 100)
+    post_webhook(client, event)
+    version = user_state(app, 'cus_dup')[1]
+
+    assert post_webhook(client, event).get_json() == {'status': 'duplicate'}
+    assert post_webhook(client, webhook_event('customer.subscription.deleted', 'cus_dup', 200),
+                        secret='whsec_other').status_code == 400
+    assert user_state(app, 'cus_dup') == ('active', version)
+
+
+def test_out_of_order_delivery_does_not_roll_back(app, client):
+    customer(app, client, 'late@example.com', 'cus_late', status='active')
+
+    post_webhook(client, webhook_event('customer.subscription.deleted', 'cus_late', 200))
+    post_webhook(client, webhook_event('invoice.payment_succeeded', 'cus_late', 100))
+
+    assert user_state(app, 'cus_late')[0] == 'canceled'
+    with app.app_context():
+        assert WebhookEvent.query.filter(WebhookEvent.processed_at.is_(None)).count() == 0
+
+
+def test_drain_coalesces_to_latest_status_per_customer(app, client):
+    customer(app, client, 'a@example.com', 'cus_a')
+    customer(app, client, 'b@example.com', 'cus_b', status='active')
+    versions = {customer_id: user_state(app, customer_id)[1] for customer_id in ('cus_a', 'cus_b')}
+    # Received newest first
+    record(app,
+           webhook_event('customer.subscription.updated', 'cus_a', 300, status='past_due'),
+           webhook_event('invoice.payment_failed', 'cus_a', 200),
+           webhook_event('invoice.payment_succeeded', 'cus_a', 100),
+           webhook_event('invoice.payment_succeeded', 'cus_b', 150),
+           webhook_event('customer.created', 'cus_b', 160))
+
+    with app.app_context():
+        totals = drain_events(batch_size=500)
+
+    assert totals == {'batches': 1, 'events': 5, 'users_updated': 1}
+    # One bump for the changed user, none for the one already in the target status
+    assert user_state(app, 'cus_a') == ('past_due', versions['cus_a'] + 1)
+    assert user_state(app, 'cus_b') == ('active', versions['cus_b'])
+
+
+def test_drain_across_batches_keeps_the_newest_status(app, client):
+    customer(app, client, 'batches@example.com', 'cus_batches')
+    record(app,
+           webhook_event('customer.subscription.deleted', 'cus_batches', 400),
+           webhook_event('invoice.payment_succeeded', 'cus_batches', 300),
+           webhook_event('invoice.payment_failed', 'cus_batches', 200),
+           webhook_event('invoice.payment_succeeded', 'cus_batches', 100))
+
+    with app.app_context():
+        totals = drain_events(batch_size=2)
+
+    assert totals['batches'] == 2
+    assert totals['events'] == 4
+    assert user_state(app, 'cus_batches')[0] == 'canceled'
+
+
+def test_drain_skips_batch_older_than_a_claimed_event(app, client):
+    customer(app, client, 'claimed@example.com', 'cus_claimed', status='active')
+    # A newer event another drain has claimed but not applied yet
+    record(app, webhook_event('customer.subscription.deleted', 'cus_claimed', 200, event_id='evt_newer'))
+    with app.app_context():
+        db.session.get(WebhookEvent, 'evt_newer').batch_id = 'other-drain'
+        db.session.commit()
+    record(app, webhook_event('invoice.payment_failed', 'cus_claimed', 100))
+
+    with app.app_context():
+        totals = drain_events()
+
+    assert totals == {'batches': 1, 'events': 1, 'users_updated': 0}
+    assert user_state(app, 'cus_claimed')[0] == 'active'
\ No newline at end of file
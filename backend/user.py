@@ -1,50 +1,508 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, g
+import asyncio
 import os
-import stripe
+import json
+import uuid
 from datetime import datetime
-from extensions import db
-from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy import case, select, update
+from stripe_client import stripe
+from extensions import (
+    db, subscription_cache, token_versions, payment_method_cache, password_hasher, stripe_client, async_db,
+    read_replicas, rate_limiter
+)
+from passwords import PasswordHasherBusy
+from revocation import revocation_list
+from replicas import read_only
+from ratelimit import rate_limited
+from json_provider import ConstantJSON
 from flask_jwt_extended import (
     create_access_token, set_access_cookies, 
-    unset_jwt_cookies, jwt_required, get_jwt_identity
+    unset_jwt_cookies, jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
 )
+from flask_jwt_extended.exceptions import JWTExtendedException
+from jwt import PyJWTError
 
 # Create blueprint
 user_bp = Blueprint('user', __name__)
 
+# Constant response bodies, serialized once
+USER_NOT_FOUND = ConstantJSON({"error": "User not found"}, 404)
+CREDENTIALS_REQUIRED = ConstantJSON({"error": "Email and password required"}, 400)
+EMAIL_TAKEN = ConstantJSON({"error": "Email already registered"}, 409)
+INVALID_CREDENTIALS = ConstantJSON({"error": "Invalid email or password"}, 401)
+SIGNUP_FIELDS_REQUIRED = ConstantJSON({"error": "Email, password, and payment method required"}, 400)
+PAYMENT_METHOD_REQUIRED = ConstantJSON({"error": "Payment method ID is required"}, 400)
+PRICE_NOT_CONFIGURED = ConstantJSON({"error": "Subscription price not configured"}, 500)
+UNEXPECTED_ERROR = ConstantJSON({"error": "An unexpected error occurred. Please try again"}, 500)
+JOB_NOT_FOUND = ConstantJSON({"error": "Job not found"}, 404)
+STRIPE_RATE_LIMITED = ConstantJSON({"error": "Rate limit exceeded. Please try again later"}, 429)
+STRIPE_AUTH_FAILED = ConstantJSON({"error": "Authentication with payment processor failed"}, 500)
+STRIPE_UNREACHABLE = ConstantJSON({"error": "Network error. Please try again"}, 503)
+SUBSCRIPTION_CANCELED = ConstantJSON({"success": True, "message": "Subscription canceled successfully."})
+SERVER_BUSY = ConstantJSON({"error": "Server busy. Please try again shortly"}, 503)
+LOGGED_OUT = ConstantJSON({"success": True})
+SUBSCRIBED = ConstantJSON({"isSubscribed": True})
+NOT_SUBSCRIBED = ConstantJSON({"isSubscribed": False})
+
+# Coroutine versions of the Stripe-bound views, served by asgi.py; keyed by endpoint
+ASYNC_VIEWS = {}
+
+def async_view(endpoint):
+    """Register the decorated coroutine as the ASGI app's version of a view."""
+    def register(func):
+        ASYNC_VIEWS[f"{user_bp.name}.{endpoint}"] = func
+        return func
+    return register
+
 class User(db.Model):
     """User model for subscription management."""
     id = db.Column(db.Integer, primary_key=True)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=True)
-    customer_id = db.Column(db.String(120), nullable=False)
-    subscription_id = db.Column(db.String(120), nullable=False)
+    # Indexed for webhook and reconciliation lookups
+    customer_id = db.Column(db.String(120), nullable=False, index=True)
+    subscription_id = db.Column(db.String(120), nullable=False, index=True)
     subscription_status = db.Column(db.String(50), nullable=False)
+    # Bumped on every subscription status change to invalidate token claims
+    token_version = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    
+    # Reporting queries filter by status and page through ids
+    __table_args__ = (db.Index('ix_user_subscription_status_id', 'subscription_status', 'id'),)
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
         
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.check(self.password_hash, password)
 
     def __repr__(self):
         return f'<User {self.email}>'
 
-# Initialize Stripe
-stripe.api_key = os.getenv("STRIPE_SECRET")
+class SubscriptionJob(db.Model):
+    """Background subscription request, polled by the client via its id."""
+    id = db.Column(db.String(32), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    kind = db.Column(db.String(32), nullable=False)
+    payment_method_id = db.Column(db.String(120), nullable=False)
+    price_id = db.Column(db.String(120), nullable=True)
+    # queued -> running -> succeeded | failed
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    customer_id = db.Column(db.String(120), nullable=True)
+    subscription_id = db.Column(db.String(120), nullable=True)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<SubscriptionJob {self.id} {self.status}>'
+
+# A user's reads stay on the primary for a while after their rows change
+read_replicas.track_writes(User, 'id')
+read_replicas.track_writes(SubscriptionJob, 'user_id')
+
+def load_subscription(user_id):
+    """Return the email/subscription status (and its token version) for a user, or None.
+
+    A cached entry is only used while its token version is the current one,
+    so an entry another process changed is never served.
+    """
+    cached = subscription_cache.get(user_id)
+    if cached is not None and cached.get("token_version") == current_token_version(user_id):
+        return cached
+    row = db.session.query(User.email, User.subscription_status, User.token_version).filter_by(id=user_id).first()
+    if row is None:
+        return None
+    entry = {"email": row.email, "subscription_status": row.subscription_status, "token_version": row.token_version}
+    if cached is None:
+        subscription_cache.fill(user_id, entry)
+        # The row carries the version too, which spares the next request's lookup
+        if token_versions.get(user_id) is None:
+            token_versions.fill(user_id, row.token_version)
+    elif row.token_version > (cached.get("token_version") or -1):
+        # Never replace a newer entry with a lagging replica's row
+        subscription_cache.set(user_id, entry)
+    return entry
+
+def set_subscription_status(user, status):
+    """Change a user's status and bump the version embedded in their tokens."""
+    user.subscription_status = status
+    user.token_version = User.token_version + 1
+
+def cache_subscription(user):
+    """Refresh the cached status and version after a committed subscription change."""
+    subscription_cache.set(
+        user.id,
+        {"email": user.email, "subscription_status": user.subscription_status, "token_version": user.token_version},
+        publish=True
+    )
+    token_versions.set(user.id, user.token_version, publish=True)
+
+def save_subscription_status(session, user, status):
+    """Set the status, commit and refresh the caches.
+
+    Takes the session so the async views can run it with AsyncSession.run_sync.
+    """
+    set_subscription_status(user, status)
+    session.commit()
+    cache_subscription(user)
+
+def apply_subscription_statuses(statuses, key="customer_id"):
+    """Apply ``{key value: status}`` with a single bulk UPDATE, commit and refresh caches.
+
+    Rows already in the target status are left alone so their token version
+    is not bumped. Returns the number of users changed.
+    """
+    changed = {}
+    if statuses:
+        column = getattr(User, key)
+        rows = db.session.query(User.id, column, User.subscription_status).filter(column.in_(list(statuses)))
+        changed = {
+            user_id: statuses[value]
+            for user_id, value, current in rows
+            if current != statuses[value]
+        }
+    if changed:
+        db.session.execute(
+            update(User)
+            .where(User.id.in_(list(changed)))
+            .values(
+                subscription_status=case(changed, value=User.id),
+                token_version=User.token_version + 1
+            )
+            .execution_options(synchronize_session=False)
+        )
+    db.session.commit()
+
+    # Store the new token versions rather than dropping them, so that a
+    # reader's fill of an older one can't land in the empty key
+    versions = {}
+    if changed:
+        versions = dict(db.session.query(User.id, User.token_version).filter(User.id.in_(list(changed))))
+    for user_id in changed:
+        subscription_cache.invalidate(user_id)
+    for user_id, version in versions.items():
+        token_versions.set(user_id, version, publish=True)
+        # Bulk UPDATEs bypass the session's write tracking
+        if read_replicas.enabled:
+            read_replicas.mark_written(user_id)
+    return len(changed)
+
+def current_token_version(user_id):
+    """Return the user's token version from the cache, else the database.
+
+    Looked up at most once per request; a miss loads only that column, from
+    a replica in read-only views. A version changed by another process is
+    seen once the local copy expires (TOKEN_VERSION_CACHE ttl), or straight
+    away through the Redis tier's invalidations.
+    """
+    versions = g.setdefault('token_versions', {})
+    if user_id in versions:
+        return versions[user_id]
+    version = token_versions.get(user_id)
+    if version is None:
+        version = db.session.execute(select(User.token_version).where(User.id == user_id)).scalar()
+        if version is None:
+            return None
+        token_versions.fill(user_id, version)
+    versions[user_id] = version
+    return version
+
+def create_user_token(user):
+    """Create an access token, embedding subscription claims when enabled."""
+    claims = None
+    if current_app.config.get('JWT_SUBSCRIPTION_CLAIMS'):
+        claims = {
+            "email": user.email,
+            "subscription_status": user.subscription_status,
+            "isSubscribed": user.subscription_status == "active",
+            "token_version": user.token_version
+        }
+    return create_access_token(identity=str(user.id), additional_claims=claims)
+
+def subscription_from_token(user_id):
+    """Return the subscription entry carried by the current JWT if it is still current."""
+    claims = get_jwt()
+    if "token_version" not in claims:
+        return None
+    if current_token_version(user_id) != claims["token_version"]:
+        return None
+    return {
+        "email": claims["email"],
+        "subscription_status": claims["subscription_status"],
+        "token_version": claims["token_version"]
+    }
+
+def entry_version(user_id, entry):
+    """Token version the entry's state belongs to; entries cached before it was stored fall back to the current one."""
+    version = entry.get("token_version")
+    return current_token_version(user_id) if version is None else version
+
+def subscription_etag(user_id, version):
+    # Weak: the same state may be sent as different bytes
+    return f"{user_id}-{version}"
+
+def subscription_not_modified(user_id):
+    """Return a 304 response if the client's copy of the user's subscription state is current.
+
+    Only the user's token version is looked up (cached, one column on a
+    miss); every status change bumps it. None when the request has no
+    If-None-Match or the copy is stale.
+    """
+    if not request.if_none_match:
+        return None
+    version = current_token_version(user_id)
+    if version is None or not request.if_none_match.contains_weak(subscription_etag(user_id, version)):
+        return None
+    return private_revalidated(current_app.response_class(status=304), user_id, version)
+
+def private_revalidated(response, user_id, version):
+    """Tag a subscription state response with its ETag; only the user's client may keep it, revalidating each time."""
+    response.set_etag(subscription_etag(user_id, version), weak=True)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+class InvalidPaymentMethod(Exception):
+    """Raised when Stripe refuses to attach the payment method."""
+
+def _idempotency_key(prefix, step):
+    # Without a prefix the Stripe client generates a fresh key per call
+    return f"{prefix}-{step}" if prefix else None
+
+def find_or_create_customer(email, idempotency_prefix=None):
+    """Reuse the first Stripe customer with this email or create one."""
+    customers = stripe_client.list_customers(email).data
+    if customers:
+        return customers[0]
+    return stripe_client.create_customer(email, idempotency_key=_idempotency_key(idempotency_prefix, "customer"))
+
+def stored_customer_id(user):
+    """The user's Stripe customer id, or None for sentinels like "unsubscribed" and imported rows."""
+    customer_id = user.customer_id or ""
+    return customer_id if customer_id.startswith("cus_") else None
+
+def _is_default_payment_method(customer_id, payment_method_id, customer=None):
+    # From the cache, else from ``customer``; None when neither can tell
+    cached = payment_method_cache.get(customer_id)
+    if cached is not None:
+        return cached == payment_method_id
+    if customer is not None:
+        settings = getattr(customer, "invoice_settings", None)
+        return getattr(settings, "default_payment_method", None) == payment_method_id
+    return None
+
+def _subscription_failed(customer_id):
+    # The cached default may be what made Stripe refuse
+    payment_method_cache.invalidate(customer_id)
+
+def create_stripe_subscription(customer_id, payment_method_id, price_id, idempotency_prefix=None, customer=None, **options):
+    """Attach the payment method and make it the default, unless it already is, then create the subscription.
+
+    Whether it already is comes from payment_method_cache, else from
+    ``customer`` when the caller has the object, else from retrieving the
+    customer. The subscription is given the payment method as well, so a
+    stale cache entry can't charge a different one.
+    """
+    is_default = _is_default_payment_method(customer_id, payment_method_id, customer)
+    if is_default is None:
+        is_default = _is_default_payment_method(
+            customer_id, payment_method_id, stripe_client.retrieve_customer(customer_id))
+
+    if not is_default:
+        try:
+            stripe_client.attach_payment_method(
+                payment_method_id, customer_id,
+                idempotency_key=_idempotency_key(idempotency_prefix, "attach")
+            )
+        except stripe.error.InvalidRequestError as e:
+            raise InvalidPaymentMethod(str(e)) from e
+
+        stripe_client.set_default_payment_method(
+            customer_id, payment_method_id,
+            idempotency_key=_idempotency_key(idempotency_prefix, "default-payment-method")
+        )
+
+    # Create subscription with expanded payment intent
+    try:
+        subscription = stripe_client.create_subscription(
+            customer_id, price_id,
+            idempotency_key=_idempotency_key(idempotency_prefix, "subscription"),
+            default_payment_method=payment_method_id,
+            **options
+        )
+    except stripe.error.StripeError:
+        _subscription_failed(customer_id)
+        raise
+    payment_method_cache.set(customer_id, payment_method_id, publish=True)
+    return subscription
+
+async def find_or_create_customer_async(email, idempotency_prefix=None):
+    customers = (await stripe_client.list_customers_async(email)).data
+    if customers:
+        return customers[0]
+    return await stripe_client.create_customer_async(
+        email, idempotency_key=_idempotency_key(idempotency_prefix, "customer"))
+
+async def create_stripe_subscription_async(customer_id, payment_method_id, price_id, idempotency_prefix=None, customer=None, **options):
+    """create_stripe_subscription for the async views.
+
+    When the payment method has to be attached, making it the customer's
+    default and creating the subscription then run concurrently; the
+    subscription is given the payment method itself so it doesn't depend
+    on the default.
+    """
+    is_default = _is_default_payment_method(customer_id, payment_method_id, customer)
+    if is_default is None:
+        is_default = _is_default_payment_method(
+            customer_id, payment_method_id, await stripe_client.retrieve_customer_async(customer_id))
+
+    def create():
+        return stripe_client.create_subscription_async(
+            customer_id, price_id,
+            idempotency_key=_idempotency_key(idempotency_prefix, "subscription"),
+            default_payment_method=payment_method_id,
+            **options
+        )
+
+    if not is_default:
+        try:
+            await stripe_client.attach_payment_method_async(
+                payment_method_id, customer_id,
+                idempotency_key=_idempotency_key(idempotency_prefix, "attach")
+            )
+        except stripe.error.InvalidRequestError as e:
+            raise InvalidPaymentMethod(str(e)) from e
+
+    try:
+        if is_default:
+            subscription = await create()
+        else:
+            default, subscription = await asyncio.gather(
+                stripe_client.set_default_payment_method_async(
+                    customer_id, payment_method_id,
+                    idempotency_key=_idempotency_key(idempotency_prefix, "default-payment-method")
+                ),
+                create(),
+                return_exceptions=True
+            )
+            if isinstance(subscription, BaseException):
+                raise subscription
+            if isinstance(default, BaseException):
+                # The subscription still charges its own payment method
+                current_app.logger.warning("Could not set default payment method for %s: %s", customer_id, default)
+                return subscription
+    except stripe.error.StripeError:
+        _subscription_failed(customer_id)
+        raise
+    payment_method_cache.set(customer_id, payment_method_id, publish=True)
+    return subscription
+
+def subscription_outcome(subscription):
+    """Map a new Stripe subscription to (stored status, response body, HTTP status)."""
+    if subscription.status == 'active':
+        # Payment succeeded without additional authentication
+        return "active", {
+            "success": True,
+            "status": "active",
+            "subscriptionId": subscription.id
+        }, 200
+
+    if subscription.status == 'incomplete' or subscription.status == 'trialing':
+        # Store subscription data but mark as pending until payment is confirmed
+        # Check if further action required (3D Secure, etc.)
+        payment_intent = subscription.latest_invoice.payment_intent
+        if payment_intent.status == 'requires_action':
+            return "pending", {
+                "success": False,
+                "requires_action": True,
+                "payment_intent_client_secret": payment_intent.client_secret,
+                "subscriptionId": subscription.id
+            }, 200
+        # Awaiting payment confirmation
+        return "pending", {
+            "success": True,
+            "status": "pending",
+            "subscriptionId": subscription.id,
+            "clientSecret": payment_intent.client_secret
+        }, 200
+
+    # Unexpected status
+    return None, {
+        "success": False,
+        "error": f"Unexpected subscription status: {subscription.status}",
+        "subscriptionId": subscription.id
+    }, 400
+
+def enqueue_subscription_job(user, kind, payment_method_id, price_id):
+    """Record a subscription job and hand it to Celery. Returns (job, error response)."""
+    from tasks import process_subscription_job
+
+    job = SubscriptionJob(
+        id=uuid.uuid4().hex,
+        user_id=user.id,
+        kind=kind,
+        payment_method_id=payment_method_id,
+        price_id=price_id,
+        status="queued"
+    )
+    db.session.add(job)
+    db.session.commit()
+    
+    try:
+        process_subscription_job.delay(job.id)
+    except Exception as e:
+        job.status = "failed"
+        job.error = f"Could not queue subscription: {str(e)}"
+        db.session.commit()
+        return job, (jsonify({"error": "Subscription service unavailable. Please try again", "jobId": job.id}), 503)
+    
+    return job, None
+
+def subscribe_error_response(e):
+    """Response for a Stripe error raised while subscribing."""
+    if isinstance(e, stripe.error.CardError):
+        # Since it's a decline, stripe.error.CardError will be caught
+        return jsonify({
+            "error": "Payment method declined",
+            "code": e.code,
+            "param": e.param,
+            "message": e.user_message or str(e)
+        }), 400
+    if isinstance(e, stripe.error.RateLimitError):
+        # Too many requests made to the API too quickly
+        return STRIPE_RATE_LIMITED()
+    if isinstance(e, stripe.error.InvalidRequestError):
+        # Invalid parameters were supplied to Stripe's API
+        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
+    if isinstance(e, stripe.error.AuthenticationError):
+        # Authentication with Stripe's API failed
+        return STRIPE_AUTH_FAILED()
+    if isinstance(e, stripe.error.APIConnectionError):
+        # Network communication with Stripe failed
+        return STRIPE_UNREACHABLE()
+    # Generic Stripe error
+    return jsonify({"error": f"Payment processing error: {str(e)}"}), 500
+
+@user_bp.errorhandler(PasswordHasherBusy)
+def handle_hasher_busy(e):
+    response = SERVER_BUSY()
+    response.headers['Retry-After'] = '1'
+    return response
 
 @user_bp.route('/register', methods=['POST'])
+@rate_limited
 def register():
     data = request.get_json()
     email = data.get('email')
     password = data.get('password')
     
     if not email or not password:
-        return jsonify({"error": "Email and password required"}), 400
+        return CREDENTIALS_REQUIRED()
         
     existing_user = User.query.filter_by(email=email).first()
     if existing_user:
-        return jsonify({"error": "Email already registered"}), 409
+        return EMAIL_TAKEN()
     
     # Create unsubscribed user
     user = User(
@@ -59,7 +517,7 @@ def register():
     
     # Create token without setting cookie
     # FIXED: Convert user.id to string for JWT subject
-    access_token = create_access_token(identity=str(user.id))
+    access_token = create_user_token(user)
     
     # Return token in response body
     return jsonify({
@@ -72,6 +530,7 @@ def register():
     }), 201
 
 @user_bp.route('/login', methods=['POST'])
+@rate_limited
 def login():
     data = request.get_json()
     email = data.get('email')
@@ -79,11 +538,16 @@ def login():
     
     user = User.query.filter_by(email=email).first()
     if not user or not user.check_password(password):
-        return jsonify({"error": "Invalid email or password"}), 401
+        return INVALID_CREDENTIALS()
+    
+    # Upgrade hashes made with outdated algorithm/cost settings
+    if password_hasher.needs_rehash(user.password_hash):
+        user.set_password(password)
+        db.session.commit()
     
     # Create token without setting cookie
     # FIXED: Convert user.id to string for JWT subject
-    access_token = create_access_token(identity=str(user.id))
+    access_token = create_user_token(user)
     
     # Return token in response body
     return jsonify({
@@ -97,26 +561,47 @@ def login():
 
 @user_bp.route('/logout', methods=['POST'])
 def logout():
-    # Simple success response - token handling done client-side
-    return jsonify({"success": True})
+    # An expired, revoked or otherwise invalid token still gets its cookies unset
+    try:
+        verify_jwt_in_request(optional=True)
+        claims = get_jwt()
+    except (JWTExtendedException, PyJWTError):
+        claims = {}
+    # Revoke the presented token until it would have expired anyway
+    if claims:
+        revocation_list.revoke(
+            claims["jti"],
+            expires_at=datetime.utcfromtimestamp(claims["exp"]),
+            user_id=int(claims["sub"])
+        )
+    response = LOGGED_OUT()
+    unset_jwt_cookies(response)
+    return response
 
 @user_bp.route('/me', methods=['GET'])
 @jwt_required()
+@read_only
 def get_current_user():
     # get_jwt_identity() returns the identity from the JWT which is now a string
     user_id = get_jwt_identity()
-    # Convert string user_id back to integer for database query
-    user = User.query.get(int(user_id))
+    # Convert string user_id back to integer for the cache/database lookup
+    user_id = int(user_id)
+    not_modified = subscription_not_modified(user_id)
+    if not_modified is not None:
+        return not_modified
+    entry = subscription_from_token(user_id) or load_subscription(user_id)
     
-    if not user:
-        return jsonify({"error": "User not found"}), 404
+    if not entry:
+        return USER_NOT_FOUND()
         
-    return jsonify({
-        "email": user.email,
-        "isSubscribed": user.subscription_status == "active"
+    response = jsonify({
+        "email": entry["email"],
+        "isSubscribed": entry["subscription_status"] == "active"
     })
+    return private_revalidated(response, user_id, entry_version(user_id, entry))
 
 @user_bp.route('/register-and-subscribe', methods=['POST'])
+@rate_limited
 def register_and_subscribe():
     """Combined endpoint to register a new user and create subscription in one step."""
     try:
@@ -126,46 +611,63 @@ def register_and_subscribe():
         payment_method_id = data.get('paymentMethodId')
         
         if not email or not password or not payment_method_id:
-            return jsonify({"error": "Email, password, and payment method required"}), 400
+            return SIGNUP_FIELDS_REQUIRED()
             
         existing_user = User.query.filter_by(email=email).first()
         if existing_user:
-            return jsonify({"error": "Email already registered"}), 409
+            return EMAIL_TAKEN()
         
-        # Create Stripe customer
-        customer = stripe.Customer.create(email=email)
+        # Hash before any Stripe call so an overloaded hasher can't orphan a subscription
+        password_hash = password_hasher.hash(password)
+        price_id = os.getenv("PRICE_ID_TEST")
         
-        # Attach payment method to customer
-        stripe.PaymentMethod.attach(payment_method_id, customer=customer.id)
+        if current_app.config.get('ASYNC_SUBSCRIPTIONS'):
+            # Register now, subscribe in the background; status stays inactive until the job succeeds
+            user = User(
+                email=email,
+                customer_id="unsubscribed",
+                subscription_id="none",
+                subscription_status="inactive",
+                password_hash=password_hash
+            )
+            db.session.add(user)
+            db.session.commit()
+            
+            job, error = enqueue_subscription_job(user, "register_and_subscribe", payment_method_id, price_id)
+            if error:
+                return error
+            
+            return jsonify({
+                "success": True,
+                "status": "queued",
+                "jobId": job.id,
+                "token": create_user_token(user),
+                "user": {
+                    "email": user.email,
+                    "isSubscribed": False
+                }
+            }), 202
         
-        # Set as default payment method
-        stripe.Customer.modify(
-            customer.id,
-            invoice_settings={"default_payment_method": payment_method_id}
-        )
+        # Create Stripe customer
+        customer = stripe_client.create_customer(email)
         
-        # Create subscription
-        price_id = os.getenv("PRICE_ID_TEST")
-        subscription = stripe.Subscription.create(
-            customer=customer.id,
-            items=[{"price": price_id}],
-            expand=["latest_invoice.payment_intent"],
-        )
+        # Attach payment method, set it as default and create the subscription
+        subscription = create_stripe_subscription(customer.id, payment_method_id, price_id, customer=customer)
         
         # Create user with subscription already active
         user = User(
             email=email,
             customer_id=customer.id,
             subscription_id=subscription.id,
-            subscription_status="active"
+            subscription_status="active",
+            password_hash=password_hash
         )
-        user.set_password(password)
         
         db.session.add(user)
         db.session.commit()
         
         # Create token
-        access_token = create_access_token(identity=str(user.id))
+        access_token = create_user_token(user)
         
         return jsonify({
             "success": True,
@@ -178,6 +680,8 @@ def register_and_subscribe():
             }
         }), 201
         
+    except PasswordHasherBusy:
+        raise
     except stripe.error.StripeError as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
@@ -189,134 +693,88 @@ def subscribe_user():
     try:
         # Convert string user_id back to integer for database query
         user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = db.session.get(User, int(user_id))
         
         if not user:
-            return jsonify({"error": "User not found"}), 404
+            return USER_NOT_FOUND()
         
         data = request.get_json()
         payment_method_id = data.get("paymentMethodId")
         
         if not payment_method_id:
-            return jsonify({"error": "Payment method ID is required"}), 400
+            return PAYMENT_METHOD_REQUIRED()
             
         price_id = os.getenv("PRICE_ID")
         if not price_id:
-            return jsonify({"error": "Subscription price not configured"}), 500
+            return PRICE_NOT_CONFIGURED()
         
-        # Check for existing customers using authenticated user's email
-        customers = stripe.Customer.list(email=user.email).data
+        if current_app.config.get('ASYNC_SUBSCRIPTIONS'):
+            job, error = enqueue_subscription_job(user, "subscribe", payment_method_id, price_id)
+            if error:
+                return error
+            return jsonify({"success": True, "status": "queued", "jobId": job.id}), 202
         
-        if customers:
-            customer = customers[0]  # Use the existing customer
-        else:
-            customer = stripe.Customer.create(email=user.email)
+        # Look the customer up by email only when no id is stored yet
+        customer_id, customer = stored_customer_id(user), None
+        if customer_id is None:
+            customer = find_or_create_customer(user.email)
+            customer_id = customer.id
 
-        # Attach payment method
+        # Attach payment method, set it as default and create the subscription
         try:
-            stripe.PaymentMethod.attach(payment_method_id, customer=customer.id)
-        except stripe.error.InvalidRequestError as e:
+            subscription = create_stripe_subscription(
+                customer_id, payment_method_id, price_id, customer=customer,
+                payment_behavior='default_incomplete'  # Important for handling auth requirements
+            )
+        except InvalidPaymentMethod as e:
             return jsonify({"error": "Invalid payment method", "details": str(e)}), 400
 
-        # Set as default payment method
-        stripe.Customer.modify(
-            customer.id,
-            invoice_settings={"default_payment_method": payment_method_id}
-        )
-
-        # Create subscription with expanded payment intent
-        subscription = stripe.Subscription.create(
-            customer=customer.id,
-            items=[{"price": price_id}],
-            payment_behavior='default_incomplete',  # Important for handling auth requirements
-            expand=["latest_invoice.payment_intent"],
-        )
-
         # Check subscription status to determine next steps
-        if subscription.status == 'active':
-            # Payment succeeded without additional authentication
-            user.customer_id = customer.id
+        status, body, status_code = subscription_outcome(subscription)
+        if status:
+            user.customer_id = customer_id
             user.subscription_id = subscription.id
-            user.subscription_status = "active"
-            db.session.commit()
-            
-            return jsonify({
-                "success": True,
-                "status": "active",
-                "subscriptionId": subscription.id
-            })
-            
-        elif subscription.status == 'incomplete' or subscription.status == 'trialing':
-            # Store subscription data but mark as pending until payment is confirmed
-            user.customer_id = customer.id
-            user.subscription_id = subscription.id
-            user.subscription_status = "pending"  # Use pending status until confirmed
-            db.session.commit()
-            
-            # Check if further action required (3D Secure, etc.)
-            payment_intent = subscription.latest_invoice.payment_intent
-            if payment_intent.status == 'requires_action':
-                return jsonify({
-                    "success": False,
-                    "requires_action": True,
-                    "payment_intent_client_secret": payment_intent.client_secret,
-                    "subscriptionId": subscription.id
-                })
-            else:
-                # Awaiting payment confirmation
-                return jsonify({
-                    "success": True,
-                    "status": "pending",
-                    "subscriptionId": subscription.id,
-                    "clientSecret": payment_intent.client_secret
-                })
-        else:
-            # Unexpected status
-            return jsonify({
-                "success": False,
-                "error": f"Unexpected subscription status: {subscription.status}",
-                "subscriptionId": subscription.id
-            }), 400
+            save_subscription_status(db.session, user, status)
+        return jsonify(body), status_code
 
-    except stripe.error.CardError as e:
-        # Since it's a decline, stripe.error.CardError will be caught
-        return jsonify({
-            "error": "Payment method declined",
-            "code": e.code,
-            "param": e.param,
-            "message": e.user_message or str(e)
-        }), 400
-    except stripe.error.RateLimitError as e:
-        # Too many requests made to the API too quickly
-        return jsonify({"error": "Rate limit exceeded. Please try again later"}), 429
-    except stripe.error.InvalidRequestError as e:
-        # Invalid parameters were supplied to Stripe's API
-        return jsonify({"error": f"Invalid parameters: {str(e)}"}), 400
-    except stripe.error.AuthenticationError as e:
-        # Authentication with Stripe's API failed
-        return jsonify({"error": "Authentication with payment processor failed"}), 500
-    except stripe.error.APIConnectionError as e:
-        # Network communication with Stripe failed
-        return jsonify({"error": "Network error. Please try again"}), 503
     except stripe.error.StripeError as e:
-        # Generic Stripe error
-        return jsonify({"error": f"Payment processing error: {str(e)}"}), 500
+        return subscribe_error_response(e)
     except Exception as e:
         # Unexpected error
-        return jsonify({"error": "An unexpected error occurred. Please try again"}), 500
+        return UNEXPECTED_ERROR()
+
+@user_bp.route('/subscription-jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def subscription_job_status(job_id):
+    """Poll the state of a background subscription job."""
+    job = db.session.get(SubscriptionJob, job_id)
+    if not job or job.user_id != int(get_jwt_identity()):
+        return JOB_NOT_FOUND()
+    
+    return jsonify({
+        "jobId": job.id,
+        "status": job.status,
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error
+    }), 200
 
 @user_bp.route('/check-subscription', methods=['GET'])
 @jwt_required()
+@read_only
 def check_subscription():
     """Check if a user has an active subscription."""
-    # Convert string user_id back to integer for database query
-    user_id = get_jwt_identity()
-    user = User.query.get(int(user_id))
+    # Convert string user_id back to integer for the cache/database lookup
+    user_id = int(get_jwt_identity())
+    not_modified = subscription_not_modified(user_id)
+    if not_modified is not None:
+        return not_modified
+    entry = subscription_from_token(user_id) or load_subscription(user_id)
     
-    if not user:
-        return jsonify({"error": "User not found"}), 404
+    if not entry:
+        return USER_NOT_FOUND()
         
-    return jsonify({"isSubscribed": user.subscription_status == "active"}), 200
+    response = SUBSCRIBED() if entry["subscription_status"] == "active" else NOT_SUBSCRIBED()
+    return private_revalidated(response, user_id, entry_version(user_id, entry))
 
 @user_bp.route('/cancel-subscription', methods=['POST'])
 @jwt_required()
@@ -325,82 +783,157 @@ def cancel_subscription():
     try:
         # Convert string user_id back to integer for database query
         user_id = get_jwt_identity()
-        user = User.query.get(int(user_id))
+        user = db.session.get(User, int(user_id))
         
         if not user:
-            return jsonify({"error": "User not found"}), 404
+            return USER_NOT_FOUND()
 
         # Cancel the subscription in Stripe
-        stripe.Subscription.delete(user.subscription_id)
+        stripe_client.delete_subscription(user.subscription_id)
 
         # Update the user's subscription status in the database
-        user.subscription_status = "canceled"
-        db.session.commit()
+        save_subscription_status(db.session, user, "canceled")
 
-        return jsonify({"success": True, "message": "Subscription canceled successfully."}), 200
+        return SUBSCRIPTION_CANCELED()
     except stripe.error.StripeError as e:
         return jsonify({"error": str(e)}), 500
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-@user_bp.route('/webhook', methods=['POST'])
-def stripe_webhook():
-    payload = request.get_data(as_text=True)
-    sig_header = request.headers.get('Stripe-Signature')
-    endpoint_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
-    
+# Coroutine versions of the views above, served by asgi.py. Stripe and the
+# database are awaited, so one worker keeps taking requests while these wait;
+# validation, responses and the stored rows are the same as the sync views.
+
+def mark_written_async(user_id):
+    """Keep the user's reads on the primary after an AsyncSession commit.
+
+    Only RoutingSession commits are tracked by read_replicas, so the async
+    views report their writes themselves.
+    """
+    if read_replicas.enabled:
+        read_replicas.mark_written(user_id)
+
+@async_view('register_and_subscribe')
+async def register_and_subscribe_async():
+    if current_app.config.get('ASYNC_SUBSCRIPTIONS'):
+        # Only enqueues a Celery job; nothing to await. Rate limited there
+        return await asyncio.to_thread(register_and_subscribe)
+    throttled = rate_limiter.admit()
+    if throttled is not None:
+        return throttled
     try:
-        event = stripe.Webhook.construct_event(
-            payload, sig_header, endpoint_secret
-        )
-    except ValueError:
-        return jsonify({"error": "Invalid payload"}), 400
-    except stripe.error.SignatureVerificationError:
-        return jsonify({"error": "Invalid signature"}), 400
-    
-    # Handle the event
+        data = request.get_json()
+        email = data.get('email')
+        password = data.get('password')
+        payment_method_id = data.get('paymentMethodId')
+        
+        if not email or not password or not payment_method_id:
+            return SIGNUP_FIELDS_REQUIRED()
+        
+        async with async_db.session() as session:
+            existing_user = await session.scalar(select(User.id).filter_by(email=email))
+        if existing_user:
+            return EMAIL_TAKEN()
+        
+        # Hash before any Stripe call, off the event loop
+        password_hash = await asyncio.to_thread(password_hasher.hash, password)
+        price_id = os.getenv("PRICE_ID_TEST")
+        
+        customer = await stripe_client.create_customer_async(email)
+        subscription = await create_stripe_subscription_async(customer.id, payment_method_id, price_id, customer=customer)
+        
+        async with async_db.session() as session:
+            user = User(
+                email=email,
+                customer_id=customer.id,
+                subscription_id=subscription.id,
+                subscription_status="active",
+                password_hash=password_hash
+            )
+            session.add(user)
+            await session.commit()
+        mark_written_async(user.id)
+        
+        return jsonify({
+            "success": True,
+            "token": create_user_token(user),
+            "subscriptionId": subscription.id,
+            "clientSecret": subscription.latest_invoice.payment_intent.client_secret,
+            "user": {
+                "email": user.email,
+                "isSubscribed": True
+            }
+        }), 201
+        
+    except PasswordHasherBusy:
+        raise
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@async_view('subscribe_user')
+async def subscribe_user_async():
+    verify_jwt_in_request()
+    if current_app.config.get('ASYNC_SUBSCRIPTIONS'):
+        return await asyncio.to_thread(subscribe_user)
     try:
-        if event['type'] == 'invoice.payment_succeeded':
-            invoice = event['data']['object']
-            customer_id = invoice['customer']
-
-            # Update subscription status to active
-            user = User.query.filter_by(customer_id=customer_id).first()
-            if user:
-                user.subscription_status = "active"
-                db.session.commit()
-
-        elif event['type'] == 'customer.subscription.deleted':
-            subscription = event['data']['object']
-            customer_id = subscription['customer']
-
-            # Update subscription status to canceled
-            user = User.query.filter_by(customer_id=customer_id).first()
-            if user:
-                user.subscription_status = "canceled"
-                db.session.commit()
-
-        elif event['type'] == 'invoice.payment_failed':
-            invoice = event['data']['object']
-            customer_id = invoice['customer']
-
-            # Update subscription status to payment_failed
-            user = User.query.filter_by(customer_id=customer_id).first()
-            if user:
-                user.subscription_status = "payment_failed"
-                db.session.commit()
-
-        elif event['type'] == 'customer.subscription.updated':
-            subscription = event['data']['object']
-            customer_id = subscription['customer']
-
-            # Update subscription status based on the new status
-            user = User.query.filter_by(customer_id=customer_id).first()
-            if user:
-                user.subscription_status = subscription['status']
-                db.session.commit()
+        async with async_db.session() as session:
+            user = await session.get(User, int(get_jwt_identity()))
+            if not user:
+                return USER_NOT_FOUND()
+            # End the read so no pooled connection is held while Stripe is awaited
+            await session.commit()
+            
+            data = request.get_json()
+            payment_method_id = data.get("paymentMethodId")
+            
+            if not payment_method_id:
+                return PAYMENT_METHOD_REQUIRED()
                 
-        return jsonify({"status": "success"}), 200
+            price_id = os.getenv("PRICE_ID")
+            if not price_id:
+                return PRICE_NOT_CONFIGURED()
+            
+            customer_id, customer = stored_customer_id(user), None
+            if customer_id is None:
+                customer = await find_or_create_customer_async(user.email)
+                customer_id = customer.id
+            try:
+                subscription = await create_stripe_subscription_async(
+                    customer_id, payment_method_id, price_id, customer=customer,
+                    payment_behavior='default_incomplete'
+                )
+            except InvalidPaymentMethod as e:
+                return jsonify({"error": "Invalid payment method", "details": str(e)}), 400
+            
+            status, body, status_code = subscription_outcome(subscription)
+            if status:
+                user.customer_id = customer_id
+                user.subscription_id = subscription.id
+                await session.run_sync(save_subscription_status, user, status)
+                mark_written_async(user.id)
+            return jsonify(body), status_code
+    
+    except stripe.error.StripeError as e:
+        return subscribe_error_response(e)
+    except Exception as e:
+        return UNEXPECTED_ERROR()
 
+@async_view('cancel_subscription')
+async def cancel_subscription_async():
+    verify_jwt_in_request()
+    try:
+        async with async_db.session() as session:
+            user = await session.get(User, int(get_jwt_identity()))
+            if not user:
+                return USER_NOT_FOUND()
+            await session.commit()
+            
+            await stripe_client.delete_subscription_async(user.subscription_id)
+            await session.run_sync(save_subscription_status, user, "canceled")
+        mark_written_async(user.id)
+        
+        return SUBSCRIPTION_CANCELED()
+    except stripe.error.StripeError as e:
+        return jsonify({"error": str(e)}), 500
     except Exception as e:
-        return jsonify({"error": f"Webhook handling error: {str(e)}"}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
\ No newline at end of file
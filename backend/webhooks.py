@@ -0,0 +1,208 @@
+import json
+import os
+import uuid
+from datetime import datetime
+import click
+from flask import Blueprint, request, jsonify, current_app
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+from extensions import db
+from stripe_client import stripe
+from user import apply_subscription_statuses
+
+# Create blueprint; CLI commands live under "flask webhooks ..."
+webhook_bp = Blueprint('webhooks', __name__, cli_group='webhooks')
+
+
+class WebhookEvent(db.Model):
+    """Stripe event received by /webhook; the id doubles as the dedupe key."""
+    id = db.Column(db.String(255), primary_key=True)
+    type = db.Column(db.String(100), nullable=False)
+    customer_id = db.Column(db.String(120), nullable=True, index=True)
+    # Subscription status the event maps to, None for events we don't act on
+    status = db.Column(db.String(50), nullable=True)
+    # Stripe's event timestamp, used to order and coalesce events
+    created = db.Column(db.Integer, nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    received_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    batch_id = db.Column(db.String(32), nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    def __repr__(self):
+        return f'<WebhookEvent {self.id} {self.type}>'
+
+
+def status_for_event(event):
+    """Return (customer_id, subscription status) for the events we act on."""
+    obj = event['data']['object']
+    if event['type'] == 'invoice.payment_succeeded':
+        return obj['customer'], "active"
+    if event['type'] == 'customer.subscription.deleted':
+        return obj['customer'], "canceled"
+    if event['type'] == 'invoice.payment_failed':
+        return obj['customer'], "payment_failed"
+    if event['type'] == 'customer.subscription.updated':
+        return obj['customer'], obj['status']
+    return None, None
+
+
+def record_event(event, payload):
+    """Persist an event. Returns False when it was already received."""
+    customer_id, status = status_for_event(event)
+    db.session.add(WebhookEvent(
+        id=event['id'],
+        type=event['type'],
+        customer_id=customer_id,
+        status=status,
+        created=event['created'],
+        payload=payload
+    ))
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+
+def drain_events(batch_size=500):
+    """Apply pending events batch by batch until none are left.
+
+    Each batch is claimed atomically, coalesced to the latest status per
+    customer and applied with one bulk UPDATE. A customer is skipped when a
+    newer event for it exists anywhere in the table, so out-of-order
+    deliveries and concurrent drains never roll a status back.
+    """
+    totals = {"batches": 0, "events": 0, "users_updated": 0}
+    while True:
+        events = _claim_batch(batch_size)
+        if not events:
+            return totals
+
+        # Events are ordered by creation time, so later ones win
+        latest = {}
+        for event in events:
+            if event.status is not None:
+                latest[event.customer_id] = (event.created, event.status)
+
+        if latest:
+            newest = dict(
+                db.session.query(WebhookEvent.customer_id, func.max(WebhookEvent.created))
+                .filter(WebhookEvent.customer_id.in_(list(latest)), WebhookEvent.status.isnot(None))
+                .group_by(WebhookEvent.customer_id)
+            )
+            statuses = {
+                customer_id: status
+                for customer_id, (created, status) in latest.items()
+                if created >= newest.get(customer_id, created)
+            }
+        else:
+            statuses = {}
+
+        db.session.query(WebhookEvent).filter(
+            WebhookEvent.id.in_([event.id for event in events])
+        ).update({"processed_at": datetime.utcnow()}, synchronize_session=False)
+        # Commits the processed marks together with the status changes
+        changed = apply_subscription_statuses(statuses, key="customer_id")
+
+        totals["batches"] += 1
+        totals["events"] += len(events)
+        totals["users_updated"] += changed
+
+
+def _claim_batch(batch_size):
+    batch_id = uuid.uuid4().hex
+    pending = [
+        event_id for (event_id,) in
+        db.session.query(WebhookEvent.id)
+        .filter(WebhookEvent.processed_at.is_(None), WebhookEvent.batch_id.is_(None))
+        .order_by(WebhookEvent.created, WebhookEvent.received_at)
+        .limit(batch_size)
+    ]
+    if not pending:
+        return []
+
+    # Only rows nobody else claimed in the meantime end up in this batch
+    db.session.query(WebhookEvent).filter(
+        WebhookEvent.id.in_(pending), WebhookEvent.batch_id.is_(None)
+    ).update({"batch_id": batch_id}, synchronize_session=False)
+    db.session.commit()
+
+    return (
+        db.session.query(WebhookEvent.id, WebhookEvent.customer_id, WebhookEvent.status, WebhookEvent.created)
+        .filter_by(batch_id=batch_id)
+        .order_by(WebhookEvent.created, WebhookEvent.received_at)
+        .all()
+    )
+
+
+def enqueue_drain():
+    from celery_config import delay_coalesced
+    from tasks import drain_webhook_events
+
+    try:
+        delay_coalesced(drain_webhook_events, current_app.config.get('WEBHOOK_DRAIN_DELAY', 0))
+    except Exception:
+        # The event is stored; the next drain or a replay will pick it up
+        current_app.logger.exception("Could not queue webhook drain")
+
+
+@webhook_bp.route('/webhook', methods=['POST'])
+def stripe_webhook():
+    payload = request.get_data(as_text=True)
+    sig_header = request.headers.get('Stripe-Signature')
+    endpoint_secret = os.getenv("STRIPE_WEBHOOK_SECRET")
+
+    try:
+        event = stripe.Webhook.construct_event(
+            payload, sig_header, endpoint_secret
+        )
+    except ValueError:
+        return jsonify({"error": "Invalid payload"}), 400
+    except stripe.error.SignatureVerificationError:
+        return jsonify({"error": "Invalid signature"}), 400
+
+    # Store the event and ack straight away; a worker applies it
+    try:
+        if not record_event(event, payload):
+            return jsonify({"status": "duplicate"}), 200
+    except Exception as e:
+        return jsonify({"error": f"Webhook handling error: {str(e)}"}), 500
+
+    enqueue_drain()
+    return jsonify({"status": "success"}), 200
+
+
+@webhook_bp.cli.command('replay')
+@click.option('--event-id', 'event_ids', multiple=True, help='Replay specific event ids.')
+@click.option('--since', type=click.DateTime(), help='Replay events received since this time.')
+@click.option('--stuck', is_flag=True, help='Release claimed but unprocessed events.')
+@click.option('--enqueue', is_flag=True, help='Hand the drain to Celery instead of running it here.')
+def replay_events(event_ids, since, stuck, enqueue):
+    """Re-feed stored webhook events through the drain."""
+    query = WebhookEvent.query
+    if event_ids:
+        query = query.filter(WebhookEvent.id.in_(event_ids))
+    elif since:
+        query = query.filter(WebhookEvent.received_at >= since)
+    elif stuck:
+        query = query.filter(WebhookEvent.processed_at.is_(None), WebhookEvent.batch_id.isnot(None))
+    else:
+        raise click.UsageError("Pass --event-id, --since or --stuck")
+
+    count = 0
+    for event in query.yield_per(500):
+        # Re-derive the status so mapping fixes apply to old events too
+        event.customer_id, event.status = status_for_event(json.loads(event.payload))
+        event.processed_at = None
+        event.batch_id = None
+        count += 1
+    db.session.commit()
+    click.echo(f"Re-queued {count} events")
+
+    if enqueue:
+        enqueue_drain()
+    else:
+        totals = drain_events(current_app.config.get('WEBHOOK_BATCH_SIZE', 500))
+        click.echo(f"Applied {totals['events']} events in {totals['batches']} batches, "
+                   f"{totals['users_updated']} users updated")
@@ -0,0 +1,19 @@
+"""Celery entry point:
+
+    celery -A worker.celery worker --loglevel=info
+
+consumes every queue. With CELERY_WORKER_PROFILE set to one of the
+WORKER_PROFILES in config.json, the worker consumes only that profile's
+queues with its pool, concurrency and prefetch multiplier:
+
+    CELERY_WORKER_PROFILE=stripe celery -A worker.celery worker --loglevel=info
+"""
+import os
+from app import create_app
+from celery_config import apply_worker_profile
+
+app = create_app()
+celery = app.extensions['celery']
+
+if os.environ.get('CELERY_WORKER_PROFILE'):
+    apply_worker_profile(celery, app.config['WORKER_PROFILES'], os.environ['CELERY_WORKER_PROFILE'])
\ No newline at end of file
@@ -0,0 +1,22 @@
+"""WSGI entry point for gunicorn:
+
+    gunicorn --preload -w 4 -b 0.0.0.0:5000 wsgi:app
+
+With --preload the app and everything it imports are built once in the
+master and shared copy-on-write with the forked workers. create_app()
+opens no connections, and the DB engine, Redis clients, Stripe session
+and hashing pool are all created lazily in each worker.
+"""
+import gc
+from app import create_app
+from extensions import db
+
+app = create_app()
+
+with app.app_context():
+    # Make sure no pooled connection is inherited by the workers
+    db.engine.dispose()
+
+# Keep the collector from walking (and so copying) the preloaded objects
+# in every worker
+gc.freeze()
\ No newline at end of file